@@ -0,0 +1,112 @@
+import io
+import json
+import os
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import django
+import requests
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "message_notifier.settings")
+django.setup()
+
+from notifications.senders.sms import SMSSender
+from notifications.senders.telegram import TelegramSender
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Заглушка API SMS.ru и Telegram Bot API с поддержкой keep-alive (HTTP/1.1).
+    На любой запрос отвечает успешным ответом в формате SMS.ru.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = json.dumps({"status": "OK", "sms": {"79990000000": {"status_code": 100}}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubUser:
+    phone_number = "79990000000"
+    email = "bench@example.com"
+
+
+class PlainSMSSender(SMSSender):
+    """SMSSender в старом виде: новое соединение на каждый запрос."""
+    @property
+    def session(self):
+        return requests
+
+
+class PlainTelegramSender(TelegramSender):
+    """TelegramSender в старом виде: новое соединение на каждый запрос."""
+    @property
+    def session(self):
+        return requests
+
+
+def measure(sender, count):
+    user = StubUser()
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for _ in range(count):
+            assert sender.send(user, "benchmark")
+        return time.perf_counter() - started
+
+
+def run_bench(count=500):
+    """
+    Сравнивает отправку через долгоживущую HTTP-сессию с пулом соединений
+    и отправку через requests.get/requests.post с новым соединением на
+    каждый запрос. Оба варианта обращаются к локальному HTTP-серверу-заглушке,
+    поэтому внешние API не вызываются.
+
+    Заглушка работает без TLS, поэтому выигрыш здесь - только экономия на
+    установке TCP-соединения. На реальных sms.ru и api.telegram.org к нему
+    добавляется TLS-рукопожатие на каждый запрос, и разница больше.
+
+    Запуск:
+        python bench_senders.py
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    pairs = (
+        ("SMS", PlainSMSSender(), SMSSender()),
+        ("Telegram", PlainTelegramSender(), TelegramSender()),
+    )
+
+    print(f"=== {count} запросов к {base_url} ===")
+    for name, plain, pooled in pairs:
+        plain.API_URL = pooled.API_URL = f"{base_url}/{name.lower()}"
+        measure(pooled, 10)
+
+        plain_time = measure(plain, count)
+        pooled_time = measure(pooled, count)
+
+        print(f"{name}: без пула {plain_time * 1000 / count:.3f} мс/запрос, "
+              f"с пулом {pooled_time * 1000 / count:.3f} мс/запрос, "
+              f"ускорение x{plain_time / pooled_time:.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run_bench()
@@ -135,9 +135,111 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = "users.User"
 
+# Кэш (статусы уведомлений). Воркеры обновляют его из других процессов, поэтому
+# locmemcache:// подходит только для запуска в одном процессе (разработка, тесты)
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="redis://redis:6379/2"),
+}
+
 CELERY_BROKER_URL = "redis://redis:6379/0"
 CELERY_RESULT_BACKEND = "redis://redis:6379/1"
 
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
+
+# Очереди: "priority" - срочные уведомления, "default" - обычные и служебные задачи,
+# "bulk" - рассылки и низкий приоритет, "email"/"sms"/"telegram" - попытки отдельных
+# каналов (CHANNEL_TASKS). Очередь задачи отправки выбирается по приоритету уведомления
+# (notifications.routing); для каждой очереди запускается свой воркер со своими
+# --concurrency и --prefetch-multiplier (docker-compose.yml)
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_ROUTES = {
+    "notifications.tasks.render_notifications": {"queue": "bulk"},
+    "notifications.tasks.run_campaign": {"queue": "bulk"},
+}
+
+# Разбивать цепочку каналов на отдельные задачи: попытка каждого канала выполняется
+# в очереди канала, при неудаче задача ставит попытку следующего канала в его очередь
+CHANNEL_TASKS = env.bool("CHANNEL_TASKS", default=False)
+
+# Пул SMTP-соединений EmailSender
+EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", default=10)
+EMAIL_POOL_SIZE = env.int("EMAIL_POOL_SIZE", default=2)
+EMAIL_POOL_MAX_MESSAGES = env.int("EMAIL_POOL_MAX_MESSAGES", default=100)
+EMAIL_POOL_MAX_AGE = env.int("EMAIL_POOL_MAX_AGE", default=300)
+EMAIL_POOL_PING_AFTER = env.int("EMAIL_POOL_PING_AFTER", default=5)
+
+# Пул HTTP-соединений SMSSender и TelegramSender
+HTTP_POOL_CONNECTIONS = env.int("HTTP_POOL_CONNECTIONS", default=4)
+HTTP_POOL_MAXSIZE = env.int("HTTP_POOL_MAXSIZE", default=10)
+HTTP_KEEPALIVE_IDLE = env.int("HTTP_KEEPALIVE_IDLE", default=60)
+HTTP_RETRY_ATTEMPTS = env.int("HTTP_RETRY_ATTEMPTS", default=2)
+HTTP_RETRY_BACKOFF = env.float("HTTP_RETRY_BACKOFF", default=0.2)
+
+# Асинхронный движок доставки (AsyncDeliveryEngine) для пакетных задач
+ASYNC_DELIVERY_ENABLED = env.bool("ASYNC_DELIVERY_ENABLED", default=False)
+ASYNC_DELIVERY_CONCURRENCY = env.int("ASYNC_DELIVERY_CONCURRENCY", default=200)
+ASYNC_DELIVERY_TIMEOUT = env.int("ASYNC_DELIVERY_TIMEOUT", default=10)
+
+# Ограничение частоты отправки по каналам ("redis" - общее для всех воркеров, "local" - в памяти процесса)
+RATE_LIMIT_BACKEND = env("RATE_LIMIT_BACKEND", default="redis")
+RATE_LIMIT_REDIS_URL = env("RATE_LIMIT_REDIS_URL", default=CELERY_BROKER_URL)
+RATE_LIMIT_MAX_WAIT = env.float("RATE_LIMIT_MAX_WAIT", default=5)
+
+CELERY_BEAT_SCHEDULE = {
+    "sweep-stuck-notifications": {
+        "task": "notifications.tasks.sweep_stuck_notifications",
+        "schedule": env.int("RETRY_SWEEP_INTERVAL", default=60),
+    },
+    # Отправка накопленных событий webhook-подписок
+    "flush-webhooks": {
+        "task": "notifications.tasks.flush_webhooks",
+        "schedule": env.int("WEBHOOK_FLUSH_INTERVAL", default=5),
+    },
+    # Продолжение рассылок, прерванных падением воркера
+    "resume-campaigns": {
+        "task": "notifications.tasks.resume_campaigns",
+        "schedule": env.int("CAMPAIGN_RESUME_INTERVAL", default=60),
+    },
+}
+
+# Автоматические выключатели каналов ("redis" - общие для всех воркеров, "local" - в памяти процесса)
+CIRCUIT_BREAKER_BACKEND = env("CIRCUIT_BREAKER_BACKEND", default="redis")
+CIRCUIT_BREAKER_REDIS_URL = env("CIRCUIT_BREAKER_REDIS_URL", default=CELERY_BROKER_URL)
+
+# Порядок каналов: "static" - CHANNEL_ORDER, "adaptive" - по скользящей статистике успехов и задержек
+CHANNEL_ORDERING = env("CHANNEL_ORDERING", default="static")
+
+# Режим доставки: "sequential" - каналы по очереди, "hedged" - следующий канал запускается,
+# если предыдущий не ответил за HEDGE_DELAY_SECONDS. DELIVERY_BUDGET_SECONDS - общий лимит
+# времени на отправку одного уведомления в обоих режимах
+DELIVERY_MODE = env("DELIVERY_MODE", default="sequential")
+HEDGE_DELAY_SECONDS = env.float("HEDGE_DELAY_SECONDS", default=2)
+HEDGE_MAX_WORKERS = env.int("HEDGE_MAX_WORKERS", default=16)
+DELIVERY_BUDGET_SECONDS = env.float("DELIVERY_BUDGET_SECONDS", default=30)
+
+# Redis pub/sub для потока статусов уведомлений (SSE и long-poll)
+STATUS_EVENTS_REDIS_URL = env("STATUS_EVENTS_REDIS_URL", default=CELERY_BROKER_URL)
+
+# Пауза ретранслятора outbox (manage.py relay_outbox), когда outbox пуст (секунды)
+OUTBOX_RELAY_INTERVAL = env.float("OUTBOX_RELAY_INTERVAL", default=0.5)
+
+# Передавать в задачу снимок уведомления с контактами пользователя, чтобы воркер
+# отправлял его без чтения из БД (см. notifications.snapshots)
+TASK_PAYLOAD_SNAPSHOT = env.bool("TASK_PAYLOAD_SNAPSHOT", default=False)
+
+# Отложенная запись результатов отправки (notifications.writer.StatusWriter): статусы
+# копятся в буфере воркера и пишутся одним bulk_update по размеру буфера или по времени
+STATUS_WRITE_BEHIND = env.bool("STATUS_WRITE_BEHIND", default=False)
+STATUS_WRITE_BUFFER_SIZE = env.int("STATUS_WRITE_BUFFER_SIZE", default=500)
+STATUS_WRITE_FLUSH_SECONDS = env.float("STATUS_WRITE_FLUSH_SECONDS", default=1)
+
+# Окно дедупликации одинаковых уведомлений (тот же пользователь и текст), секунды; 0 - выключено.
+# Idempotency-Key работает независимо от окна
+NOTIFICATION_DEDUP_WINDOW = env.int("NOTIFICATION_DEDUP_WINDOW", default=0)
+DEDUP_REDIS_URL = env("DEDUP_REDIS_URL", default=CELERY_BROKER_URL)
+
+# Окно дайджеста, секунды; 0 - выключено. Новые уведомления пользователя, пришедшие за окно,
+# отправляются одним сообщением (см. notifications.digest)
+NOTIFICATION_DIGEST_WINDOW = env.int("NOTIFICATION_DIGEST_WINDOW", default=0)
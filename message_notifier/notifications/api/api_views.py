@@ -1,7 +1,96 @@
-from rest_framework import generics
-from notifications.api.serializers import NotificationSerializer
-from notifications.models import Notification
-from notifications.tasks import process_notification
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import generics, status
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from notifications.api.pagination import decode_cursor, encode_cursor
+from notifications.api.parsers import NDJSONParser
+from notifications.api.serializers import (
+    CampaignSerializer,
+    NotificationBulkItemSerializer,
+    NotificationListFilterSerializer,
+    NotificationSerializer,
+    NotificationTemplateSendSerializer,
+    NotificationTemplateSerializer,
+    WebhookSubscriptionSerializer,
+)
+from notifications.campaigns import progress
+from notifications.dedup import DedupKeys, get_deduplicator
+from notifications.models import Campaign, Notification, NotificationTemplate, WebhookSubscription
+from notifications.outbox import add_to_outbox
+from notifications.snapshots import build_snapshot, contact_of
+from notifications.status_cache import get_status
+from notifications.tasks import enqueue_template, run_campaign
+
+
+class NotificationListView(generics.GenericAPIView):
+    """
+    API view для постраничного списка уведомлений с фильтрами.
+
+    Параметры запроса (NotificationListFilterSerializer): user, status,
+    last_channel, created_after, created_before, limit, cursor.
+
+    Уведомления отдаются от самых новых. Пагинация курсорная (keyset) по
+    (created_at, id): курсор хранит позицию последнего элемента страницы, и
+    следующая страница выбирается условием по индексу, а не через OFFSET,
+    поэтому любая страница стоит столько же, сколько первая. Строки читаются
+    через values() без создания объектов модели.
+
+    Атрибуты:
+        queryset (QuerySet): Набор всех уведомлений.
+        serializer_class (Serializer): `NotificationListFilterSerializer` для параметров запроса.
+
+    Методы:
+        get(request):
+            Возвращает {"results": [...], "next": <URL следующей страницы или null>}.
+    """
+    queryset = Notification.objects.all()
+    serializer_class = NotificationListFilterSerializer
+
+    fields = (
+        "id",
+        "user",
+        "message",
+        "status",
+        "retry_count",
+        "last_channel",
+        "sent_at",
+        "created_at",
+        "priority",
+    )
+
+    def get(self, request, *args, **kwargs):
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        queryset = self.get_queryset()
+        if "user" in filters:
+            queryset = queryset.filter(user_id=filters["user"])
+        if "status" in filters:
+            queryset = queryset.filter(status=filters["status"])
+        if "last_channel" in filters:
+            queryset = queryset.filter(last_channel=filters["last_channel"])
+        if "created_after" in filters:
+            queryset = queryset.filter(created_at__gte=filters["created_after"])
+        if "created_before" in filters:
+            queryset = queryset.filter(created_at__lt=filters["created_before"])
+
+        before = decode_cursor(filters["cursor"]) if "cursor" in filters else None
+        limit = filters["limit"]
+        rows = list(queryset.newest_first(before).values(*self.fields)[:limit + 1])
+
+        next_url = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            query = request.query_params.copy()
+            query["cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+            next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+        return Response({"results": rows, "next": next_url})
 
 
 class NotificationCreateView(generics.CreateAPIView):
@@ -17,26 +106,124 @@ class NotificationCreateView(generics.CreateAPIView):
 
     Методы:
         perform_create(serializer):
-            Сохраняет новый объект уведомления и запускает асинхронную обработку
-            через Celery задачу `process_notification`.
+            Сохраняет новый объект уведомления и в той же транзакции записывает
+            его в outbox (NotificationOutbox). Задачу `process_notification`
+            публикует ретранслятор outbox (manage.py relay_outbox), поэтому
+            запрос не обращается к брокеру, а воркер не может получить
+            уведомление раньше, чем оно зафиксировано в БД. При
+            TASK_PAYLOAD_SNAPSHOT = True в outbox пишется снимок уведомления
+            с контактами пользователя, и воркер не читает их из БД.
 
         create(request, *args, **kwargs):
-            Переопределяет стандартный метод `create` для возврата сериализованных данных
-            только что созданного уведомления, гарантируя актуальность данных после сохранения.
+            Создает уведомление с дедупликацией (notifications.dedup): если
+            передан заголовок Idempotency-Key или включено окно
+            NOTIFICATION_DEDUP_WINDOW и такое уведомление уже создано,
+            возвращается оно (200, заголовок Idempotent-Replayed: true) без
+            вставки в БД и новой задачи. Повтор Idempotency-Key с другими
+            user/message отклоняется с 422. Одновременные запросы с одним
+            ключом разрешает уникальный индекс notif_dedup_key_uniq.
     """
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
 
-    def perform_create(self, serializer):
-        notification = serializer.save()
+    def replay(self, request, keys):
+        notification_id = get_deduplicator().find(keys)
+        entry = get_status(notification_id) if notification_id is not None else None
+        if entry is None:
+            return None
 
-        process_notification.delay(notification.id)
+        data = entry["data"]
+        if keys.idempotent and (str(data["user"]), data["message"]) != (
+            str(request.data.get("user")), request.data.get("message")
+        ):
+            return Response(
+                {"detail": "Idempotency-Key уже использован с другими данными."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        return Response(data, status=status.HTTP_200_OK, headers={"Idempotent-Replayed": "true"})
 
     def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        notification = Notification.objects.get(id=response.data["id"])
-        response.data = NotificationSerializer(notification).data
-        return response
+        data = request.data if isinstance(request.data, dict) else {}
+        keys = DedupKeys.for_request(
+            data.get("user"),
+            data.get("message"),
+            request.headers.get("Idempotency-Key")
+        )
+        if keys is not None:
+            response = self.replay(request, keys)
+            if response is not None:
+                return response
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            self.perform_create(serializer, keys)
+        except IntegrityError:
+            response = self.replay(request, keys) if keys is not None else None
+            if response is None:
+                raise
+            return response
+
+        if keys is not None:
+            get_deduplicator().remember(keys, serializer.instance.id)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def perform_create(self, serializer, keys=None):
+        with transaction.atomic():
+            notification = serializer.save(dedup_key=keys.db_key if keys is not None else None)
+            snapshots = None
+            if settings.TASK_PAYLOAD_SNAPSHOT:
+                snapshots = [build_snapshot(notification, contact_of(notification.user))]
+            add_to_outbox([notification.id], snapshots)
+
+
+class NotificationBulkCreateView(generics.GenericAPIView):
+    """
+    API view для массового создания уведомлений.
+
+    Принимает JSON-массив (`application/json`) или NDJSON
+    (`application/x-ndjson`) объектов вида {"user": <id>, "message": "..."}.
+    Все элементы валидируются до вставки: если хотя бы один некорректен,
+    ничего не создается и возвращается список ошибок по элементам. Запрос
+    больше BULK_MAX_ITEMS элементов отклоняется с 400 целиком.
+
+    Количество запросов к БД не зависит от числа элементов в пачке:
+    один запрос на проверку пользователей и по одному INSERT уведомлений и
+    строк outbox на каждые BULK_CHUNK_SIZE уведомлений. В очередь уведомления
+    ставит ретранслятор outbox (manage.py relay_outbox) задачами
+    process_notification_batch по BATCH_TASK_SIZE штук (при
+    TASK_PAYLOAD_SNAPSHOT = True - process_notification_snapshots со снимками
+    уведомлений и контактов, загруженных при проверке пользователей).
+
+    Атрибуты:
+        serializer_class (Serializer): `NotificationBulkItemSerializer` (используется с many=True).
+        parser_classes (tuple): JSON и NDJSON парсеры.
+
+    Методы:
+        post(request):
+            Создает уведомления и возвращает ответ 201 вида
+            {"count": <количество>, "ids": [<id>, ...]} в порядке элементов запроса.
+    """
+    serializer_class = NotificationBulkItemSerializer
+    parser_classes = (JSONParser, NDJSONParser)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            notifications = serializer.save()
+            ids = [notification.id for notification in notifications]
+            snapshots = None
+            if settings.TASK_PAYLOAD_SNAPSHOT:
+                snapshots = [
+                    build_snapshot(notification, serializer.contacts[notification.user_id])
+                    for notification in notifications
+                ]
+            add_to_outbox(ids, snapshots)
+
+        return Response({"count": len(ids), "ids": ids}, status=status.HTTP_201_CREATED)
 
 
 class NotificationDetailView(generics.RetrieveAPIView):
@@ -50,13 +237,152 @@ class NotificationDetailView(generics.RetrieveAPIView):
     мы не можем увидеть подобную информацию вследствие выполнения задачи в Celery -
     поэтому там данные поля заполняются null-значениями.
 
+    Клиенты опрашивают этот эндпоинт в ожидании доставки, поэтому данные
+    берутся из кэша статусов (notifications.status_cache), который
+    NotificationService обновляет при каждом изменении уведомления. Ответ
+    содержит заголовки ETag и Last-Modified; на запрос с совпадающим
+    If-None-Match (или If-Modified-Since) возвращается 304 без тела.
+
     Атрибуты:
         queryset (QuerySet): Набор всех уведомлений (`Notification.objects.all()`).
         serializer_class (Serializer): Сериализатор `NotificationSerializer` для сериализации данных.
 
     Методы:
-        В стандартной реализации используется метод `retrieve`, предоставляемый `RetrieveAPIView`,
-        который возвращает сериализованные данные уведомления по переданному ID.
+        retrieve(request, *args, **kwargs):
+            Возвращает сериализованные данные уведомления по переданному ID
+            или 304, если у клиента актуальная версия.
     """
     queryset = Notification.objects.all()
-    serializer_class = NotificationSerializer
\ No newline at end of file
+    serializer_class = NotificationSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        entry = get_status(self.kwargs["pk"])
+        if entry is None:
+            raise Http404
+
+        response = get_conditional_response(
+            request,
+            etag=entry["etag"],
+            last_modified=entry["last_modified"]
+        )
+        if response is None:
+            response = Response(entry["data"])
+
+        response["ETag"] = entry["etag"]
+        response["Last-Modified"] = http_date(entry["last_modified"])
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+class WebhookSubscriptionListCreateView(generics.ListCreateAPIView):
+    """
+    API view для webhook-подписок внешних сервисов.
+
+    Вместо опроса GET /api/notifications/<id>/ клиент регистрирует адрес, и
+    переходы уведомлений в статусы sent/failed приходят на него пачками
+    (POST {"events": [...]}) - см. notifications.webhooks.
+
+    Атрибуты:
+        queryset (QuerySet): Все подписки.
+        serializer_class (Serializer): `WebhookSubscriptionSerializer`.
+    """
+    queryset = WebhookSubscription.objects.order_by("id")
+    serializer_class = WebhookSubscriptionSerializer
+
+
+class NotificationTemplateListCreateView(generics.ListCreateAPIView):
+    """
+    API view для шаблонов уведомлений (создание и список).
+
+    Атрибуты:
+        queryset (QuerySet): Все шаблоны.
+        serializer_class (Serializer): `NotificationTemplateSerializer`.
+    """
+    queryset = NotificationTemplate.objects.order_by("id")
+    serializer_class = NotificationTemplateSerializer
+
+
+class NotificationTemplateDetailView(generics.RetrieveUpdateAPIView):
+    """
+    API view для просмотра и изменения шаблона. Изменение текста увеличивает версию.
+
+    Атрибуты:
+        queryset (QuerySet): Все шаблоны.
+        serializer_class (Serializer): `NotificationTemplateSerializer`.
+    """
+    queryset = NotificationTemplate.objects.all()
+    serializer_class = NotificationTemplateSerializer
+
+
+class NotificationTemplateSendView(generics.GenericAPIView):
+    """
+    API view для отправки уведомлений по шаблону.
+
+    Принимает {"users": [<id>, ...]}: вместо готовых текстов передается
+    только список получателей. Тексты рендерятся в воркерах задачами
+    render_notifications по BATCH_TASK_SIZE пользователей, которые
+    публикуются после фиксации транзакции через одно соединение с брокером.
+
+    Атрибуты:
+        queryset (QuerySet): Все шаблоны.
+        serializer_class (Serializer): `NotificationTemplateSendSerializer`.
+
+    Методы:
+        post(request, pk):
+            Возвращает 202 вида {"template": <id>, "version": <версия>, "count": <получателей>}.
+    """
+    queryset = NotificationTemplate.objects.all()
+    serializer_class = NotificationTemplateSendSerializer
+
+    def post(self, request, *args, **kwargs):
+        template = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        users = serializer.validated_data["users"]
+
+        transaction.on_commit(lambda: enqueue_template(template, users))
+
+        return Response(
+            {"template": template.pk, "version": template.version, "count": len(users)},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class CampaignListCreateView(generics.ListCreateAPIView):
+    """
+    API view для рассылок сегменту пользователей (создание и список).
+
+    Созданная рассылка запускается задачей run_campaign после фиксации
+    транзакции; уведомления создаются воркером частями (notifications.campaigns).
+
+    Атрибуты:
+        queryset (QuerySet): Все рассылки, от самых новых.
+        serializer_class (Serializer): `CampaignSerializer`.
+    """
+    queryset = Campaign.objects.order_by("-id")
+    serializer_class = CampaignSerializer
+
+    def perform_create(self, serializer):
+        campaign = serializer.save()
+        transaction.on_commit(lambda: run_campaign.delay(campaign.pk))
+
+
+class CampaignDetailView(generics.RetrieveAPIView):
+    """
+    API view для прогресса рассылки.
+
+    Кроме счетчиков создания (total, created_count) возвращает "progress" -
+    количество уведомлений рассылки по статусам (campaigns.progress).
+
+    Атрибуты:
+        queryset (QuerySet): Все рассылки.
+        serializer_class (Serializer): `CampaignSerializer`.
+    """
+    queryset = Campaign.objects.all()
+    serializer_class = CampaignSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        campaign = self.get_object()
+        data = self.get_serializer(campaign).data
+        data["progress"] = progress(campaign)
+        return Response(data)
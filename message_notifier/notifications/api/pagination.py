@@ -0,0 +1,33 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from rest_framework.exceptions import ValidationError
+
+
+def encode_cursor(created_at, pk):
+    """
+    Кодирует позицию (created_at, id) последнего элемента страницы в
+    непрозрачную строку для параметра ?cursor=.
+    """
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Разбирает курсор, полученный от encode_cursor.
+
+    Возвращает:
+        tuple[datetime, int]: Позиция (created_at, id).
+
+    Исключения:
+        ValidationError: Если курсор поврежден.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValidationError({"cursor": ["Некорректный курсор."]})
@@ -0,0 +1,39 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Парсер тела запроса в формате NDJSON (один JSON-объект на строку).
+
+    Используется массовым эндпоинтом создания уведомлений: клиенту не нужно
+    собирать в памяти один огромный JSON-массив, достаточно писать объекты
+    построчно. Пустые строки пропускаются.
+
+    Возвращает:
+        list[dict]: Объекты из тела запроса в исходном порядке.
+
+    Исключения:
+        ParseError: Если какая-либо строка не является корректным JSON.
+    """
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        items = []
+
+        for line_number, line in enumerate(codecs.getreader(encoding)(stream), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError(f"NDJSON parse error on line {line_number} - {exc}")
+
+        return items
@@ -1,5 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldError, ValidationError as DjangoValidationError
 from rest_framework import serializers
-from notifications.models import Notification
+from notifications.campaigns import recipients
+from notifications.constants import (
+    BULK_CHUNK_SIZE,
+    BULK_MAX_ITEMS,
+    CAMPAIGN_FILTERS,
+    LIST_MAX_PAGE_SIZE,
+    LIST_PAGE_SIZE,
+    TEMPLATE_SEND_MAX_USERS,
+    WEBHOOK_STATUSES,
+)
+from notifications.models import Campaign, Notification, NotificationTemplate, WebhookSubscription
+from notifications.snapshots import CONTACT_FIELDS
+from notifications.templating import compile_body
+from notifications.utils import chunked
 
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -20,6 +35,7 @@ class NotificationSerializer(serializers.ModelSerializer):
             - last_channel: последний использованный канал отправки
             - sent_at: дата и время последней отправки
             - created_at: дата и время создания уведомления
+            - priority: приоритет уведомления ("high", "normal", "low")
         read_only_fields (tuple): Поля только для чтения, которые нельзя изменять через API:
             - status
             - retry_count
@@ -38,6 +54,7 @@ class NotificationSerializer(serializers.ModelSerializer):
             "last_channel",
             "sent_at",
             "created_at",
+            "priority",
         )
         read_only_fields = (
             "status",
@@ -45,4 +62,296 @@ class NotificationSerializer(serializers.ModelSerializer):
             "last_channel",
             "sent_at",
             "created_at"
-        )
\ No newline at end of file
+        )
+
+
+class NotificationBulkListSerializer(serializers.ListSerializer):
+    """
+    Списочный сериализатор для массового создания уведомлений.
+
+    Проверяет существование пользователей одним запросом на пачку
+    (вместо запроса на каждый элемент, как делает PrimaryKeyRelatedField)
+    и сохраняет уведомления через bulk_create пачками по BULK_CHUNK_SIZE.
+    Пачка больше BULK_MAX_ITEMS элементов отклоняется до проверки элементов.
+
+    Атрибуты:
+        contacts (dict): Контакты пользователей пачки {id: {поле: значение}}
+            (snapshots.CONTACT_FIELDS), загруженные тем же запросом, что и
+            проверка существования; нужны для снимков в payload задач.
+
+    Методы:
+        to_internal_value(data):
+            Валидирует элементы и проверяет, что все указанные пользователи существуют.
+
+            Исключения:
+                ValidationError: Список ошибок по элементам в исходном порядке
+                    (пустой словарь для корректных элементов).
+
+        create(validated_data):
+            Создает уведомления пачками.
+
+            Возвращает:
+                list[Notification]: Созданные уведомления с заполненными ID.
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("max_length", BULK_MAX_ITEMS)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+
+        user_ids = sorted({item["user"] for item in attrs})
+        self.contacts = {}
+        for chunk in chunked(user_ids, BULK_CHUNK_SIZE):
+            for row in get_user_model().objects.filter(pk__in=chunk).values("pk", *CONTACT_FIELDS):
+                self.contacts[row.pop("pk")] = row
+
+        errors = [
+            {} if item["user"] in self.contacts
+            else {"user": [f'Недопустимый первичный ключ "{item["user"]}" - объект не существует.']}
+            for item in attrs
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        notifications = []
+        for chunk in chunked(validated_data, BULK_CHUNK_SIZE):
+            notifications.extend(Notification.objects.bulk_create([
+                Notification(user_id=item["user"], message=item["message"], priority=item["priority"])
+                for item in chunk
+            ]))
+        return notifications
+
+
+class NotificationBulkItemSerializer(serializers.Serializer):
+    """
+    Сериализатор одного элемента массового запроса на создание уведомлений.
+
+    Пользователь передается ID и проверяется пачкой в
+    NotificationBulkListSerializer, поэтому валидация элемента не делает
+    запросов к БД.
+
+    Атрибуты:
+        user (IntegerField): ID пользователя, которому адресовано уведомление.
+        message (CharField): Текст уведомления.
+        priority (ChoiceField): Приоритет уведомления, по умолчанию "normal".
+    """
+    user = serializers.IntegerField(min_value=1)
+    message = serializers.CharField()
+    priority = serializers.ChoiceField(choices=Notification.PRIORITY_CHOICES, default="normal")
+
+    class Meta:
+        list_serializer_class = NotificationBulkListSerializer
+
+
+class NotificationImportSerializer(serializers.Serializer):
+    """
+    Сериализатор одной строки файла импорта уведомлений
+    (команда manage.py import_notifications).
+
+    Пользователь задается ID или email; существование пользователей и
+    повторы idempotency_key проверяются одним запросом на пачку при импорте.
+
+    Атрибуты:
+        user (IntegerField): ID пользователя.
+        email (EmailField): Email пользователя (если ID не указан).
+        message (CharField): Текст уведомления.
+        idempotency_key (CharField): Ключ идемпотентности (как заголовок
+            Idempotency-Key API): строка с уже использованным ключом пропускается.
+        priority (ChoiceField): Приоритет уведомления, по умолчанию "normal".
+    """
+    user = serializers.IntegerField(required=False, min_value=1)
+    email = serializers.EmailField(required=False)
+    message = serializers.CharField()
+    idempotency_key = serializers.CharField(required=False, max_length=255)
+    priority = serializers.ChoiceField(choices=Notification.PRIORITY_CHOICES, default="normal")
+
+    def validate(self, attrs):
+        if "user" not in attrs and "email" not in attrs:
+            raise serializers.ValidationError("Нужно указать user или email.")
+        return attrs
+
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор webhook-подписки клиента.
+
+    Атрибуты Meta:
+        model (Model): Модель WebhookSubscription.
+        fields (tuple): id, name, url, secret, statuses, is_active, created_at.
+        extra_kwargs (dict): secret только для записи (не возвращается в ответах API).
+
+    Методы:
+        validate_statuses(value):
+            Проверяет, что указаны только статусы из WEBHOOK_STATUSES.
+    """
+    class Meta:
+        model = WebhookSubscription
+        fields = (
+            "id",
+            "name",
+            "url",
+            "secret",
+            "statuses",
+            "is_active",
+            "created_at",
+        )
+        read_only_fields = (
+            "created_at",
+        )
+        extra_kwargs = {
+            "secret": {"write_only": True}
+        }
+
+    def validate_statuses(self, value):
+        if not isinstance(value, list) or not value or any(status not in WEBHOOK_STATUSES for status in value):
+            raise serializers.ValidationError(f"Ожидается непустой список из {', '.join(WEBHOOK_STATUSES)}.")
+        return value
+
+
+class NotificationListFilterSerializer(serializers.Serializer):
+    """
+    Сериализатор параметров запроса списка уведомлений.
+
+    Атрибуты:
+        user (IntegerField): ID пользователя.
+        status (ChoiceField): Статус уведомления.
+        last_channel (ChoiceField): Последний использованный канал.
+        created_after (DateTimeField): Созданные не раньше этого момента.
+        created_before (DateTimeField): Созданные раньше этого момента.
+        limit (IntegerField): Размер страницы (не больше LIST_MAX_PAGE_SIZE).
+        cursor (CharField): Курсор следующей страницы из предыдущего ответа.
+    """
+    user = serializers.IntegerField(required=False, min_value=1)
+    status = serializers.ChoiceField(choices=Notification.STATUS_CHOICES, required=False)
+    last_channel = serializers.ChoiceField(choices=Notification.CHANNEL_CHOICES, required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=LIST_MAX_PAGE_SIZE, default=LIST_PAGE_SIZE)
+    cursor = serializers.CharField(required=False)
+
+
+class NotificationTemplateSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор шаблона уведомления.
+
+    Атрибуты Meta:
+        model (Model): Модель NotificationTemplate.
+        fields (tuple): id, name, body, version, created_at, updated_at.
+        read_only_fields (tuple): version, created_at, updated_at.
+
+    Методы:
+        validate_body(value):
+            Проверяет, что шаблон использует только поля из TEMPLATE_FIELDS.
+    """
+    class Meta:
+        model = NotificationTemplate
+        fields = (
+            "id",
+            "name",
+            "body",
+            "version",
+            "created_at",
+            "updated_at",
+        )
+        read_only_fields = (
+            "version",
+            "created_at",
+            "updated_at",
+        )
+
+    def validate_body(self, value):
+        try:
+            compile_body(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+
+class NotificationTemplateSendSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса на отправку уведомлений по шаблону.
+
+    Атрибуты:
+        users (ListField): ID получателей (не больше TEMPLATE_SEND_MAX_USERS).
+
+    Методы:
+        validate_users(value):
+            Убирает повторы и проверяет одним запросом, что все пользователи существуют.
+    """
+    users = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=TEMPLATE_SEND_MAX_USERS
+    )
+
+    def validate_users(self, value):
+        value = list(dict.fromkeys(value))
+        existing = set(get_user_model().objects.filter(pk__in=value).values_list("pk", flat=True))
+        missing = [pk for pk in value if pk not in existing]
+        if missing:
+            raise serializers.ValidationError(f"Пользователи не найдены: {missing[:20]}")
+        return value
+
+
+class CampaignSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор рассылки.
+
+    Атрибуты Meta:
+        model (Model): Модель Campaign.
+        fields (tuple): Параметры рассылки и счетчики прогресса.
+        read_only_fields (tuple): Статус и счетчики, которые ведет воркер.
+
+    Методы:
+        validate_filters(value):
+            Проверяет, что фильтр - словарь с ключами из CAMPAIGN_FILTERS
+            и значениями, которые принимает модель пользователя.
+
+        validate(attrs):
+            Проверяет, что задан текст или шаблон (но не оба).
+    """
+    class Meta:
+        model = Campaign
+        fields = (
+            "id",
+            "name",
+            "message",
+            "template",
+            "filters",
+            "status",
+            "total",
+            "created_count",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        )
+        read_only_fields = (
+            "status",
+            "total",
+            "created_count",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        )
+
+    def validate_filters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Ожидается объект {фильтр: значение}.")
+
+        unknown = [key for key in value if key not in CAMPAIGN_FILTERS]
+        if unknown:
+            raise serializers.ValidationError(f"Недопустимые фильтры: {', '.join(unknown)}")
+
+        try:
+            recipients(value).query
+        except (DjangoValidationError, FieldError, TypeError, ValueError) as e:
+            raise serializers.ValidationError(f"Некорректное значение фильтра: {e}")
+        return value
+
+    def validate(self, attrs):
+        if bool(attrs.get("message")) == bool(attrs.get("template")):
+            raise serializers.ValidationError("Нужно указать либо message, либо template.")
+        return attrs
@@ -0,0 +1,162 @@
+import json
+
+import redis
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from notifications.constants import (
+    STATUS_POLL_TIMEOUT,
+    STATUS_STREAM_KEEPALIVE_SECONDS,
+    STATUS_STREAM_MAX_IDS,
+)
+from notifications.events import close_subscription, next_entry, subscribe
+from notifications.status_cache import get_status
+
+FINAL_STATUSES = ("sent", "failed")
+
+
+def parse_ids(request):
+    """
+    Разбирает параметр ?ids=1,2,3.
+
+    Исключения:
+        ValueError: Если список пуст, содержит не числа или длиннее STATUS_STREAM_MAX_IDS.
+    """
+    raw = request.GET.get("ids", "")
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in raw.split(",") if pk.strip()))
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of notification ids")
+    if not ids:
+        raise ValueError("ids is required")
+    if len(ids) > STATUS_STREAM_MAX_IDS:
+        raise ValueError(f"at most {STATUS_STREAM_MAX_IDS} ids per stream")
+    return ids
+
+
+async def current_entries(ids):
+    entries = []
+    for pk in ids:
+        entry = await sync_to_async(get_status)(pk)
+        if entry is not None:
+            entries.append(entry)
+    return entries
+
+
+def format_event(entry):
+    return f"event: status\ndata: {json.dumps(entry['data'])}\n\n"
+
+
+async def open_subscription(request):
+    """
+    Общая часть обоих эндпоинтов: разбирает ids и подписывается на них.
+    Возвращает (ids, pubsub, None) или (None, None, JsonResponse с ошибкой).
+    Подписка оформляется до чтения текущих статусов, поэтому изменение,
+    случившееся между чтением и ожиданием, не теряется.
+    """
+    try:
+        ids = parse_ids(request)
+    except ValueError as e:
+        return None, None, JsonResponse({"detail": str(e)}, status=400)
+
+    try:
+        pubsub = await subscribe(ids)
+    except redis.RedisError as e:
+        print(f"Redis недоступен, поток статусов не открыт: {e}")
+        return None, None, JsonResponse({"detail": "status stream is unavailable"}, status=503)
+
+    return ids, pubsub, None
+
+
+async def sse_events(entries, pubsub):
+    try:
+        pending = set()
+        for entry in entries:
+            yield format_event(entry)
+            if entry["data"]["status"] not in FINAL_STATUSES:
+                pending.add(entry["data"]["id"])
+
+        while pending:
+            entry = await next_entry(pubsub, STATUS_STREAM_KEEPALIVE_SECONDS)
+            if entry is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(entry)
+            if entry["data"]["status"] in FINAL_STATUSES:
+                pending.discard(entry["data"]["id"])
+    finally:
+        await close_subscription(pubsub)
+
+
+@require_GET
+async def status_stream(request):
+    """
+    Поток изменений статусов уведомлений в формате Server-Sent Events.
+
+    GET /api/notifications/stream/?ids=1,2,3
+
+    Сначала отправляются текущие статусы уведомлений, затем - каждое
+    изменение по мере того, как воркеры его сохраняют (Redis pub/sub).
+    Событие: `event: status`, `data: <JSON как в GET /api/notifications/<id>/>`.
+    Поток закрывается, когда все уведомления получили статус sent или failed;
+    несуществующие уведомления не отслеживаются. Пока изменений нет, раз в
+    STATUS_STREAM_KEEPALIVE_SECONDS отправляется комментарий keep-alive.
+
+    Эндпоинт рассчитан на ASGI-сервер (message_notifier.asgi): открытое
+    соединение не занимает поток воркера.
+    """
+    ids, pubsub, error = await open_subscription(request)
+    if error is not None:
+        return error
+
+    return StreamingHttpResponse(
+        sse_events(await current_entries(ids), pubsub),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@require_GET
+async def status_poll(request):
+    """
+    Long-poll вариант потока статусов для клиентов без поддержки SSE.
+
+    GET /api/notifications/poll/?ids=1,2,3&since=<version>
+
+    Сразу возвращает уведомления, измененные после `since` (при первом
+    запросе since не передается - возвращаются все). Если таких нет, ждет
+    первого изменения не дольше STATUS_POLL_TIMEOUT секунд.
+
+    Ответ: {"updates": [<данные уведомления>, ...], "since": <version>}.
+    Значение "since" нужно передать в следующий запрос.
+    """
+    try:
+        since = float(request.GET.get("since", 0))
+    except ValueError:
+        return JsonResponse({"detail": "since must be a number"}, status=400)
+
+    ids, pubsub, error = await open_subscription(request)
+    if error is not None:
+        return error
+
+    try:
+        entries = [entry for entry in await current_entries(ids) if entry["version"] > since]
+        if not entries:
+            entry = await next_entry(pubsub, STATUS_POLL_TIMEOUT)
+            while entry is not None:
+                entries.append(entry)
+                entry = await next_entry(pubsub, 0.05)
+    finally:
+        await close_subscription(pubsub)
+
+    latest = {}
+    for entry in entries:
+        pk = entry["data"]["id"]
+        if pk not in latest or entry["version"] > latest[pk]["version"]:
+            latest[pk] = entry
+
+    return JsonResponse({
+        "updates": [entry["data"] for entry in latest.values()],
+        "since": max([since, *(entry["version"] for entry in latest.values())]),
+    })
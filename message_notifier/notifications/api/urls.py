@@ -1,8 +1,30 @@
 from django.urls import path
-from notifications.api.api_views import NotificationCreateView, NotificationDetailView
+from notifications.api.api_views import (
+    CampaignDetailView,
+    CampaignListCreateView,
+    NotificationBulkCreateView,
+    NotificationCreateView,
+    NotificationDetailView,
+    NotificationListView,
+    NotificationTemplateDetailView,
+    NotificationTemplateListCreateView,
+    NotificationTemplateSendView,
+    WebhookSubscriptionListCreateView,
+)
+from notifications.api.streams import status_poll, status_stream
 
 
 urlpatterns = [
+    path("", NotificationListView.as_view(), name="notifications-list"),
     path("create/", NotificationCreateView.as_view(), name="notifications-create"),
+    path("bulk/", NotificationBulkCreateView.as_view(), name="notifications-bulk-create"),
+    path("stream/", status_stream, name="notifications-stream"),
+    path("poll/", status_poll, name="notifications-poll"),
+    path("templates/", NotificationTemplateListCreateView.as_view(), name="notifications-templates"),
+    path("templates/<int:pk>/", NotificationTemplateDetailView.as_view(), name="notifications-template-detail"),
+    path("templates/<int:pk>/send/", NotificationTemplateSendView.as_view(), name="notifications-template-send"),
+    path("campaigns/", CampaignListCreateView.as_view(), name="notifications-campaigns"),
+    path("campaigns/<int:pk>/", CampaignDetailView.as_view(), name="notifications-campaign-detail"),
+    path("webhooks/", WebhookSubscriptionListCreateView.as_view(), name="notifications-webhooks"),
     path('<int:pk>/', NotificationDetailView.as_view(), name="notifications-detail"),
 ]
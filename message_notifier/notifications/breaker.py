@@ -0,0 +1,181 @@
+import asyncio
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+from .constants import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_OPEN_SECONDS, CIRCUIT_PROBE_SECONDS
+
+
+class LocalCircuitState:
+    """
+    Состояние автоматических выключателей каналов в памяти процесса.
+
+    Используется при CIRCUIT_BREAKER_BACKEND = "local" и как запасной
+    вариант при недоступности Redis. Методы совпадают с RedisCircuitState.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._open_until = {}
+        self._tripped = set()
+        self._probe_until = {}
+
+    def allow(self, channel):
+        with self._lock:
+            now = time.monotonic()
+            if self._open_until.get(channel, 0) > now:
+                return False
+            if channel not in self._tripped:
+                return True
+            if self._probe_until.get(channel, 0) > now:
+                return False
+            self._probe_until[channel] = now + CIRCUIT_PROBE_SECONDS
+            return True
+
+    def record_success(self, channel):
+        with self._lock:
+            self._failures.pop(channel, None)
+            self._tripped.discard(channel)
+            self._probe_until.pop(channel, None)
+
+    def record_failure(self, channel):
+        with self._lock:
+            failures = self._failures.get(channel, 0) + 1
+            if channel in self._tripped or failures >= CIRCUIT_FAILURE_THRESHOLD:
+                self._open_until[channel] = time.monotonic() + CIRCUIT_OPEN_SECONDS
+                self._tripped.add(channel)
+                self._probe_until.pop(channel, None)
+                failures = 0
+            self._failures[channel] = failures
+
+
+class RedisCircuitState:
+    """
+    Состояние автоматических выключателей каналов, общее для всех воркеров.
+
+    Ключи Redis для канала:
+        <prefix>:<channel>:failures - счетчик неудач подряд;
+        <prefix>:<channel>:open - существует, пока выключатель открыт (TTL = CIRCUIT_OPEN_SECONDS);
+        <prefix>:<channel>:tripped - выключатель срабатывал и еще не закрыт успешной отправкой;
+        <prefix>:<channel>:probe - занят воркером, который отправляет пробное сообщение.
+    """
+    def __init__(self, url, prefix="notifier:breaker"):
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        self.prefix = prefix
+
+    def _key(self, channel, name):
+        return f"{self.prefix}:{channel}:{name}"
+
+    def allow(self, channel):
+        if self.client.exists(self._key(channel, "open")):
+            return False
+        if not self.client.exists(self._key(channel, "tripped")):
+            return True
+        probe_ms = CIRCUIT_PROBE_SECONDS * 1000
+        return bool(self.client.set(self._key(channel, "probe"), 1, px=probe_ms, nx=True))
+
+    def record_success(self, channel):
+        self.client.delete(
+            self._key(channel, "failures"),
+            self._key(channel, "tripped"),
+            self._key(channel, "probe"),
+        )
+
+    def record_failure(self, channel):
+        failures_key = self._key(channel, "failures")
+        tripped = self.client.exists(self._key(channel, "tripped"))
+
+        pipe = self.client.pipeline()
+        pipe.incr(failures_key)
+        pipe.expire(failures_key, CIRCUIT_OPEN_SECONDS * 10)
+        failures = pipe.execute()[0]
+
+        if tripped or failures >= CIRCUIT_FAILURE_THRESHOLD:
+            pipe = self.client.pipeline()
+            pipe.set(self._key(channel, "open"), 1, px=CIRCUIT_OPEN_SECONDS * 1000)
+            pipe.set(self._key(channel, "tripped"), 1, ex=CIRCUIT_OPEN_SECONDS * 10)
+            pipe.delete(failures_key, self._key(channel, "probe"))
+            pipe.execute()
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель (circuit breaker) для каждого канала отправки.
+
+    Состояния канала:
+        - закрыт: отправка разрешена; сбои провайдера подряд считаются
+          (отказ по конкретному получателю сбоем не считается, см.
+          NotificationService.attempt);
+        - открыт: после CIRCUIT_FAILURE_THRESHOLD сбоев подряд канал
+          пропускается на CIRCUIT_OPEN_SECONDS секунд, и уведомления сразу
+          уходят в следующий канал из CHANNEL_ORDER, не дожидаясь таймаута;
+        - полуоткрыт: по истечении CIRCUIT_OPEN_SECONDS отправку через канал
+          пробует только один воркер за раз (не чаще раза в
+          CIRCUIT_PROBE_SECONDS). Успех закрывает выключатель, неудача снова
+          открывает его.
+
+    При CIRCUIT_BREAKER_BACKEND = "redis" состояние общее для всех воркеров
+    Celery, поэтому падение провайдера замечается один раз, а не в каждом
+    процессе отдельно. Если Redis недоступен, на REDIS_RETRY_SECONDS
+    используется LocalCircuitState текущего процесса.
+
+    Методы:
+        allow(channel):
+            Возвращает True, если через канал можно отправлять сейчас.
+
+        record(channel, success):
+            Учитывает результат отправки через канал.
+
+        allow_async(channel), record_async(channel, success):
+            Корутины с тем же поведением для AsyncDeliveryEngine (запросы
+            к Redis выполняются в пуле потоков).
+    """
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, backend=None):
+        backend = backend or settings.CIRCUIT_BREAKER_BACKEND
+        self.local = LocalCircuitState()
+        self.shared = RedisCircuitState(settings.CIRCUIT_BREAKER_REDIS_URL) if backend == "redis" else None
+        self._shared_retry_at = 0
+
+    def _call(self, method, *args):
+        if self.shared is not None and time.monotonic() >= self._shared_retry_at:
+            try:
+                return getattr(self.shared, method)(*args)
+            except redis.RedisError as e:
+                print(f"Redis недоступен, состояние каналов хранится локально: {e}")
+                self._shared_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+        return getattr(self.local, method)(*args)
+
+    async def _call_async(self, method, *args):
+        # Клиент Redis синхронный: запрос выполняется в пуле потоков, чтобы не останавливать цикл событий
+        if self.shared is None:
+            return self._call(method, *args)
+        return await asyncio.to_thread(self._call, method, *args)
+
+    def allow(self, channel):
+        return self._call("allow", channel)
+
+    def record(self, channel, success):
+        self._call("record_success" if success else "record_failure", channel)
+
+    async def allow_async(self, channel):
+        return await self._call_async("allow", channel)
+
+    async def record_async(self, channel, success):
+        await self._call_async("record_success" if success else "record_failure", channel)
+
+
+_circuit_breaker = None
+
+
+def get_circuit_breaker():
+    """
+    Возвращает выключатель каналов текущего процесса (создается при первом вызове).
+    """
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
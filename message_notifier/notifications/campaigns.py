@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .constants import CAMPAIGN_CHUNK_SIZE
+from .models import Campaign, Notification
+from .outbox import add_to_outbox
+from .templating import compile_template
+from .utils import chunked
+
+
+def recipients(filters):
+    """
+    Возвращает QuerySet получателей рассылки по фильтру `filters`
+    ({lookup: значение}, ключи из CAMPAIGN_FILTERS; проверяются в API).
+    """
+    return get_user_model().objects.filter(is_active=True).filter(**filters)
+
+
+def progress(campaign):
+    """
+    Возвращает количество уведомлений рассылки по статусам
+    {"pending": ..., "sent": ..., "failed": ...} одним запросом
+    по индексу notif_campaign_status_idx.
+    """
+    counts = dict.fromkeys(("pending", "sent", "failed"), 0)
+    rows = (
+        Notification.objects
+        .filter(campaign=campaign)
+        .values_list("status")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    counts.update(rows)
+    return counts
+
+
+def store_chunk(campaign, rows, template):
+    """
+    Создает уведомления для части получателей `rows` и записывает их в
+    outbox в одной транзакции с продвижением курсора рассылки.
+
+    Строка рассылки блокируется (SELECT ... FOR UPDATE): если курсор в БД
+    уже не совпадает с курсором этого воркера (рассылку продолжил другой
+    воркер), часть не создается и возвращается False.
+    """
+    with transaction.atomic():
+        cursor = Campaign.objects.select_for_update().values_list("last_user_id", flat=True).get(pk=campaign.pk)
+        if cursor != campaign.last_user_id:
+            return False
+
+        if template is not None:
+            messages = template.render_many(rows)
+        else:
+            messages = [campaign.message] * len(rows)
+
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=row["pk"], message=message, campaign_id=campaign.pk, priority="low")
+            for row, message in zip(rows, messages)
+        ])
+        add_to_outbox([notification.id for notification in notifications])
+
+        campaign.last_user_id = rows[-1]["pk"]
+        campaign.created_count += len(rows)
+        Campaign.objects.filter(pk=campaign.pk).update(
+            last_user_id=campaign.last_user_id,
+            created_count=campaign.created_count,
+            updated_at=timezone.now()
+        )
+    return True
+
+
+def fan_out(campaign_id, chunk_size=CAMPAIGN_CHUNK_SIZE):
+    """
+    Создает уведомления рассылки для всех получателей, начиная с курсора.
+
+    Получатели читаются по возрастанию ID через серверный курсор
+    (.iterator(chunk_size)) только с полями, нужными шаблону, поэтому память
+    воркера не зависит от размера сегмента. Каждая часть сохраняется
+    store_chunk; задачи отправки публикует ретранслятор outbox
+    (process_notification_batch по BATCH_TASK_SIZE уведомлений). Уведомления
+    рассылки создаются с приоритетом "low" и обрабатываются в очереди bulk,
+    не задерживая обычные и срочные уведомления.
+
+    Возвращает:
+        Campaign: Рассылка после обработки.
+    """
+    campaign = Campaign.objects.select_related("template").get(pk=campaign_id)
+    if campaign.status == "completed":
+        return campaign
+
+    template = None
+    if campaign.template is not None:
+        template = compile_template(campaign.template_id, campaign.template.version, campaign.template.body)
+
+    if campaign.total is None:
+        campaign.total = recipients(campaign.filters).count()
+    campaign.status = "running"
+    Campaign.objects.filter(pk=campaign.pk).update(
+        status=campaign.status,
+        total=campaign.total,
+        updated_at=timezone.now()
+    )
+
+    rows = (
+        recipients(campaign.filters)
+        .filter(pk__gt=campaign.last_user_id)
+        .order_by("pk")
+        .values("pk", *(template.fields if template is not None else ()))
+        .iterator(chunk_size=chunk_size)
+    )
+    for chunk in chunked(rows, chunk_size):
+        if not store_chunk(campaign, chunk, template):
+            print(f"Рассылку {campaign.pk} продолжает другой воркер")
+            return campaign
+
+    campaign.status = "completed"
+    campaign.finished_at = timezone.now()
+    Campaign.objects.filter(pk=campaign.pk, last_user_id=campaign.last_user_id).update(
+        status=campaign.status,
+        finished_at=campaign.finished_at,
+        updated_at=campaign.finished_at
+    )
+    return campaign
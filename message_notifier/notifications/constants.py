@@ -1,9 +1,182 @@
 # Константа, задающая максимальное количество попыток отправки уведомления
 MAX_RETRIES = 3
 
-# Константа, задающая задержку между повторными попытками отправки (в секундах)
+# Константа, задающая задержку между повторными попытками отправки (в секундах).
+# Это задержка перед первым повтором: каждый следующий ждет вдвое дольше (со случайным разбросом)
 RETRY_DELAY_SECONDS = 60
 
+# Верхняя граница задержки между повторными попытками (в секундах)
+RETRY_MAX_DELAY_SECONDS = 3600
+
+# Через сколько секунд после запланированной попытки уведомление в статусе pending
+# считается зависшим и снова ставится в очередь периодической задачей
+STUCK_NOTIFICATION_GRACE_SECONDS = 600
+
+# Сколько зависших уведомлений подбирает один проход периодической задачи
+SWEEP_BATCH_SIZE = 1000
+
+# Сколько секунд после постановки в очередь (enqueued_at) уведомление считается
+# занятым своей задачей: пока аренда не истекла, периодическая задача не ставит
+# его в очередь повторно, даже если задача долго ждет в очереди с отставанием
+ENQUEUE_LEASE_SECONDS = 1800
+
 # Кортеж, определяющий порядок каналов для отправки уведомлений
 # Порядок имеет значение: сначала SMS, затем Email, затем Telegram
 CHANNEL_ORDER = ("sms", "email", "telegram")
+
+# Размер пачки, которой массовый эндпоинт вставляет уведомления в БД (bulk_create)
+BULK_CHUNK_SIZE = 1000
+
+# Максимальное количество элементов в одном запросе массового создания уведомлений
+BULK_MAX_ITEMS = 10000
+
+# Сколько уведомлений обрабатывает одна задача process_notification_batch.
+# Значение 1 возвращает постановку отдельной задачи process_notification на каждое уведомление
+BATCH_TASK_SIZE = 100
+
+# Лимиты частоты отправки по каналам: (сообщений в секунду, размер всплеска).
+# Telegram Bot API допускает около 30 сообщений в секунду на бота
+CHANNEL_RATE_LIMITS = {
+    "sms": (10, 10),
+    "email": (5, 5),
+    "telegram": (30, 30),
+}
+
+# Сколько номеров отправляется одним запросом к SMS.ru при пакетной обработке
+# уведомлений с одинаковым текстом (SMS.ru принимает до 100 номеров в запросе).
+# Значение 1 отключает групповую отправку
+SMS_BATCH_SIZE = 100
+
+# Сколько неудачных отправок через канал подряд открывают автоматический выключатель канала
+CIRCUIT_FAILURE_THRESHOLD = 5
+
+# На сколько секунд открытый выключатель исключает канал из цепочки отправки
+CIRCUIT_OPEN_SECONDS = 30
+
+# Как часто (в секундах) через полуоткрытый выключатель пропускается пробная отправка
+CIRCUIT_PROBE_SECONDS = 15
+
+# Сколько секунд после истечения DELIVERY_BUDGET_SECONDS хеджированная отправка
+# ждет исхода запросов, уже ушедших провайдерам (их таймаут ограничен бюджетом)
+HEDGE_SETTLE_SECONDS = 5
+
+# Адаптивный порядок каналов (CHANNEL_ORDERING = "adaptive"):
+# сколько последних попыток по каждому каналу учитывается в статистике
+CHANNEL_STATS_WINDOW = 200
+
+# Попытки старше этого срока (в секундах) не учитываются в статистике канала
+CHANNEL_STATS_MAX_AGE_SECONDS = 300
+
+# Сколько попыток нужно, чтобы порядок канала определялся его статистикой
+ADAPTIVE_MIN_SAMPLES = 20
+
+# Канал с меньшей долей успешных отправок считается неработающим и ставится в конец цепочки
+ADAPTIVE_MIN_SUCCESS_RATE = 0.8
+
+# Время жизни закэшированного статуса уведомления (секунды)
+STATUS_CACHE_TIMEOUT = 300
+
+# Сколько уведомлений можно отслеживать в одном потоке статусов
+STATUS_STREAM_MAX_IDS = 100
+
+# Как часто отправлять комментарий keep-alive в SSE-поток (секунды)
+STATUS_STREAM_KEEPALIVE_SECONDS = 15
+
+# Сколько long-poll запрос ждет обновления, прежде чем вернуть пустой ответ (секунды)
+STATUS_POLL_TIMEOUT = 25
+
+# Сколько событий отправляется в одном запросе к webhook; при накоплении
+# стольких событий пачка отправляется, не дожидаясь периодической задачи
+WEBHOOK_BATCH_SIZE = 100
+
+# Таймаут запроса к webhook (секунды)
+WEBHOOK_TIMEOUT = 10
+
+# Не чаще чем раз в столько секунд на подписку проверяется, набралась ли
+# пачка, и запускается ее отправка (общий для воркеров ключ в кэше)
+WEBHOOK_TRIGGER_DEBOUNCE_SECONDS = 1
+
+# На сколько секунд flush_subscription откладывает события пачки, пока
+# отправляет ее: другие задачи их не берут, а если воркер упал во время
+# запроса, события снова станут готовыми к доставке
+WEBHOOK_LEASE_SECONDS = WEBHOOK_TIMEOUT * 3
+
+# Максимальное количество попыток доставки события и задержки между ними
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_RETRY_DELAY_SECONDS = 10
+WEBHOOK_RETRY_MAX_DELAY_SECONDS = 900
+
+# Сколько секунд воркер использует загруженный список активных подписок
+WEBHOOK_SUBSCRIPTIONS_TTL = 30
+
+# Статусы уведомлений, о которых сообщается webhook-подпискам
+WEBHOOK_STATUSES = ("sent", "failed")
+
+# Сколько строк outbox ретранслятор забирает и публикует за один проход
+OUTBOX_RELAY_BATCH_SIZE = 1000
+
+# Версия формата снимка уведомления в payload задачи (notifications.snapshots).
+# Снимки другой версии воркер не разбирает, а обрабатывает уведомление по ID из БД
+SNAPSHOT_SCHEMA = 1
+
+# Размер страницы списка уведомлений по умолчанию и максимальный
+LIST_PAGE_SIZE = 50
+LIST_MAX_PAGE_SIZE = 500
+
+# Сколько секунд помнить Idempotency-Key в Redis (в БД ключ хранится бессрочно)
+IDEMPOTENCY_KEY_TTL = 86400
+
+# Поля пользователя, которые можно подставлять в шаблоны уведомлений ({{ first_name }})
+TEMPLATE_FIELDS = ("first_name", "last_name", "email", "username", "phone_number", "telegram_id")
+
+# Сколько скомпилированных шаблонов хранится в кэше процесса воркера
+TEMPLATE_CACHE_SIZE = 256
+
+# Максимальное количество получателей в одном запросе на отправку по шаблону
+TEMPLATE_SEND_MAX_USERS = 10000
+
+# Фильтры по пользователям, которые можно задать в рассылке (Campaign.filters).
+# Неактивные пользователи в рассылку не попадают никогда
+CAMPAIGN_FILTERS = (
+    "id__in",
+    "date_joined__gte",
+    "date_joined__lte",
+    "last_login__gte",
+    "last_login__lte",
+    "last_login__isnull",
+    "email__iendswith",
+    "phone_number__startswith",
+    "telegram_id__isnull",
+)
+
+# Сколько получателей рассылки читается через серверный курсор и создается за одну транзакцию
+CAMPAIGN_CHUNK_SIZE = 1000
+
+# Через сколько секунд без прогресса рассылка в статусе running считается прерванной
+# и продолжается с сохраненной позиции
+CAMPAIGN_STALL_SECONDS = 300
+
+# Сколько уведомлений пользователя объединяется в один дайджест (остальные уйдут следующим)
+DIGEST_MAX_ITEMS = 50
+
+# Первая строка текста дайджеста; уведомления идут следом через пустую строку
+DIGEST_HEADER = "Новых уведомлений: {count}"
+
+# На сколько секунд дайджест арендует объединенные уведомления на время отправки
+# (next_attempt_at и enqueued_at); больше DELIVERY_BUDGET_SECONDS + HEDGE_SETTLE_SECONDS
+DIGEST_LEASE_SECONDS = 120
+
+# Очередь Celery для уведомлений каждого приоритета (Notification.priority)
+PRIORITY_QUEUES = {
+    "high": "priority",
+    "normal": "default",
+    "low": "bulk",
+}
+
+# Очередь Celery задач отдельного канала (send_via_channel, при CHANNEL_TASKS = True).
+# Срочные уведомления остаются в очереди priority на всех каналах
+CHANNEL_QUEUES = {
+    "email": "email",
+    "sms": "sms",
+    "telegram": "telegram",
+}
@@ -0,0 +1,152 @@
+import hashlib
+import math
+import time
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from .constants import IDEMPOTENCY_KEY_TTL
+from .models import Notification
+
+
+def digest(*parts):
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class DedupKeys:
+    """
+    Ключи дедупликации одного запроса на создание уведомления.
+
+    С заголовком Idempotency-Key ключ - хэш (пользователь, ключ), он
+    хранится в БД бессрочно. Без заголовка, если включено окно
+    NOTIFICATION_DEDUP_WINDOW, ключ - хэш (пользователь, текст, номер окна):
+    в БД ищутся ключи текущего и предыдущего окна не старше окна, поэтому
+    повтор на границе окон тоже находится.
+
+    Атрибуты:
+        idempotent (bool): Ключ получен из Idempotency-Key.
+        redis_key (str): Ключ быстрой проверки в Redis.
+        redis_ttl (int): Время жизни ключа в Redis (секунды).
+        db_key (str): Значение Notification.dedup_key для нового уведомления.
+        db_keys (list[str]): Значения dedup_key, которые считаются повтором.
+        since (datetime | None): Повтором считаются уведомления не старше этого момента.
+    """
+    def __init__(self, user_id, message, idempotency_key=None, window=None):
+        window = settings.NOTIFICATION_DEDUP_WINDOW if window is None else window
+        self.idempotent = bool(idempotency_key)
+
+        if self.idempotent:
+            key = digest("idempotency", user_id, idempotency_key)
+            self.redis_key = f"notifier:dedup:{key}"
+            self.redis_ttl = IDEMPOTENCY_KEY_TTL
+            self.db_key = key
+            self.db_keys = [key]
+            self.since = None
+        else:
+            bucket = int(time.time() // window)
+            self.redis_key = f"notifier:dedup:{digest('content', user_id, message)}"
+            self.redis_ttl = window
+            self.db_key = digest("content", user_id, message, bucket)
+            self.db_keys = [self.db_key, digest("content", user_id, message, bucket - 1)]
+            self.since = timezone.now() - timedelta(seconds=window)
+
+    @classmethod
+    def for_request(cls, user_id, message, idempotency_key=None):
+        """
+        Возвращает ключи для запроса или None, если дедупликация не нужна
+        (нет Idempotency-Key и окно выключено).
+        """
+        if not idempotency_key and not settings.NOTIFICATION_DEDUP_WINDOW:
+            return None
+        return cls(user_id, message, idempotency_key)
+
+
+class Deduplicator:
+    """
+    Поиск уже созданного уведомления по ключам дедупликации.
+
+    Сначала проверяется Redis (ключ -> ID уведомления), затем БД по
+    уникальному индексу notif_dedup_key_uniq. Если Redis недоступен,
+    на REDIS_RETRY_SECONDS используется только БД.
+
+    Методы:
+        find(keys):
+            Возвращает ID существующего уведомления или None.
+
+        remember(keys, notification_id, ttl=None):
+            Запоминает ID созданного уведомления в Redis на `ttl` секунд
+            (по умолчанию keys.redis_ttl). Для уведомления, найденного в БД
+            по окну, ttl - остаток его окна.
+    """
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, url=None):
+        url = url or settings.DEDUP_REDIS_URL
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        self._retry_at = 0
+
+    def _redis(self, method, *args, **kwargs):
+        if time.monotonic() < self._retry_at:
+            return None
+        try:
+            return getattr(self.client, method)(*args, **kwargs)
+        except redis.RedisError as e:
+            print(f"Redis недоступен, дедупликация проверяется по БД: {e}")
+            self._retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+            return None
+
+    def find(self, keys):
+        cached = self._redis("get", keys.redis_key)
+        if cached is not None:
+            return int(cached)
+
+        queryset = Notification.objects.filter(dedup_key__in=keys.db_keys)
+        if keys.since is not None:
+            queryset = queryset.filter(created_at__gte=keys.since)
+        found = queryset.values_list("id", "created_at").first()
+        if found is None:
+            return None
+
+        notification_id, created_at = found
+        ttl = keys.redis_ttl
+        if keys.since is not None:
+            # Ключ окна живет в Redis только до конца окна найденного уведомления
+            ttl = math.ceil(keys.redis_ttl - (timezone.now() - created_at).total_seconds())
+        if ttl > 0:
+            self.remember(keys, notification_id, ttl)
+        return notification_id
+
+    def remember(self, keys, notification_id, ttl=None):
+        self._redis("set", keys.redis_key, notification_id, ex=ttl or keys.redis_ttl)
+
+
+def find_duplicates(keys):
+    """
+    Проверяет пачку ключей (список DedupKeys) одним запросом к БД, без
+    Redis - для уведомлений, которые создаются пачкой в воркере.
+    Возвращает множество db_key ключей, для которых уведомление уже создано.
+    """
+    if not keys:
+        return set()
+
+    queryset = Notification.objects.filter(dedup_key__in=[key for k in keys for key in k.db_keys])
+    since = [k.since for k in keys if k.since is not None]
+    if len(since) == len(keys):
+        queryset = queryset.filter(created_at__gte=min(since))
+    found = set(queryset.values_list("dedup_key", flat=True))
+    return {k.db_key for k in keys if found.intersection(k.db_keys)}
+
+
+_deduplicator = None
+
+
+def get_deduplicator():
+    """
+    Возвращает дедупликатор текущего процесса (создается при первом вызове).
+    """
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = Deduplicator()
+    return _deduplicator
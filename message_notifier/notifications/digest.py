@@ -0,0 +1,148 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .constants import DIGEST_HEADER, DIGEST_LEASE_SECONDS, DIGEST_MAX_ITEMS
+from .models import Notification
+from .services import NotificationService
+
+# Поля результата отправки, которые дайджест копирует во все объединенные уведомления.
+# При неудаче объединенные уведомления получают время повторной попытки первого
+# и при ней снова объединяются с ним (задачу повторной попытки получает только первое)
+RESULT_FIELDS = ("status", "last_channel", "sent_at", "retry_count", "next_attempt_at", "enqueued_at")
+
+
+def split_window(notifications, now=None):
+    """
+    Делит уведомления на готовые к отправке и те, окно дайджеста которых
+    (NOTIFICATION_DIGEST_WINDOW секунд от создания) еще не закрылось.
+    Повторные попытки (retry_count > 0) окна не ждут.
+
+    Возвращает:
+        tuple[list[Notification], list[Notification]]: (готовые, ожидающие окна).
+    """
+    now = now or timezone.now()
+    window = timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW)
+
+    due, early = [], []
+    for notification in notifications:
+        if notification.retry_count == 0 and notification.created_at + window > now:
+            early.append(notification)
+        else:
+            due.append(notification)
+    return due, early
+
+
+def defer(notifications):
+    """
+    Переносит попытку уведомлений на закрытие окна дайджеста
+    (next_attempt_at = created_at + окно) вместе с арендой задачи
+    (enqueued_at). Задачи на это время ставит вызывающий код.
+    """
+    window = timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW)
+    for notification in notifications:
+        notification.next_attempt_at = notification.created_at + window
+        notification.enqueued_at = notification.next_attempt_at
+    Notification.objects.bulk_update(notifications, ["next_attempt_at", "enqueued_at"])
+
+
+def build_digest(messages):
+    """
+    Возвращает текст дайджеста из текстов уведомлений.
+    """
+    return "\n\n".join([DIGEST_HEADER.format(count=len(messages)), *messages])
+
+
+def deliver_merged(notifications):
+    """
+    Отправляет уведомления одного пользователя одним сообщением и
+    записывает результат этой отправки во все уведомления (не сохраняя их).
+    """
+    head = notifications[0]
+    if len(notifications) == 1:
+        NotificationService.deliver(head)
+        return
+
+    message = head.message
+    head.message = build_digest([notification.message for notification in notifications])
+    try:
+        NotificationService.deliver(head)
+    finally:
+        head.message = message
+
+    for notification in notifications[1:]:
+        for field in RESULT_FIELDS:
+            setattr(notification, field, getattr(head, field))
+
+
+def claim(user_id, now=None):
+    """
+    Арендует до DIGEST_MAX_ITEMS уведомлений пользователя в статусе pending
+    для отправки одним дайджестом: время которых наступило (новые и
+    повторные попытки) и новые, отложенные до закрытия окна (defer).
+
+    Строки блокируются (SKIP LOCKED) только в короткой транзакции, в которой
+    next_attempt_at и enqueued_at переносятся на DIGEST_LEASE_SECONDS вперед:
+    параллельная задача их уже не выберет, а если воркер упадет во время
+    отправки, после аренды уведомления снова станут доступны.
+
+    Возвращает:
+        list[Notification]: Арендованные уведомления (без загруженных пользователей).
+    """
+    now = now or timezone.now()
+    window = timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW)
+    lease = now + timedelta(seconds=DIGEST_LEASE_SECONDS)
+
+    with transaction.atomic():
+        merged = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .filter(user_id=user_id, status="pending")
+            .filter(Q(next_attempt_at__lte=now) | Q(retry_count=0, next_attempt_at=F("created_at") + window))
+            .order_by("created_at", "id")[:DIGEST_MAX_ITEMS]
+        )
+        for notification in merged:
+            notification.next_attempt_at = lease
+            notification.enqueued_at = lease
+        Notification.objects.bulk_update(merged, ["next_attempt_at", "enqueued_at"])
+
+    return merged
+
+
+def send_digests(notifications):
+    """
+    Отправляет дайджесты пользователям уведомлений `notifications`.
+
+    Для каждого пользователя уведомления арендуются (claim), отправляются
+    одним сообщением (deliver_merged) вне транзакции и сохраняются одним
+    bulk_update. Уведомления, арендованные параллельной задачей,
+    пропускаются: их отправит она. Результаты сохраняются сразу, без
+    отложенной записи, чтобы следующая задача не отправила те же
+    уведомления повторно.
+
+    Возвращает:
+        list[Notification]: Первые уведомления отправленных дайджестов (по
+            одному на пользователя). Повторную попытку дайджеста планирует
+            только первое уведомление, остальные объединяются с ним заново.
+    """
+    users = {}
+    for notification in notifications:
+        users.setdefault(notification.user_id, notification.user)
+
+    now = timezone.now()
+    result = []
+    for user_id, user in users.items():
+        merged = claim(user_id, now)
+        if not merged:
+            continue
+
+        for notification in merged:
+            notification.user = user
+        deliver_merged(merged)
+        NotificationService.save_batch(merged)
+
+        result.append(merged[0])
+    return result
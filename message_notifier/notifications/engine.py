@@ -0,0 +1,211 @@
+import asyncio
+import time
+
+import aiohttp
+from django.conf import settings
+
+from .breaker import get_circuit_breaker
+from .constants import HEDGE_SETTLE_SECONDS
+from .ratelimit import get_rate_limiter
+from .senders.base import ProviderUnavailable, RateLimitExceeded, SyncSenderAdapter
+from .senders.sms import AsyncSMSSender
+from .senders.telegram import AsyncTelegramSender
+from .stats import get_channel_stats
+from .services import EXHAUSTED_FIELDS, SENDERS_MAP, NotificationService
+
+
+class AsyncDeliveryEngine:
+    """
+    Асинхронный движок доставки уведомлений.
+
+    Выполняет ту же логику fallback по каналам, что и
+    NotificationService.deliver, но в цикле событий asyncio: пока одно
+    уведомление ждет ответа SMS.ru или Telegram, остальные продолжают
+    отправляться. Количество одновременных доставок ограничено семафором.
+
+    Перед каждой отправкой проверяется выключатель канала и ожидается
+    токен RateLimiter канала (пауза через asyncio.sleep, запросы к Redis
+    выключателя и ограничителя - в пуле потоков), ответы 429
+    приостанавливают канал так же, как в NotificationService.attempt.
+
+    Каждое уведомление ограничено бюджетом DELIVERY_BUDGET_SECONDS: как в
+    NotificationService.deliver, остаток бюджета передается в попытку
+    каждого канала таймаутом (ожидание токена и запрос к провайдеру), а
+    не отменой корутины - поток SyncSenderAdapter отменить нельзя. При
+    DELIVERY_MODE = "hedged" каналы запускаются внахлест, как в
+    NotificationService.deliver_hedged, а проигравшие запросы отменяются
+    (после исчерпания бюджета - не раньше чем через HEDGE_SETTLE_SECONDS).
+
+    SMS и Telegram отправляются через aiohttp с общей сессией на весь
+    прогон. Email отправляется синхронным EmailSender (через его пул
+    SMTP-соединений) в пуле потоков с помощью SyncSenderAdapter.
+
+    Атрибуты:
+        concurrency (int): Максимальное количество одновременных доставок.
+        timeout (int): Общий таймаут одного HTTP-запроса в секундах.
+
+    Методы:
+        deliver_many(notifications):
+            Корутина. Отправляет уведомления конкурентно, меняя их поля в памяти.
+
+        run(notifications):
+            Синхронная обертка над deliver_many для кода вне цикла событий
+            (например, задач Celery).
+
+        send_batch(notifications):
+            Отправляет пачку через run() и сохраняет результаты (NotificationService.persist).
+            Пользователи должны быть загружены заранее (select_related("user")).
+    """
+    def __init__(self, concurrency=None, timeout=None):
+        self.concurrency = concurrency or settings.ASYNC_DELIVERY_CONCURRENCY
+        self.timeout = timeout or settings.ASYNC_DELIVERY_TIMEOUT
+
+    def build_senders(self, session):
+        return {
+            "sms": AsyncSMSSender(session),
+            "email": SyncSenderAdapter(SENDERS_MAP["email"]),
+            "telegram": AsyncTelegramSender(session),
+        }
+
+    async def attempt(self, channel, sender, user, message, timeout=None):
+        breaker = get_circuit_breaker()
+        limiter = get_rate_limiter()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        if not await breaker.allow_async(channel):
+            return False
+
+        for _ in range(2):
+            left = None if deadline is None else deadline - time.monotonic()
+            if not await limiter.wait_async(channel, left):
+                return False
+
+            left = None if deadline is None else deadline - time.monotonic()
+            if left is not None and left <= 0:
+                return False
+
+            started = time.monotonic()
+            outage = False
+            try:
+                success = await sender.send(user, message, timeout=left)
+            except RateLimitExceeded as e:
+                await limiter.block_async(channel, e.retry_after)
+                continue
+            except ProviderUnavailable:
+                success, outage = False, True
+            except Exception as e:
+                success = False
+
+            get_channel_stats().record(channel, time.monotonic() - started, success)
+            if success or outage:
+                await breaker.record_async(channel, success)
+            return success
+
+        return False
+
+    async def deliver_sequential(self, notification, channels, senders):
+        deadline = time.monotonic() + settings.DELIVERY_BUDGET_SECONDS
+
+        for channel in channels:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+
+            success = await self.attempt(
+                channel, senders[channel], notification.user, notification.message, left
+            )
+
+            update_fields = NotificationService.record_attempt(notification, channel, success)
+            if update_fields:
+                return update_fields
+
+        return NotificationService.record_failure(notification)
+
+    async def deliver_hedged(self, notification, channels, senders):
+        loop = asyncio.get_running_loop()
+        remaining = list(channels)
+        running = {}
+        deadline = loop.time() + settings.DELIVERY_BUDGET_SECONDS
+        next_launch = loop.time()
+
+        try:
+            while remaining or running:
+                now = loop.time()
+                if now >= deadline:
+                    break
+
+                if remaining and (not running or now >= next_launch):
+                    channel = remaining.pop(0)
+                    task = asyncio.create_task(self.attempt(
+                        channel, senders[channel], notification.user, notification.message,
+                        deadline - now
+                    ))
+                    running[task] = channel
+                    notification.last_channel = channel
+                    next_launch = now + settings.HEDGE_DELAY_SECONDS
+                    continue
+
+                wake_at = min(deadline, next_launch) if remaining else deadline
+                done, _ = await asyncio.wait(
+                    running, timeout=wake_at - now, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    channel = running.pop(task)
+                    if task.result():
+                        return NotificationService.record_attempt(notification, channel, True)
+                    next_launch = loop.time()
+
+            # Бюджет исчерпан: даем запущенным попыткам HEDGE_SETTLE_SECONDS
+            # завершиться, чтобы успех, пришедший в последний момент, был
+            # учтен, а не отправлен повторно при следующей попытке
+            if running:
+                done, _ = await asyncio.wait(running, timeout=HEDGE_SETTLE_SECONDS)
+                for task in done:
+                    if task.result():
+                        return NotificationService.record_attempt(notification, running[task], True)
+        finally:
+            for task in running:
+                task.cancel()
+
+        return NotificationService.record_failure(notification)
+
+    async def deliver(self, notification, senders, semaphore):
+        async with semaphore:
+            if NotificationService.check_exhausted(notification):
+                return EXHAUSTED_FIELDS
+
+            channels = NotificationService.channel_order(notification)
+
+            if settings.DELIVERY_MODE == "hedged":
+                return await self.deliver_hedged(notification, channels, senders)
+
+            return await self.deliver_sequential(notification, channels, senders)
+
+    async def deliver_many(self, notifications):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_IDLE
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            senders = self.build_senders(session)
+            await asyncio.gather(*(
+                self.deliver(notification, senders, semaphore)
+                for notification in notifications
+            ))
+
+        return notifications
+
+    def run(self, notifications):
+        return asyncio.run(self.deliver_many(list(notifications)))
+
+    def send_batch(self, notifications):
+        notifications = self.run(notifications)
+
+        NotificationService.persist(notifications)
+
+        return notifications
@@ -0,0 +1,107 @@
+import json
+import time
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+CHANNEL_PREFIX = "notifier:status-events"
+
+
+def status_channel(pk):
+    return f"{CHANNEL_PREFIX}:{pk}"
+
+
+class StatusPublisher:
+    """
+    Публикует изменения статусов уведомлений в Redis pub/sub.
+
+    Каждое уведомление публикуется в свой канал (status_channel), сообщение -
+    запись кэша статуса (см. status_cache.build_status_entry) в JSON. Все
+    записи пачки уходят одним конвейером (pipeline). Если Redis недоступен,
+    публикация пропускается на REDIS_RETRY_SECONDS: подписчики в этом случае
+    получат актуальный статус при переподключении из кэша статусов.
+
+    Методы:
+        publish(entries):
+            Публикует записи кэша статусов.
+    """
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        self._retry_at = 0
+
+    def publish(self, entries):
+        if not entries or time.monotonic() < self._retry_at:
+            return
+
+        pipe = self.client.pipeline(transaction=False)
+        for entry in entries:
+            pipe.publish(status_channel(entry["data"]["id"]), json.dumps(entry, cls=DjangoJSONEncoder))
+
+        try:
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"Redis недоступен, обновления статусов не публикуются: {e}")
+            self._retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+
+
+_status_publisher = None
+
+
+def get_status_publisher():
+    """
+    Возвращает публикатор статусов текущего процесса (создается при первом вызове).
+    """
+    global _status_publisher
+    if _status_publisher is None:
+        _status_publisher = StatusPublisher(settings.STATUS_EVENTS_REDIS_URL)
+    return _status_publisher
+
+
+def publish_statuses(entries):
+    get_status_publisher().publish(entries)
+
+
+async def subscribe(ids):
+    """
+    Подписывается на изменения статусов уведомлений `ids`.
+    Возвращает объект PubSub redis.asyncio; закрывать его нужно через close_subscription.
+
+    Исключения:
+        redis.RedisError: Если Redis недоступен.
+    """
+    client = aioredis.Redis.from_url(settings.STATUS_EVENTS_REDIS_URL, socket_connect_timeout=1)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(*(status_channel(pk) for pk in ids))
+    except redis.RedisError:
+        await close_subscription(pubsub)
+        raise
+    return pubsub
+
+
+async def close_subscription(pubsub):
+    try:
+        await pubsub.unsubscribe()
+    except redis.RedisError:
+        pass
+    await pubsub.aclose()
+    await pubsub.connection_pool.disconnect()
+
+
+async def next_entry(pubsub, timeout):
+    """
+    Ждет следующую запись статуса не дольше `timeout` секунд.
+    Возвращает запись (dict) или None, если за это время обновлений не было.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+        if message is not None:
+            return json.loads(message["data"])
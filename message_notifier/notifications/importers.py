@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from notifications.api.serializers import NotificationImportSerializer
+from users.constants import IMPORT_CHUNK_SIZE
+from users.importers import validate_chunk
+
+from .dedup import DedupKeys
+from .models import Notification
+from .outbox import add_to_outbox
+from .utils import chunked
+
+
+def import_notifications(rows, report, chunk_size=IMPORT_CHUNK_SIZE, queue=True, progress=None):
+    """
+    Импортирует уведомления пачками по `chunk_size` строк.
+
+    Пользователи (по ID или email) и уже использованные idempotency_key
+    ищутся одним запросом на пачку. Уведомления вставляются одним
+    bulk_create, при `queue` - вместе со строками outbox в той же
+    транзакции (задачи отправки публикует ретранслятор outbox).
+    Строки с уже использованным ключом пропускаются. Чтение файла, проверка
+    строк и отчет общие с импортом пользователей (users.importers).
+
+    Аргументы:
+        rows: Строки из read_rows.
+        report (ImportReport): Счетчики и ошибки.
+        queue (bool): Ставить ли уведомления в очередь на отправку.
+        progress (callable | None): Вызывается после каждой пачки.
+    """
+    User = get_user_model()
+
+    for chunk in chunked(rows, chunk_size):
+        valid = validate_chunk(chunk, NotificationImportSerializer, report)
+
+        ids = {data["user"] for _, data in valid if "user" in data}
+        emails = {data["email"] for _, data in valid if "user" not in data}
+        found = User.objects.filter(Q(pk__in=ids) | Q(email__in=emails)).values_list("pk", "email")
+        user_ids = set()
+        by_email = {}
+        for pk, email in found:
+            user_ids.add(pk)
+            by_email[email] = pk
+
+        items = []
+        for line, data in valid:
+            user_id = data["user"] if "user" in data else by_email.get(data["email"])
+            if user_id not in user_ids:
+                report.error(line, "Пользователь не найден")
+                continue
+            key = None
+            if data.get("idempotency_key"):
+                key = DedupKeys(user_id, data["message"], data["idempotency_key"]).db_key
+            items.append((line, user_id, data["message"], data["priority"], key))
+
+        keys = [key for *_, key in items if key]
+        used = set(Notification.objects.filter(dedup_key__in=keys).values_list("dedup_key", flat=True))
+
+        lines = []
+        notifications = []
+        for line, user_id, message, priority, key in items:
+            if key in used:
+                report.skipped += 1
+                continue
+            if key:
+                used.add(key)
+            lines.append(line)
+            notifications.append(Notification(user_id=user_id, message=message, priority=priority, dedup_key=key))
+
+        try:
+            with transaction.atomic():
+                Notification.objects.bulk_create(notifications)
+                if queue:
+                    add_to_outbox([notification.id for notification in notifications])
+        except IntegrityError:
+            # idempotency_key пачки параллельно использовал другой запрос
+            for line in lines:
+                report.error(line, "Конфликт idempotency_key, пачка не импортирована")
+        else:
+            report.created += len(notifications)
+
+        if progress is not None:
+            progress()
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from notifications.importers import import_notifications
+from users.constants import IMPORT_CHUNK_SIZE
+from users.importers import IMPORT_FORMATS, ImportReport, open_import
+
+
+class Command(BaseCommand):
+    """
+    Импорт уведомлений из CSV или NDJSON.
+
+    Файл читается построчно и обрабатывается пачками по --chunk-size строк
+    (notifications.importers.import_notifications). Уведомления ставятся в
+    очередь через outbox (если не указан --no-queue). После каждой пачки
+    выводятся счетчики и скорость, ошибки строк - в stderr и в файл --errors.
+
+    Колонки: user (ID) или email, message, idempotency_key и priority (необязательно).
+
+    Запуск:
+        python manage.py import_notifications notifications.ndjson
+        python manage.py import_notifications backlog.csv --no-queue
+    """
+    help = "Импортирует уведомления из CSV или NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Путь к файлу ("-" - stdin)')
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="Формат файла (по умолчанию - по расширению)")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument("--no-queue", action="store_true", help="Не ставить уведомления в очередь на отправку")
+        parser.add_argument("--errors", help="Файл для ошибок строк (NDJSON)")
+
+    def handle(self, *args, **options):
+        with open_import(options["path"], options["format"], options["errors"]) as (rows, errors_file):
+            report = ImportReport(errors_file)
+            import_notifications(
+                rows,
+                report,
+                chunk_size=options["chunk_size"],
+                queue=not options["no_queue"],
+                progress=lambda: self.stdout.write(report.summary())
+            )
+
+        self.stdout.write(f"Импорт завершен: {report.summary()}")
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.constants import OUTBOX_RELAY_BATCH_SIZE
+from notifications.outbox import relay_outbox
+
+
+class Command(BaseCommand):
+    """
+    Ретранслятор outbox: публикует задачи для уведомлений, записанных в
+    NotificationOutbox, пачками по --batch-size.
+
+    Пока пачки полные, следующая берется сразу; когда outbox пуст, команда
+    ждет OUTBOX_RELAY_INTERVAL секунд. Ошибки (недоступен брокер или БД)
+    выводятся, и проход повторяется после паузы. Перед каждым проходом и
+    после ошибки устаревшие и сломанные соединения с БД закрываются
+    (close_old_connections), как после запроса в Django, поэтому после
+    перезапуска БД команда переподключается сама.
+
+    Запуск:
+        python manage.py relay_outbox
+        python manage.py relay_outbox --once
+    """
+    help = "Публикует задачи для уведомлений из outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_RELAY_BATCH_SIZE)
+        parser.add_argument("--interval", type=float, default=settings.OUTBOX_RELAY_INTERVAL)
+        parser.add_argument("--once", action="store_true", help="Опубликовать outbox и выйти")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        while True:
+            close_old_connections()
+            try:
+                relayed = relay_outbox(batch_size)
+            except Exception as e:
+                print(f"Ошибка ретрансляции outbox: {e}")
+                close_old_connections()
+                relayed = 0
+
+            if relayed:
+                self.stdout.write(f"Опубликовано уведомлений: {relayed}")
+
+            if relayed < batch_size:
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
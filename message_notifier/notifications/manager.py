@@ -1,3 +1,8 @@
+import asyncio
+
+from notifications.senders.base import AsyncBaseSender, SyncSenderAdapter
+
+
 class NotificationManager:
     """
     Менеджер уведомлений, отвечающий за отправку сообщений через несколько каналов.
@@ -28,6 +33,14 @@ class NotificationManager:
                 - Исключения при отправке конкретным каналом обрабатываются внутри метода,
                   чтобы не прерывать отправку через другие каналы.
                 - Каналы обрабатываются в том порядке, в котором они переданы в конструктор.
+
+        anotify(user, message):
+            Асинхронный вариант notify: отправляет сообщение через все каналы
+            одновременно. Принимает как AsyncBaseSender, так и синхронные
+            отправители (они выполняются в пуле потоков через SyncSenderAdapter).
+
+            Возвращает:
+                dict: Результаты в том же формате, что и notify.
     """
     def __init__(self, senders):
         self.senders = senders
@@ -42,3 +55,17 @@ class NotificationManager:
             except Exception as e:
                 results[sender_name] = f"ERROR: {e}"
         return results
+
+    async def anotify(self, user, message: str) -> dict:
+        async def send(sender):
+            if not isinstance(sender, AsyncBaseSender):
+                sender = SyncSenderAdapter(sender)
+            try:
+                success = await sender.send(user, message)
+                return "OK" if success else "FAIL"
+            except Exception as e:
+                return f"ERROR: {e}"
+
+        names = [sender.__class__.__name__ for sender in self.senders]
+        results = await asyncio.gather(*(send(sender) for sender in self.senders))
+        return dict(zip(names, results))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Индексы строятся через CREATE INDEX CONCURRENTLY, чтобы не блокировать
+    # запись в таблицу с миллионами строк; такие операции нельзя выполнять в транзакции.
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0003_notification_next_attempt_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['status', 'created_at'], name='notif_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at'], name='notif_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at'], name='notif_pending_idx'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:02
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Индекс строится через CREATE INDEX CONCURRENTLY, чтобы не блокировать
+    # запись в таблицу; такие операции нельзя выполнять в транзакции.
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0008_notificationoutbox_payload'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['created_at', 'id'], name='notif_created_id_idx'),
+        ),
+    ]
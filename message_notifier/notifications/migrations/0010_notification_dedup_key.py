@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Уникальный индекс строится через CREATE UNIQUE INDEX CONCURRENTLY, чтобы не
+    # блокировать запись в таблицу; такие операции нельзя выполнять в транзакции.
+    # Частичный уникальный индекс и есть ограничение notif_dedup_key_uniq, поэтому
+    # состояние моделей получает AddConstraint, а в БД выполняется только индекс.
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0009_notification_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='dedup_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='notification',
+                    constraint=models.UniqueConstraint(condition=models.Q(('dedup_key__isnull', False)), fields=('dedup_key',), name='notif_dedup_key_uniq'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql='CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "notif_dedup_key_uniq" '
+                        'ON "notifications_notification" ("dedup_key") WHERE "dedup_key" IS NOT NULL',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "notif_dedup_key_uniq"',
+                ),
+            ],
+        ),
+    ]
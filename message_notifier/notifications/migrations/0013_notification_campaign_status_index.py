@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:08
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Индекс строится через CREATE INDEX CONCURRENTLY, чтобы не блокировать
+    # запись в таблицу; такие операции нельзя выполнять в транзакции.
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0012_campaign'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('campaign__isnull', False)), fields=['campaign', 'status'], name='notif_campaign_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0013_notification_campaign_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='priority',
+            field=models.CharField(choices=[('high', 'High'), ('normal', 'Normal'), ('low', 'Low')], default='normal', max_length=10),
+        ),
+    ]
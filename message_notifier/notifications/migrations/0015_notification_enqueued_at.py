@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def lease_pending(apps, schema_editor):
+    # Аренда нужна только уведомлениям, которые еще ждут отправки: у sent и
+    # failed enqueued_at остается пустым, как после итогового статуса
+    Notification = apps.get_model('notifications', 'Notification')
+    Notification.objects.filter(status='pending').update(enqueued_at=django.utils.timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0014_notification_priority'),
+    ]
+
+    # Поле добавляется без значения по умолчанию (существующие строки - NULL),
+    # аренда проставляется только уведомлениям в статусе pending, и лишь
+    # затем полю задается default для новых строк.
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='enqueued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(lease_pending, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='notification',
+            name='enqueued_at',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+    ]
@@ -1,5 +1,54 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+class NotificationQuerySet(models.QuerySet):
+    """
+    Запросы к уведомлениям, для которых в Notification.Meta.indexes есть
+    отдельные индексы. Планы этих запросов на PostgreSQL проверяются в
+    notifications/tests.py (NotificationQueryPlanTests).
+
+    Методы:
+        due_for_retry(moment):
+            Уведомления в статусе pending, попытка которых назначена не позже
+            `moment`, от самых старых. Индекс: notif_pending_idx (частичный).
+
+        with_status(status, since=None):
+            Уведомления с заданным статусом, созданные не раньше `since`,
+            от самых новых. Индекс: notif_status_created_idx.
+
+        for_user(user):
+            История уведомлений пользователя, от самых новых.
+            Индекс: notif_user_created_idx.
+
+        newest_first(before=None):
+            Уведомления от самых новых по (created_at, id); при `before` =
+            (created_at, id) - только идущие после этой позиции (keyset-пагинация:
+            стоимость страницы не зависит от ее номера). Индекс:
+            notif_created_id_idx или индекс фильтра (status/user, created_at).
+    """
+    def due_for_retry(self, moment):
+        return self.filter(status="pending", next_attempt_at__lte=moment).order_by("next_attempt_at")
+
+    def with_status(self, status, since=None):
+        queryset = self.filter(status=status)
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        return queryset.order_by("-created_at")
+
+    def for_user(self, user):
+        return self.filter(user=user).order_by("-created_at")
+
+    def newest_first(self, before=None):
+        queryset = self.order_by("-created_at", "-id")
+        if before is not None:
+            created_at, pk = before
+            # Эквивалент (created_at, id) < (before), в котором условие
+            # created_at <= ... ограничивает диапазон сканирования индекса
+            queryset = queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=pk)
+        return queryset
+
 
 class Notification(models.Model):
     """
@@ -19,13 +68,47 @@ class Notification(models.Model):
             - "email": Email
             - "telegram": Telegram
 
+        PRIORITY_CHOICES (tuple): Варианты приоритета (очередь Celery - PRIORITY_QUEUES):
+            - "high": срочные уведомления (коды подтверждения и т.п.)
+            - "normal": обычные уведомления
+            - "low": рассылки и массовые уведомления
+
         user (ForeignKey): Пользователь, которому адресовано уведомление.
         message (TextField): Текст уведомления.
         status (CharField): Статус уведомления, по умолчанию "pending".
         retry_count (IntegerField): Количество попыток отправки уведомления.
         last_channel (CharField): Последний использованный канал отправки.
         sent_at (DateTimeField): Дата и время последней отправки.
+        next_attempt_at (DateTimeField): Когда запланирована следующая попытка отправки.
+            Для новых уведомлений совпадает со временем создания.
+        enqueued_at (DateTimeField): Начало аренды задачи отправки: когда задача
+            поставлена в очередь (для повторной попытки - next_attempt_at).
+            Очищается воркером, когда уведомление получает итоговый статус;
+            sweep_stuck_notifications берет только уведомления с истекшей
+            арендой (ENQUEUE_LEASE_SECONDS).
         created_at (DateTimeField): Дата и время создания уведомления.
+        updated_at (DateTimeField): Дата и время последнего изменения
+            (Last-Modified эндпоинта статуса).
+        dedup_key (CharField): Ключ дедупликации создания (notifications.dedup):
+            хэш Idempotency-Key или хэш (пользователь, текст, окно). Уникален.
+        campaign (ForeignKey): Рассылка, которой создано уведомление (если есть).
+        priority (CharField): Приоритет уведомления, по умолчанию "normal".
+
+        objects (NotificationQuerySet): Менеджер с запросами, покрытыми индексами.
+
+    Индексы:
+        - notif_status_created_idx (status, created_at): выборки по статусу за период.
+        - notif_user_created_idx (user, created_at): история уведомлений пользователя.
+          Заменяет отдельный индекс внешнего ключа user.
+        - notif_created_id_idx (created_at, id): постраничный список уведомлений
+          без фильтров (keyset-пагинация, NotificationQuerySet.newest_first).
+        - notif_pending_idx (next_attempt_at) WHERE status = 'pending': поиск
+          уведомлений для повторной отправки. Отправленные и failed уведомления
+          в индекс не попадают, поэтому он остается маленьким.
+        - notif_dedup_key_uniq (dedup_key) WHERE dedup_key IS NOT NULL: уникальность
+          ключа дедупликации; уведомления без ключа в индекс не попадают.
+        - notif_campaign_status_idx (campaign, status) WHERE campaign IS NOT NULL:
+          прогресс отправки рассылки. Заменяет индекс внешнего ключа campaign.
 
     Методы:
         __str__():
@@ -44,9 +127,16 @@ class Notification(models.Model):
         ("telegram", "Telegram"),
     )
 
+    PRIORITY_CHOICES = (
+        ("high", "High"),
+        ("normal", "Normal"),
+        ("low", "Low"),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     message = models.TextField()
     status = models.CharField(
@@ -67,9 +157,331 @@ class Notification(models.Model):
         null=True,
         blank=True
     )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now
+    )
+    enqueued_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=timezone.now
+    )
     created_at = models.DateTimeField(
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+    dedup_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True
+    )
+    campaign = models.ForeignKey(
+        "Campaign",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="notifications",
+        db_index=False
+    )
+    priority = models.CharField(
+        max_length=10,
+        choices=PRIORITY_CHOICES,
+        default="normal"
+    )
+
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="notif_status_created_idx"),
+            models.Index(fields=["user", "created_at"], name="notif_user_created_idx"),
+            models.Index(fields=["created_at", "id"], name="notif_created_id_idx"),
+            models.Index(
+                fields=["next_attempt_at"],
+                name="notif_pending_idx",
+                condition=models.Q(status="pending")
+            ),
+            models.Index(
+                fields=["campaign", "status"],
+                name="notif_campaign_status_idx",
+                condition=models.Q(campaign__isnull=False)
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                name="notif_dedup_key_uniq",
+                condition=models.Q(dedup_key__isnull=False)
+            ),
+        ]
 
     def __str__(self):
         return f'Notification {self.pk} to {self.user}'
+
+
+def default_webhook_statuses():
+    return ["sent", "failed"]
+
+
+class WebhookSubscription(models.Model):
+    """
+    Подписка внешнего сервиса (клиента) на изменения статусов уведомлений.
+
+    Атрибуты:
+        name (CharField): Название клиента.
+        url (URLField): Адрес, на который отправляются пачки событий (POST).
+        secret (CharField): Ключ HMAC-SHA256 подписи тела запроса
+            (заголовок X-Notifier-Signature). Если пустой, запрос не подписывается.
+        statuses (JSONField): Статусы, о которых нужно сообщать (из "sent", "failed").
+        is_active (BooleanField): Отправлять ли события подписке.
+        created_at (DateTimeField): Дата и время создания подписки.
+    """
+    name = models.CharField(
+        max_length=100
+    )
+    url = models.URLField(
+        max_length=500
+    )
+    secret = models.CharField(
+        max_length=128,
+        blank=True
+    )
+    statuses = models.JSONField(
+        default=default_webhook_statuses
+    )
+    is_active = models.BooleanField(
+        default=True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    def __str__(self):
+        return f'Webhook {self.name} ({self.url})'
+
+
+class WebhookEvent(models.Model):
+    """
+    Событие в outbox webhook-подписки: уведомление получило статус, о котором
+    подписка просила сообщать.
+
+    События отправляются пачками (notifications.webhooks.flush_subscription)
+    и после успешной доставки удаляются. Неудачная доставка повторяется с
+    экспоненциальной задержкой; после WEBHOOK_MAX_ATTEMPTS попыток событие
+    получает статус failed и остается в таблице для разбора.
+
+    Атрибуты:
+        subscription (ForeignKey): Подписка.
+        notification (ForeignKey): Уведомление.
+        payload (JSONField): Данные уведомления на момент изменения статуса.
+        status (CharField): "pending" - ожидает доставки, "failed" - попытки исчерпаны.
+        attempts (IntegerField): Количество неудачных попыток доставки.
+        next_attempt_at (DateTimeField): Время следующей попытки.
+        created_at (DateTimeField): Дата и время создания события.
+
+    Индексы:
+        - webhook_pending_idx (subscription, next_attempt_at) WHERE status = 'pending':
+          выборка событий подписки, готовых к отправке.
+    """
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("failed", "Failed"),
+    )
+
+    subscription = models.ForeignKey(
+        WebhookSubscription,
+        on_delete=models.CASCADE,
+        related_name="events",
+        db_index=False
+    )
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name="webhook_events"
+    )
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default="pending"
+    )
+    attempts = models.IntegerField(
+        default=0
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["subscription", "next_attempt_at"],
+                name="webhook_pending_idx",
+                condition=models.Q(status="pending")
+            ),
+        ]
+
+    def __str__(self):
+        return f'Webhook event {self.pk} for {self.subscription_id}'
+
+
+class NotificationOutbox(models.Model):
+    """
+    Outbox постановки уведомлений в очередь.
+
+    Строка пишется в той же транзакции, что и уведомление, поэтому API не
+    обращается к брокеру Celery, а задача не может получить ID уведомления,
+    которое еще не зафиксировано. Ретранслятор (notifications.outbox.relay_outbox,
+    команда manage.py relay_outbox) забирает строки пачками, публикует задачи
+    и удаляет строки.
+
+    Атрибуты:
+        notification (OneToOneField): Уведомление, которое нужно поставить в очередь.
+        payload (JSONField): Снимок уведомления с контактами пользователя
+            (notifications.snapshots) при TASK_PAYLOAD_SNAPSHOT = True; тогда
+            задача получает его целиком и не читает уведомление из БД.
+        created_at (DateTimeField): Дата и время записи.
+    """
+    notification = models.OneToOneField(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name="outbox"
+    )
+    payload = models.JSONField(
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    def __str__(self):
+        return f'Outbox {self.pk} for notification {self.notification_id}'
+
+
+class NotificationTemplate(models.Model):
+    """
+    Шаблон текста уведомления с подстановкой полей пользователя.
+
+    Плейсхолдеры записываются как {{ first_name }}; допустимые поля
+    перечислены в TEMPLATE_FIELDS. Шаблон компилируется и кэшируется в
+    воркере по (id, version, updated_at) - см. notifications.templating.
+
+    Атрибуты:
+        name (CharField): Название шаблона.
+        body (TextField): Текст шаблона.
+        version (PositiveIntegerField): Версия текста; увеличивается при каждом
+            изменении body, чтобы воркеры не использовали устаревшую
+            скомпилированную версию.
+        created_at (DateTimeField): Дата и время создания шаблона.
+        updated_at (DateTimeField): Дата и время последнего изменения.
+    """
+    name = models.CharField(
+        max_length=100
+    )
+    body = models.TextField()
+    version = models.PositiveIntegerField(
+        default=1
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            previous = NotificationTemplate.objects.filter(pk=self.pk).values_list("body", flat=True).first()
+            if previous is not None and previous != self.body:
+                self.version += 1
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f'Template {self.name} v{self.version}'
+
+
+
+class Campaign(models.Model):
+    """
+    Рассылка одного сообщения сегменту пользователей.
+
+    Получатели выбираются фильтром по модели пользователя и обрабатываются
+    воркером (notifications.campaigns.fan_out) частями по CAMPAIGN_CHUNK_SIZE:
+    уведомления и строки outbox каждой части создаются в одной транзакции
+    вместе с продвижением курсора last_user_id, поэтому прерванная рассылка
+    продолжается с места остановки без дублей и пропусков.
+
+    Атрибуты:
+        STATUS_CHOICES (tuple): Варианты статуса рассылки:
+            - "pending": рассылка создана и ждет воркера
+            - "running": уведомления создаются
+            - "completed": уведомления созданы для всех получателей
+
+        name (CharField): Название рассылки.
+        message (TextField): Текст уведомлений (если не задан шаблон).
+        template (ForeignKey): Шаблон текста (NotificationTemplate), необязательно.
+        filters (JSONField): Фильтр получателей {lookup: значение}, ключи из CAMPAIGN_FILTERS.
+        status (CharField): Статус рассылки.
+        total (PositiveIntegerField): Количество получателей на момент запуска.
+        created_count (PositiveIntegerField): Сколько уведомлений уже создано.
+        last_user_id (BigIntegerField): ID последнего обработанного получателя (курсор).
+        created_at (DateTimeField): Дата и время создания рассылки.
+        updated_at (DateTimeField): Дата и время последнего прогресса.
+        finished_at (DateTimeField): Когда созданы уведомления для всех получателей.
+    """
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+    )
+
+    name = models.CharField(
+        max_length=100
+    )
+    message = models.TextField(
+        blank=True
+    )
+    template = models.ForeignKey(
+        NotificationTemplate,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="campaigns"
+    )
+    filters = models.JSONField(
+        default=dict,
+        blank=True
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default="pending"
+    )
+    total = models.PositiveIntegerField(
+        null=True,
+        blank=True
+    )
+    created_count = models.PositiveIntegerField(
+        default=0
+    )
+    last_user_id = models.BigIntegerField(
+        default=0
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True
+    )
+
+    def __str__(self):
+        return f'Campaign {self.name} ({self.status})'
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import BULK_CHUNK_SIZE, OUTBOX_RELAY_BATCH_SIZE
+from .models import Notification, NotificationOutbox
+from .routing import group_by_queue
+from .tasks import enqueue_by_priority, enqueue_snapshots
+from .utils import chunked
+
+
+def add_to_outbox(notification_ids, snapshots=None):
+    """
+    Записывает уведомления в outbox. Вызывается в транзакции, в которой
+    уведомления созданы: задачи будут опубликованы только после ее фиксации.
+
+    Аргументы:
+        notification_ids (list[int]): ID уведомлений.
+        snapshots (list[dict] | None): Снимки уведомлений в том же порядке
+            (notifications.snapshots.build_snapshot), если их нужно передать в задачу.
+    """
+    payloads = snapshots if snapshots is not None else [None] * len(notification_ids)
+    rows = [
+        NotificationOutbox(notification_id=notification_id, payload=payload)
+        for notification_id, payload in zip(notification_ids, payloads)
+    ]
+    for chunk in chunked(rows, BULK_CHUNK_SIZE):
+        NotificationOutbox.objects.bulk_create(chunk)
+
+
+def relay_outbox(batch_size=OUTBOX_RELAY_BATCH_SIZE):
+    """
+    Публикует в Celery одну пачку уведомлений из outbox.
+
+    Строки забираются через SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+    несколько ретрансляторов работают параллельно, не публикуя одно и то же.
+    Задачи публикуются через одно соединение с брокером в очереди
+    приоритетов уведомлений (routing.queue_for): строки со снимком - через
+    enqueue_snapshots, остальные - через enqueue_by_priority, после чего
+    строки удаляются в той же транзакции, а у уведомлений начинается аренда
+    задачи (enqueued_at): пока она не истекла, sweep_stuck_notifications не
+    ставит их в очередь повторно.
+    Если брокер недоступен, транзакция откатывается и строки остаются в
+    outbox до следующего прохода. Если транзакция не зафиксируется после
+    публикации, уведомление будет опубликовано повторно - задача пропускает
+    уже обработанные уведомления.
+
+    Возвращает количество опубликованных уведомлений.
+    """
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("id")
+            .values_list("id", "notification_id", "notification__priority", "payload")[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        snapshots = [(payload, priority) for _, _, priority, payload in rows if payload is not None]
+        ids = [(notification_id, priority) for _, notification_id, priority, payload in rows if payload is None]
+        for queue, chunk in group_by_queue(snapshots).items():
+            enqueue_snapshots(chunk, queue=queue)
+        enqueue_by_priority(ids)
+        NotificationOutbox.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        Notification.objects.filter(pk__in=[row[1] for row in rows]).update(enqueued_at=timezone.now())
+
+    return len(rows)
@@ -0,0 +1,241 @@
+import asyncio
+import math
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+from .constants import CHANNEL_RATE_LIMITS
+
+# Lua-скрипт token bucket. Выполняется в Redis атомарно, поэтому все
+# процессы воркеров расходуют один общий запас токенов канала.
+# Время берется из Redis (TIME), чтобы расхождение часов воркеров не влияло
+# на скорость пополнения. Возвращает 0, если токен выдан, иначе сколько
+# миллисекунд нужно подождать.
+TOKEN_BUCKET_SCRIPT = """
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then
+    return blocked
+end
+
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class LocalTokenBucket:
+    """
+    Token bucket в памяти процесса.
+
+    Используется, когда уведомления отправляет один процесс, и как
+    запасной вариант при недоступности Redis.
+
+    Методы:
+        try_acquire(channel, rate, burst):
+            Забирает токен канала. Возвращает 0, если токен выдан,
+            иначе сколько секунд нужно подождать.
+
+        block(channel, seconds):
+            Запрещает отправку через канал на `seconds` секунд.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._blocked_until = {}
+
+    def try_acquire(self, channel, rate, burst):
+        with self._lock:
+            now = time.monotonic()
+            blocked_until = self._blocked_until.get(channel, 0)
+            if blocked_until > now:
+                return blocked_until - now
+
+            tokens, ts = self._buckets.get(channel, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+
+            if tokens >= 1:
+                self._buckets[channel] = (tokens - 1, now)
+                return 0
+
+            self._buckets[channel] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def block(self, channel, seconds):
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._blocked_until[channel] = max(until, self._blocked_until.get(channel, 0))
+
+
+class RedisTokenBucket:
+    """
+    Token bucket, общий для всех процессов воркеров через Redis.
+
+    Атрибуты:
+        client (redis.Redis): Клиент Redis.
+        prefix (str): Префикс ключей.
+
+    Методы:
+        try_acquire(channel, rate, burst):
+            Забирает токен канала. Возвращает 0, если токен выдан,
+            иначе сколько секунд нужно подождать.
+
+        block(channel, seconds):
+            Запрещает отправку через канал на `seconds` секунд во всех воркерах.
+    """
+    def __init__(self, url, prefix="notifier:ratelimit"):
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        self.prefix = prefix
+        self._script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def _keys(self, channel):
+        return [f"{self.prefix}:{channel}", f"{self.prefix}:{channel}:blocked"]
+
+    def try_acquire(self, channel, rate, burst):
+        wait_ms = self._script(keys=self._keys(channel), args=[rate, burst])
+        return int(wait_ms) / 1000
+
+    def block(self, channel, seconds):
+        blocked_key = self._keys(channel)[1]
+        blocked_ms = max(1, math.ceil(seconds * 1000))
+        if self.client.pttl(blocked_key) < blocked_ms:
+            self.client.set(blocked_key, 1, px=blocked_ms)
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты отправки по каналам.
+
+    Лимиты каналов задаются в CHANNEL_RATE_LIMITS (сообщений в секунду и
+    размер всплеска). При RATE_LIMIT_BACKEND = "redis" запас токенов общий
+    для всех воркеров Celery; если Redis недоступен, ограничитель на
+    REDIS_RETRY_SECONDS переключается на LocalTokenBucket текущего процесса. При
+    RATE_LIMIT_BACKEND = "local" всегда используется память процесса.
+
+    Ответ провайдера "слишком много запросов" (например, Telegram 429 с
+    retry_after) передается в block(): канал блокируется для всех
+    воркеров на указанное время, и они ждут, а не тратят попытки.
+
+    Атрибуты:
+        max_wait (float): Сколько секунд можно ждать токен, прежде чем
+            отказаться от канала для текущего сообщения.
+
+    Методы:
+        wait(channel, max_wait=None):
+            Блокирует поток до получения токена.
+            Возвращает True, если токен получен, и False, если ожидание
+            превысило бы max_wait (или переданный `max_wait`, если он меньше,
+            например остаток бюджета доставки).
+
+        wait_async(channel, max_wait=None):
+            Корутина с тем же поведением для AsyncDeliveryEngine: ожидание
+            идет через asyncio.sleep, а запросы к Redis выполняются в пуле
+            потоков (asyncio.to_thread).
+
+        block(channel, seconds):
+            Блокирует канал на `seconds` секунд.
+
+        block_async(channel, seconds):
+            Корутина с тем же поведением для AsyncDeliveryEngine.
+    """
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, backend=None, max_wait=None):
+        backend = backend or settings.RATE_LIMIT_BACKEND
+        self.max_wait = max_wait if max_wait is not None else settings.RATE_LIMIT_MAX_WAIT
+        self.local = LocalTokenBucket()
+        self.shared = RedisTokenBucket(settings.RATE_LIMIT_REDIS_URL) if backend == "redis" else None
+        self._shared_retry_at = 0
+
+    def _call(self, method, *args):
+        if self.shared is not None and time.monotonic() >= self._shared_retry_at:
+            try:
+                return getattr(self.shared, method)(*args)
+            except redis.RedisError as e:
+                print(f"Redis недоступен, лимиты считаются локально: {e}")
+                self._shared_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+        return getattr(self.local, method)(*args)
+
+    async def _call_async(self, method, *args):
+        # Клиент Redis синхронный: запрос выполняется в пуле потоков, чтобы не останавливать цикл событий
+        if self.shared is None:
+            return self._call(method, *args)
+        return await asyncio.to_thread(self._call, method, *args)
+
+    def _check_wait(self, delay, waited, max_wait):
+        if max_wait is None or max_wait > self.max_wait:
+            max_wait = self.max_wait
+        if delay and waited + delay > max_wait:
+            return None
+        return delay
+
+    def _next_delay(self, channel, waited, max_wait):
+        if channel not in CHANNEL_RATE_LIMITS:
+            return 0
+        rate, burst = CHANNEL_RATE_LIMITS[channel]
+        return self._check_wait(self._call("try_acquire", channel, rate, burst), waited, max_wait)
+
+    async def _next_delay_async(self, channel, waited, max_wait):
+        if channel not in CHANNEL_RATE_LIMITS:
+            return 0
+        rate, burst = CHANNEL_RATE_LIMITS[channel]
+        return self._check_wait(await self._call_async("try_acquire", channel, rate, burst), waited, max_wait)
+
+    def wait(self, channel, max_wait=None):
+        waited = 0
+        while True:
+            delay = self._next_delay(channel, waited, max_wait)
+            if delay is None:
+                return False
+            if not delay:
+                return True
+            time.sleep(delay)
+            waited += delay
+
+    async def wait_async(self, channel, max_wait=None):
+        waited = 0
+        while True:
+            delay = await self._next_delay_async(channel, waited, max_wait)
+            if delay is None:
+                return False
+            if not delay:
+                return True
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def block(self, channel, seconds):
+        self._call("block", channel, seconds)
+
+    async def block_async(self, channel, seconds):
+        await self._call_async("block", channel, seconds)
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    """
+    Возвращает ограничитель частоты текущего процесса (создается при первом вызове).
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
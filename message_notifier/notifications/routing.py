@@ -0,0 +1,32 @@
+from .constants import CHANNEL_QUEUES, PRIORITY_QUEUES
+
+
+def queue_for(priority):
+    """
+    Возвращает очередь Celery для задач уведомлений с приоритетом `priority`.
+    """
+    return PRIORITY_QUEUES.get(priority, PRIORITY_QUEUES["normal"])
+
+
+def channel_queue(channel, priority):
+    """
+    Возвращает очередь Celery для попытки отправки через канал `channel`:
+    срочные уведомления идут в очередь своего приоритета, остальные - в
+    очередь канала, чтобы медленный канал не задерживал быстрые.
+    """
+    if priority == "high":
+        return queue_for(priority)
+    return CHANNEL_QUEUES.get(channel, queue_for(priority))
+
+
+def group_by_queue(rows):
+    """
+    Группирует пары (значение, приоритет) по очередям приоритетов.
+
+    Возвращает:
+        dict[str, list]: {очередь: [значение, ...]} в исходном порядке.
+    """
+    groups = {}
+    for value, priority in rows:
+        groups.setdefault(queue_for(priority), []).append(value)
+    return groups
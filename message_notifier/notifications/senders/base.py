@@ -1,6 +1,42 @@
+import asyncio
 from abc import ABC, abstractmethod
 
 
+class RateLimitExceeded(Exception):
+    """
+    Провайдер отклонил сообщение из-за превышения лимита частоты.
+
+    Отправители выбрасывают это исключение вместо возврата False, чтобы
+    NotificationService мог приостановить канал для всех воркеров,
+    а не засчитывать ответ как обычную неудачу.
+
+    Атрибуты:
+        retry_after (float): Через сколько секунд провайдер разрешает повторить запрос.
+    """
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Превышен лимит частоты, повтор через {retry_after} с")
+
+
+class ProviderUnavailable(Exception):
+    """
+    Провайдер недоступен: ошибка сети, таймаут или ответ 5xx.
+
+    Отправители выбрасывают это исключение вместо возврата False, чтобы
+    выключатель канала (CircuitBreaker) учитывал только сбои провайдера:
+    отказ по конкретному получателю (пустой номер, неверный адрес)
+    возвращается как False и канал не открывает.
+    """
+
+
+def check_provider_status(status_code, provider):
+    """
+    Выбрасывает ProviderUnavailable, если провайдер ответил ошибкой 5xx.
+    """
+    if status_code >= 500:
+        raise ProviderUnavailable(f"{provider} ответил HTTP {status_code}")
+
+
 class BaseSender(ABC):
     """
     Абстрактный базовый класс для отправки сообщений.
@@ -9,16 +45,72 @@ class BaseSender(ABC):
     обеспечивая реализацию метода send() в подклассах.
 
     Методы:
-        send(to, message):
+        send(to, message, timeout=None):
             Абстрактный метод для отправки сообщения.
 
             Аргументы:
                 to (str): Адресат сообщения (например, email, номер телефона).
                 message (str): Текст отправляемого сообщения.
+                timeout (float | None): Сколько секунд можно ждать провайдера
+                    (остаток бюджета доставки); None - таймаут отправителя.
 
             Возвращает:
                 bool: True, если сообщение успешно отправлено, иначе False.
+
+            Исключения:
+                RateLimitExceeded: Если провайдер ответил отказом из-за лимита частоты.
+                ProviderUnavailable: Если провайдер недоступен (сеть, таймаут, 5xx).
     """
     @abstractmethod
-    def send(self, to, message):
+    def send(self, to, message, timeout=None):
         pass
+
+
+class AsyncBaseSender(ABC):
+    """
+    Абстрактный базовый класс для асинхронной отправки сообщений.
+
+    Повторяет контракт BaseSender, но метод send() - корутина, поэтому
+    один процесс может держать в полете сотни отправок одновременно.
+
+    Методы:
+        send(user, message, timeout=None):
+            Абстрактная корутина для отправки сообщения.
+
+            Аргументы:
+                user: Объект пользователя с контактными данными.
+                message (str): Текст отправляемого сообщения.
+                timeout (float | None): Сколько секунд можно ждать провайдера
+                    (остаток бюджета доставки); None - таймаут отправителя.
+
+            Возвращает:
+                bool: True, если сообщение успешно отправлено, иначе False.
+
+            Исключения:
+                RateLimitExceeded, ProviderUnavailable: Как у BaseSender.send.
+    """
+    @abstractmethod
+    async def send(self, user, message, timeout=None):
+        pass
+
+
+class SyncSenderAdapter(AsyncBaseSender):
+    """
+    Адаптер, позволяющий использовать синхронный BaseSender там,
+    где ожидается AsyncBaseSender.
+
+    Вызов sender.send() выполняется в пуле потоков (asyncio.to_thread),
+    поэтому блокирующий ввод-вывод не останавливает цикл событий.
+    Таймаут передается в sender.send(): поток не может быть отменен вместе
+    с корутиной, поэтому ограничивать его должен сам запрос к провайдеру.
+
+    Атрибуты:
+        sender (BaseSender): Оборачиваемый синхронный отправитель.
+    """
+    def __init__(self, sender):
+        self.sender = sender
+
+    async def send(self, user, message, timeout=None):
+        if timeout is None:
+            return await asyncio.to_thread(self.sender.send, user, message)
+        return await asyncio.to_thread(self.sender.send, user, message, timeout=timeout)
@@ -1,7 +1,7 @@
-import smtplib
 import os
 from email.mime.text import MIMEText
-from notifications.senders.base import BaseSender
+from notifications.senders.base import BaseSender, ProviderUnavailable
+from notifications.senders.smtp_pool import SMTPConnectionPool, is_connection_error
 
 
 class EmailSender(BaseSender):
@@ -10,38 +10,104 @@ class EmailSender(BaseSender):
 
     Наследуется от BaseSender и реализует метод send для отправки
     уведомлений пользователям через SMTP с использованием SSL.
+    Соединения берутся из SMTPConnectionPool, поэтому TLS-рукопожатие
+    и login() выполняются один раз на сессию, а не на каждое письмо.
+
+    Атрибуты:
+        pool (SMTPConnectionPool): Пул SMTP-соединений процесса воркера.
+            Создается при первом обращении, если не передан в конструктор.
 
     Методы:
-        send(user, message):
+        send(user, message, timeout=None):
             Отправляет email-сообщение указанному пользователю.
 
             Аргументы:
                 user: Объект пользователя с атрибутом `email`.
                 message (str): Текст сообщения.
+                timeout (float | None): Таймаут отправки письма (не больше
+                    таймаута пула); None - таймаут пула.
 
             Возвращает:
-                bool: True, если сообщение успешно отправлено, иначе False.
+                bool: True, если сообщение успешно отправлено, иначе False
+                    (например, сервер отклонил адрес).
 
             Исключения:
-                Все ошибки при отправке email обрабатываются внутри метода.
-                При возникновении исключения выводится сообщение об ошибке и
-                возвращается False.
+                ProviderUnavailable: Не удалось подключиться к SMTP-серверу
+                    (в том числе после повторного подключения).
+                Остальные ошибки при отправке email обрабатываются внутри
+                метода: выводится сообщение об ошибке и возвращается False.
+
+        send_many(items):
+            Отправляет пачку писем через одну SMTP-сессию.
+
+            Аргументы:
+                items (iterable): Пары (user, message).
+
+            Возвращает:
+                list[bool]: Результат отправки для каждой пары в исходном порядке.
+
+            Особенности:
+                - Отказ сервера по конкретному письму (например, неверный адрес)
+                  не прерывает отправку остальных.
+                - При обрыве соединения пачка продолжается через новое
+                  соединение; повторное подключение выполняется один раз.
     """
-    def send(self, user, message):
-        try:
-            msg = MIMEText(message)
-            msg['Subject'] = 'Notification'
-            msg['From'] = os.getenv('EMAIL_HOST_USER')
-            msg['To'] = user.email
+    def __init__(self, pool=None):
+        self._pool = pool
 
-            with smtplib.SMTP_SSL(os.getenv('EMAIL_HOST'), int(os.getenv('EMAIL_PORT'))) as server:
-                server.login(os.getenv('EMAIL_HOST_USER'), os.getenv('EMAIL_HOST_PASSWORD'))
-                server.send_message(msg)
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = SMTPConnectionPool()
+        return self._pool
 
-            return True
+    @staticmethod
+    def _build_message(user, message):
+        msg = MIMEText(message)
+        msg['Subject'] = 'Notification'
+        msg['From'] = os.getenv('EMAIL_HOST_USER')
+        msg['To'] = user.email
+        return msg
 
+    def _send_one(self, conn, user, message, timeout=None):
+        try:
+            conn.send(self._build_message(user, message), timeout)
+            return True
         except Exception as e:
+            if is_connection_error(e):
+                raise
             print(f"Ошибка при отправке через Email: {e}")
             return False
 
+    def send(self, user, message, timeout=None):
+        results, error = self._send_all([(user, message)], timeout)
+        if error is not None:
+            raise ProviderUnavailable(error) from error
+        return results[0]
+
+    def send_many(self, items):
+        return self._send_all(items)[0]
+
+    def _send_all(self, items, timeout=None):
+        # Возвращает результаты и ошибку соединения, на которой пачка прервалась (или None)
+        items = list(items)
+        results = [False] * len(items)
+        position = 0
+        reconnects = 0
+
+        while position < len(items):
+            try:
+                with self.pool.connection() as conn:
+                    while position < len(items):
+                        user, message = items[position]
+                        results[position] = self._send_one(conn, user, message, timeout)
+                        position += 1
+
+            except Exception as e:
+                if is_connection_error(e) and reconnects < 1:
+                    reconnects += 1
+                    continue
+                print(f"Ошибка при отправке через Email: {e}")
+                return results, e
 
+        return results, None
@@ -0,0 +1,130 @@
+import os
+import socket
+
+import aiohttp
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter, включающий TCP keep-alive на сокетах пула.
+
+    Простаивающие соединения пула не закрываются промежуточными NAT и
+    балансировщиками, поэтому следующий запрос к sms.ru или
+    api.telegram.org идет по уже открытому TLS-соединению.
+
+    Атрибуты:
+        keepalive_idle (int): Через сколько секунд простоя ядро начинает
+            отправлять keep-alive пробы (0 - не менять системное значение).
+    """
+    def __init__(self, keepalive_idle=0, **kwargs):
+        self.keepalive_idle = keepalive_idle
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        options = list(HTTPConnection.default_socket_options)
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        if self.keepalive_idle and hasattr(socket, "TCP_KEEPIDLE"):
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle))
+        kwargs["socket_options"] = options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def build_session():
+    """
+    Создает requests.Session с пулом keep-alive соединений.
+
+    Размер пула, keep-alive и политика повторов берутся из настроек Django
+    (HTTP_POOL_*, HTTP_KEEPALIVE_IDLE, HTTP_RETRY_*). Повторяются только
+    ошибки подключения, когда запрос точно не дошел до провайдера. Ошибки и
+    таймауты чтения не повторяются: отправка SMS и сообщений Telegram не
+    идемпотентна, и провайдер мог уже принять запрос. Ответы сервера с
+    любым HTTP-кодом возвращаются вызывающему коду как есть.
+
+    Возвращает:
+        requests.Session: Сессия с подключенным KeepAliveHTTPAdapter.
+    """
+    retry = Retry(
+        total=settings.HTTP_RETRY_ATTEMPTS,
+        connect=settings.HTTP_RETRY_ATTEMPTS,
+        read=0,
+        status=0,
+        other=0,
+        allowed_methods=frozenset({"GET"}),
+        backoff_factor=settings.HTTP_RETRY_BACKOFF,
+        raise_on_status=False,
+    )
+    adapter = KeepAliveHTTPAdapter(
+        keepalive_idle=settings.HTTP_KEEPALIVE_IDLE,
+        pool_connections=settings.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class HTTPSessionMixin:
+    """
+    Примесь для отправителей, которым нужна долгоживущая HTTP-сессия.
+
+    Сессия создается при первом обращении и живет до конца процесса.
+    Если процесс был форкнут (prefork-пул Celery), дочерний процесс
+    получает собственную сессию: сокеты родителя в нем не используются.
+
+    Атрибуты:
+        session (requests.Session): Сессия текущего процесса.
+        REQUEST_TIMEOUT (float): Таймаут запроса к провайдеру по умолчанию (секунды).
+
+    Методы:
+        request_timeout(timeout):
+            Таймаут запроса: `timeout` (остаток бюджета доставки), но не
+            больше REQUEST_TIMEOUT.
+    """
+    REQUEST_TIMEOUT = 10
+
+    _session = None
+    _session_pid = None
+
+    def request_timeout(self, timeout=None):
+        if timeout is None:
+            return self.REQUEST_TIMEOUT
+        return min(timeout, self.REQUEST_TIMEOUT)
+
+    @property
+    def session(self):
+        if self._session is None or self._session_pid != os.getpid():
+            self._session = build_session()
+            self._session_pid = os.getpid()
+        return self._session
+
+
+class AsyncHTTPSessionMixin:
+    """
+    Примесь для асинхронных отправителей, которые работают через общую
+    aiohttp-сессию AsyncDeliveryEngine.
+
+    Атрибуты:
+        session (aiohttp.ClientSession): Сессия, которой владеет AsyncDeliveryEngine.
+
+    Методы:
+        request_timeout(timeout):
+            Таймаут запроса (aiohttp.ClientTimeout): `timeout` (остаток
+            бюджета доставки), но не больше общего таймаута сессии.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    def request_timeout(self, timeout=None):
+        total = self.session.timeout.total
+        if timeout is None:
+            return self.session.timeout
+        if total is not None:
+            timeout = min(timeout, total)
+        return aiohttp.ClientTimeout(total=timeout)
@@ -1,9 +1,14 @@
+import asyncio
 import os
+
+import aiohttp
 import requests
-from notifications.senders.base import BaseSender
+
+from notifications.senders.base import AsyncBaseSender, BaseSender, ProviderUnavailable, check_provider_status
+from notifications.senders.http import AsyncHTTPSessionMixin, HTTPSessionMixin
 
 
-class SMSSender(BaseSender):
+class SMSSender(HTTPSessionMixin, BaseSender):
     """
     Отправитель SMS через сервис SMS.ru.
 
@@ -19,52 +24,165 @@ class SMSSender(BaseSender):
           не тестировалось, однако API SMS.ru используется строго по инструкции
           и работает верно, то есть при наличии буквенного отправителя работает.
 
+    Атрибуты:
+        API_URL (str): Адрес метода отправки SMS.
+        session (requests.Session): Долгоживущая HTTP-сессия процесса
+            (см. HTTPSessionMixin).
+
     Методы:
-        send(user, message):
+        send(user, message, timeout=None):
             Отправляет SMS указанному пользователю.
 
             Аргументы:
                 user: Объект пользователя с атрибутом `phone_number`.
                 message (str): Текст сообщения.
+                timeout (float | None): Таймаут запроса (см. HTTPSessionMixin.request_timeout).
 
             Возвращает:
-                bool: True, если все SMS успешно отправлены, иначе False.
+                bool: True, если все SMS успешно отправлены, иначе False
+                    (например, SMS.ru отклонил номер).
 
             Исключения:
-                Все ошибки при отправке SMS обрабатываются внутри метода.
-                При возникновении исключения выводится сообщение об ошибке и возвращается False.
+                ProviderUnavailable: Ошибка сети, таймаут или ответ 5xx.
+                Остальные ошибки обрабатываются внутри метода: выводится
+                сообщение об ошибке и возвращается False.
+
+        send_bulk(users, message, timeout=None):
+            Отправляет один и тот же текст нескольким пользователям одним
+            запросом к SMS.ru (номера перечисляются через запятую, приведенные
+            normalize_number). Пользователи без номера в запрос не попадают.
+
+            Аргументы:
+                users (list): Пользователи с атрибутом `phone_number`
+                    (не больше SMS_BATCH_SIZE за вызов).
+                message (str): Текст сообщения.
+                timeout (float | None): Таймаут запроса (см. HTTPSessionMixin.request_timeout).
+
+            Возвращает:
+                list[bool]: Результат для каждого пользователя в исходном порядке,
+                    по status_code его номера в ответе SMS.ru; для пользователей
+                    без номера - False.
+
+            Исключения:
+                ProviderUnavailable: Ошибка сети, таймаут или ответ 5xx.
     """
 
-    def send(self, user, message):
+    API_URL = "https://sms.ru/sms/send"
+
+    @staticmethod
+    def build_params(user, message):
+        return {
+            "api_id": os.getenv("SMS_RU_API_ID"),
+            "to": user.phone_number,
+            "msg": message,
+            "json": 1
+        }
+
+    @staticmethod
+    def normalize_number(phone_number):
+        """
+        Приводит номер к виду, в котором SMS.ru возвращает его в ответе:
+        только цифры, российский номер с 8 в начале - с 7.
+        """
+        digits = "".join(ch for ch in str(phone_number) if ch.isdigit())
+        if len(digits) == 11 and digits.startswith("8"):
+            digits = "7" + digits[1:]
+        return digits
+
+    @staticmethod
+    def parse_statuses(result):
+        statuses = {}
+
+        for number, info in result.get("sms", {}).items():
+            if info.get("status_code") == 100:
+                statuses[SMSSender.normalize_number(number)] = True
+                print(f"SMS успешно отправлено на {number}")
+            else:
+                statuses[SMSSender.normalize_number(number)] = False
+                print(f"Ошибка SMS на {number}:"
+                      f" {info.get('status_text')}"
+                      f" (код {info.get('status_code')})")
+
+        return statuses
+
+    @staticmethod
+    def parse_result(result):
+        return all(SMSSender.parse_statuses(result).values())
+
+    def send(self, user, message, timeout=None):
         try:
-            response = requests.get(
-                "https://sms.ru/sms/send",
-                params={
-                    "api_id": os.getenv("SMS_RU_API_ID"),
-                    "to": user.phone_number,
-                    "msg": message,
-                    "json": 1
-                },
-                timeout=10
+            response = self.session.get(
+                self.API_URL,
+                params=self.build_params(user, message),
+                timeout=self.request_timeout(timeout)
             )
-            result = response.json()
-            sms_status = result.get("sms", {})
-            success = True
-
-            for number, info in sms_status.items():
-                if info.get("status_code") == 100:
-                    print(f"SMS успешно отправлено на {number}")
-                else:
-                    success = False
-                    print(f"Ошибка SMS на {number}:"
-                          f" {info.get('status_text')}"
-                          f" (код {info.get('status_code')})")
+            check_provider_status(response.status_code, "SMS.ru")
+            return self.parse_result(response.json())
 
-            return success
+        except (requests.RequestException, ProviderUnavailable) as e:
+            print(f"SMS.ru недоступен: {e}")
+            raise ProviderUnavailable(e) from e
 
         except Exception as e:
             print(f"Ошибка при отправке через SMS: {e}")
             return False
 
+    def send_bulk(self, users, message, timeout=None):
+        users = list(users)
+        numbers = [self.normalize_number(user.phone_number or "") for user in users]
+        recipients = [number for number in numbers if number]
+        if not recipients:
+            if numbers:
+                print("Ошибка при отправке через SMS: ни у одного пользователя нет номера")
+            return [False] * len(numbers)
 
+        try:
+            params = self.build_params(users[0], message)
+            params["to"] = ",".join(recipients)
+            response = self.session.post(self.API_URL, data=params, timeout=self.request_timeout(timeout))
+            check_provider_status(response.status_code, "SMS.ru")
+            statuses = self.parse_statuses(response.json())
+
+        except (requests.RequestException, ProviderUnavailable) as e:
+            print(f"SMS.ru недоступен: {e}")
+            raise ProviderUnavailable(e) from e
+
+        except Exception as e:
+            print(f"Ошибка при отправке через SMS: {e}")
+            return [False] * len(numbers)
+
+        return [bool(number) and statuses.get(number, False) for number in numbers]
+
+
+class AsyncSMSSender(AsyncHTTPSessionMixin, AsyncBaseSender):
+    """
+    Асинхронный вариант SMSSender на aiohttp.
 
+    Формирует тот же запрос к SMS.ru и так же разбирает ответ, но не
+    блокирует поток: пока ждет ответа, цикл событий обслуживает другие
+    отправки.
+
+    Атрибуты:
+        session (aiohttp.ClientSession): Сессия, которой владеет AsyncDeliveryEngine
+            (см. AsyncHTTPSessionMixin).
+    """
+    API_URL = SMSSender.API_URL
+
+    async def send(self, user, message, timeout=None):
+        try:
+            async with self.session.get(
+                self.API_URL,
+                params=SMSSender.build_params(user, message),
+                timeout=self.request_timeout(timeout)
+            ) as response:
+                check_provider_status(response.status, "SMS.ru")
+                result = await response.json(content_type=None)
+            return SMSSender.parse_result(result)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ProviderUnavailable) as e:
+            print(f"SMS.ru недоступен: {e}")
+            raise ProviderUnavailable(e) from e
+
+        except Exception as e:
+            print(f"Ошибка при отправке через SMS: {e}")
+            return False
@@ -0,0 +1,181 @@
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+def is_connection_error(exc):
+    """
+    Возвращает True, если исключение означает потерю SMTP-соединения,
+    а не отказ сервера по конкретному письму.
+
+    smtplib.SMTPException наследуется от OSError, поэтому ошибки протокола
+    отделяются от сетевых явно.
+    """
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code == 421
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class PooledSMTPConnection:
+    """
+    Авторизованная SMTP-сессия, которая хранится в пуле между отправками.
+
+    Атрибуты:
+        server (smtplib.SMTP_SSL): Открытое и авторизованное соединение.
+        created_at (float): Момент открытия соединения (time.monotonic()).
+        last_used_at (float): Момент последнего использования соединения.
+        sent (int): Количество писем, отправленных через соединение.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.sent = 0
+
+    def send(self, msg, timeout=None):
+        # timeout (остаток бюджета доставки) действует только на это письмо
+        sock = self.server.sock
+        if timeout is not None and sock is not None:
+            sock.settimeout(min(timeout, self.server.timeout))
+        try:
+            self.server.send_message(msg)
+        finally:
+            if timeout is not None and sock is not None:
+                sock.settimeout(self.server.timeout)
+        self.sent += 1
+        self.last_used_at = time.monotonic()
+
+    def expired(self, max_messages, max_age):
+        if max_messages and self.sent >= max_messages:
+            return True
+        return bool(max_age) and time.monotonic() - self.created_at >= max_age
+
+    def is_alive(self):
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close(self):
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                self.server.close()
+            except OSError:
+                pass
+
+
+class SMTPConnectionPool:
+    """
+    Пул авторизованных SMTP-соединений внутри одного процесса воркера.
+
+    Вместо того чтобы на каждое письмо заново выполнять TLS-рукопожатие и
+    login(), пул держит открытыми до `size` сессий и переиспользует их.
+    Перед выдачей соединение, простаивавшее дольше `ping_after` секунд,
+    проверяется командой NOOP; устаревшие соединения закрываются и
+    заменяются новыми. Соединение пересоздается после `max_messages`
+    отправленных писем или через `max_age` секунд после открытия.
+
+    После fork (prefork-пул Celery) унаследованные от родителя сокеты
+    не используются: пул дочернего процесса начинается с пустого списка.
+
+    Атрибуты:
+        size (int): Максимальное количество простаивающих соединений в пуле.
+        max_messages (int): Сколько писем можно отправить через одно соединение.
+        max_age (int): Время жизни соединения в секундах.
+        ping_after (int): Через сколько секунд простоя соединение проверяется NOOP.
+        timeout (int): Таймаут подключения и операций SMTP в секундах.
+
+    Методы:
+        connection():
+            Контекстный менеджер, выдающий PooledSMTPConnection и
+            возвращающий его в пул после использования. При обрыве
+            соединения внутри блока оно закрывается и в пул не возвращается.
+
+        close_all():
+            Закрывает все простаивающие соединения.
+    """
+    def __init__(self, size=None, max_messages=None, max_age=None, ping_after=None, timeout=None):
+        self.size = size if size is not None else settings.EMAIL_POOL_SIZE
+        self.max_messages = max_messages if max_messages is not None else settings.EMAIL_POOL_MAX_MESSAGES
+        self.max_age = max_age if max_age is not None else settings.EMAIL_POOL_MAX_AGE
+        self.ping_after = ping_after if ping_after is not None else settings.EMAIL_POOL_PING_AFTER
+        self.timeout = timeout if timeout is not None else settings.EMAIL_TIMEOUT
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _reset_after_fork(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._idle = []
+
+    def _connect(self):
+        server = smtplib.SMTP_SSL(
+            os.getenv('EMAIL_HOST'),
+            int(os.getenv('EMAIL_PORT')),
+            timeout=self.timeout
+        )
+        try:
+            server.login(os.getenv('EMAIL_HOST_USER'), os.getenv('EMAIL_HOST_PASSWORD'))
+        except Exception:
+            server.close()
+            raise
+        return PooledSMTPConnection(server)
+
+    def acquire(self):
+        self._reset_after_fork()
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+
+            if conn is None:
+                return self._connect()
+
+            if conn.expired(self.max_messages, self.max_age):
+                conn.close()
+                continue
+
+            idle_for = time.monotonic() - conn.last_used_at
+            if idle_for >= self.ping_after and not conn.is_alive():
+                conn.close()
+                continue
+
+            return conn
+
+    def release(self, conn, broken=False):
+        if broken or self._pid != os.getpid() or conn.expired(self.max_messages, self.max_age):
+            conn.close()
+            return
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException as e:
+            self.release(conn, broken=is_connection_error(e))
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
@@ -1,9 +1,20 @@
-import requests
+import asyncio
 import os
-from notifications.senders.base import BaseSender
 
+import aiohttp
+import requests
+
+from notifications.senders.base import (
+    AsyncBaseSender,
+    BaseSender,
+    ProviderUnavailable,
+    RateLimitExceeded,
+    check_provider_status,
+)
+from notifications.senders.http import AsyncHTTPSessionMixin, HTTPSessionMixin
 
-class TelegramSender(BaseSender):
+
+class TelegramSender(HTTPSessionMixin, BaseSender):
     """
     Отправитель сообщений через Telegram.
 
@@ -15,35 +26,97 @@ class TelegramSender(BaseSender):
             - TELEGRAM_BOT_TOKEN: токен вашего бота (создается через BotFather)
             - TELEGRAM_CHAT_ID: ID чата, куда отправлять сообщения.
 
+    Атрибуты:
+        API_URL (str): Шаблон адреса метода sendMessage Bot API.
+        session (requests.Session): Долгоживущая HTTP-сессия процесса
+            (см. HTTPSessionMixin).
 
     Методы:
-        send(user, message):
+        send(user, message, timeout=None):
             Отправляет сообщение пользователю через Telegram.
 
             Аргументы:
                 user: объект пользователя (не используется напрямую,
                       чат берется из .env).
                 message (str): текст сообщения.
+                timeout (float | None): таймаут запроса (см. HTTPSessionMixin.request_timeout).
 
             Возвращает:
                 bool: True, если сообщение успешно отправлено (HTTP 200), иначе False.
 
             Исключения:
-                Все ошибки при отправке сообщения обрабатываются внутри метода.
+                RateLimitExceeded: Если Bot API ответил 429 Too Many Requests;
+                    retry_after берется из поля parameters.retry_after ответа.
+                ProviderUnavailable: Ошибка сети, таймаут или ответ 5xx.
+                Остальные ошибки при отправке сообщения обрабатываются внутри метода.
                 При возникновении исключения выводится сообщение об ошибке и возвращается False.
     """
-    def send(self, user, message):
+    API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+
+    @staticmethod
+    def retry_after(result):
+        try:
+            return float(result["parameters"]["retry_after"])
+        except (KeyError, TypeError, ValueError):
+            return 1.0
+
+    def send(self, user, message, timeout=None):
         try:
-            url = f"https://api.telegram.org/bot{os.getenv('TELEGRAM_BOT_TOKEN')}/sendMessage"
+            url = self.API_URL.format(token=os.getenv('TELEGRAM_BOT_TOKEN'))
             payload = {
                 "chat_id": os.getenv('TELEGRAM_CHAT_ID'),
                 "text": message
             }
-            r = requests.post(url, json=payload)
-            return r.status_code == 200
+            r = self.session.post(url, json=payload, timeout=self.request_timeout(timeout))
+            check_provider_status(r.status_code, "Telegram")
+            if r.status_code == 429:
+                retry_after = self.retry_after(r.json())
+            else:
+                return r.status_code == 200
+
+        except (requests.RequestException, ProviderUnavailable) as e:
+            print(f"Telegram недоступен: {e}")
+            raise ProviderUnavailable(e) from e
 
         except Exception as e:
             print(f"Ошибка отправки через Телеграмм: {e}")
             return False
 
+        raise RateLimitExceeded(retry_after)
+
+
+class AsyncTelegramSender(AsyncHTTPSessionMixin, AsyncBaseSender):
+    """
+    Асинхронный вариант TelegramSender на aiohttp.
+
+    Атрибуты:
+        session (aiohttp.ClientSession): Сессия, которой владеет AsyncDeliveryEngine
+            (см. AsyncHTTPSessionMixin).
+    """
+    API_URL = TelegramSender.API_URL
+
+    async def send(self, user, message, timeout=None):
+        try:
+            url = self.API_URL.format(token=os.getenv('TELEGRAM_BOT_TOKEN'))
+            payload = {
+                "chat_id": os.getenv('TELEGRAM_CHAT_ID'),
+                "text": message
+            }
+            async with self.session.post(
+                url, json=payload, timeout=self.request_timeout(timeout)
+            ) as r:
+                check_provider_status(r.status, "Telegram")
+                if r.status == 429:
+                    retry_after = TelegramSender.retry_after(await r.json(content_type=None))
+                else:
+                    return r.status == 200
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ProviderUnavailable) as e:
+            print(f"Telegram недоступен: {e}")
+            raise ProviderUnavailable(e) from e
+
+        except Exception as e:
+            print(f"Ошибка отправки через Телеграмм: {e}")
+            return False
 
+        raise RateLimitExceeded(retry_after)
@@ -1,9 +1,34 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
 from django.utils import timezone
 
-from .constants import CHANNEL_ORDER, MAX_RETRIES
+from .constants import (
+    CHANNEL_ORDER,
+    HEDGE_SETTLE_SECONDS,
+    MAX_RETRIES,
+    RETRY_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+    SMS_BATCH_SIZE,
+)
+from .breaker import get_circuit_breaker
+from .models import Notification
+from .ratelimit import get_rate_limiter
+from .senders.base import ProviderUnavailable, RateLimitExceeded
 from .senders.sms import SMSSender
 from .senders.email import EmailSender
 from .senders.telegram import TelegramSender
+from .stats import get_channel_stats
+from .events import publish_statuses
+from .status_cache import store_statuses
+from .utils import backoff_delay, chunked
+from .webhooks import record_webhook_events
+from .writer import get_status_writer
 
 SENDERS_MAP = {
     "email": EmailSender(),
@@ -11,40 +36,431 @@ SENDERS_MAP = {
     "telegram": TelegramSender(),
 }
 
+# Поля пользователя, без которых канал не может доставить уведомление.
+# Telegram отправляет в чат из TELEGRAM_CHAT_ID, поэтому от пользователя ничего не требует
+CHANNEL_CONTACT_FIELDS = {
+    "sms": "phone_number",
+    "email": "email",
+}
+
+# Поля, которые меняет NotificationService.check_exhausted
+EXHAUSTED_FIELDS = ["status", "enqueued_at"]
+
+# Поля, которые меняются при попытке отправки уведомления
+STATUS_FIELDS = ("status", "last_channel", "retry_count", "sent_at", "next_attempt_at", "enqueued_at", "updated_at")
+
+_hedge_executor = None
+_hedge_executor_pid = None
+
+
+def get_hedge_executor():
+    """
+    Возвращает пул потоков для хеджированной отправки в текущем процессе.
+    После fork (prefork-пул Celery) создается новый пул: потоки родителя
+    в дочерний процесс не переходят.
+    """
+    global _hedge_executor, _hedge_executor_pid
+    if _hedge_executor is None or _hedge_executor_pid != os.getpid():
+        _hedge_executor = ThreadPoolExecutor(
+            max_workers=settings.HEDGE_MAX_WORKERS,
+            thread_name_prefix="notification-hedge"
+        )
+        _hedge_executor_pid = os.getpid()
+    return _hedge_executor
+
 
 class NotificationService:
     @staticmethod
-    def send_notification(notification):
+    def channel_order(notification=None):
         """
-        Пытается отправить уведомление синхронно с fallback по каналам.
-        Выполняет ретраи при полном провале.
+        Возвращает порядок каналов для отправки уведомления.
+        При CHANNEL_ORDERING = "static" это CHANNEL_ORDER. При "adaptive" каналы
+        упорядочиваются по скользящей статистике (ChannelStats.rank), а каналы,
+        для которых у пользователя нет контактных данных, исключаются.
         """
 
-        user = notification.user
-        message = notification.message
+        if settings.CHANNEL_ORDERING != "adaptive":
+            return CHANNEL_ORDER
+
+        channels = CHANNEL_ORDER
+        if notification is not None:
+            user = notification.user
+            reachable = tuple(
+                channel for channel in CHANNEL_ORDER
+                if channel not in CHANNEL_CONTACT_FIELDS
+                or getattr(user, CHANNEL_CONTACT_FIELDS[channel], None)
+            )
+            channels = reachable or CHANNEL_ORDER
+
+        return get_channel_stats().rank(channels)
+
+    @staticmethod
+    def check_exhausted(notification):
+        """
+        Помечает уведомление как failed, если попытки исчерпаны (поля
+        EXHAUSTED_FIELDS). Возвращает True, если отправлять уведомление больше не нужно.
+        """
+
+        if notification.retry_count >= MAX_RETRIES:
+            notification.status = "failed"
+            notification.enqueued_at = None
+            return True
+        return False
+
+    @staticmethod
+    def record_attempt(notification, channel, success):
+        """
+        Фиксирует результат попытки отправки через канал.
+        Возвращает список измененных полей при успехе, иначе None.
+        """
+
+        notification.last_channel = channel
+
+        if success:
+            notification.status = "sent"
+            notification.sent_at = timezone.now()
+            notification.enqueued_at = None
+            return ["status", "last_channel", "sent_at", "enqueued_at"]
+        return None
+
+    @staticmethod
+    def retry_delay(retry_count):
+        """
+        Возвращает задержку в секундах перед повторной попыткой номер `retry_count`.
+        Задержка растет экспоненциально от RETRY_DELAY_SECONDS (но не больше
+        RETRY_MAX_DELAY_SECONDS) и случайно выбирается из второй половины интервала,
+        чтобы уведомления, упавшие одновременно, не повторялись тоже одновременно.
+        """
+
+        return backoff_delay(retry_count, RETRY_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS)
+
+    @staticmethod
+    def record_failure(notification):
+        """
+        Фиксирует провал всех каналов: назначает время следующей попытки
+        или помечает уведомление как failed, если попытки исчерпаны.
+        Аренда задачи (enqueued_at) переносится на время повторной попытки,
+        которую ставит schedule_retries, или очищается.
+        Возвращает список измененных полей.
+        """
+
+        notification.retry_count += 1
 
         if notification.retry_count >= MAX_RETRIES:
             notification.status = "failed"
-            notification.save(update_fields=["status"])
-            return notification
+            notification.enqueued_at = None
+            return ["status", "retry_count", "last_channel", "enqueued_at"]
+
+        delay = NotificationService.retry_delay(notification.retry_count)
+        notification.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        notification.enqueued_at = notification.next_attempt_at
+        return ["retry_count", "last_channel", "next_attempt_at", "enqueued_at"]
+
+    @staticmethod
+    def attempt(channel, user, message, timeout=None, cancelled=None):
+        """
+        Отправляет сообщение через канал с учетом выключателя и лимита частоты канала.
+        `timeout` - остаток бюджета доставки: им ограничены и ожидание токена,
+        и запрос к провайдеру. Если событие `cancelled` установлено до начала
+        запроса (хеджированная отправка уже завершилась), сообщение не отправляется.
+        Пока выключатель канала открыт, канал пропускается без обращения к провайдеру.
+        Если провайдер ответил отказом по лимиту, канал приостанавливается для
+        всех воркеров на retry_after секунд и отправка повторяется один раз.
+        Выключатель учитывает успехи и сбои провайдера (ProviderUnavailable);
+        отказ по конкретному получателю его состояние не меняет.
+        Возвращает True при успешной отправке.
+        """
+
+        breaker = get_circuit_breaker()
+        limiter = get_rate_limiter()
+        sender = SENDERS_MAP[channel]
 
-        for channel in CHANNEL_ORDER:
-            sender = SENDERS_MAP[channel]
+        deadline = None if timeout is None else time.monotonic() + timeout
 
+        if not breaker.allow(channel):
+            return False
+
+        for _ in range(2):
+            left = None if deadline is None else deadline - time.monotonic()
+            if not limiter.wait(channel, left):
+                return False
+
+            left = None if deadline is None else deadline - time.monotonic()
+            if (left is not None and left <= 0) or (cancelled is not None and cancelled.is_set()):
+                return False
+
+            started = time.monotonic()
+            outage = False
             try:
-                success = sender.send(user, message)
+                success = sender.send(user, message, timeout=left)
+            except RateLimitExceeded as e:
+                limiter.block(channel, e.retry_after)
+                continue
+            except ProviderUnavailable:
+                success, outage = False, True
             except Exception as e:
                 success = False
 
-            notification.last_channel = channel
+            get_channel_stats().record(channel, time.monotonic() - started, success)
+            if success or outage:
+                breaker.record(channel, success)
+            return success
 
-            if success:
-                notification.status = "sent"
-                notification.sent_at = timezone.now()
-                notification.save(update_fields=["status", "last_channel", "sent_at"])
-                return notification
+        return False
 
-        notification.retry_count += 1
-        notification.save(update_fields=["retry_count", "last_channel"])
+    @staticmethod
+    def deliver_hedged(notification, channels):
+        """
+        Хеджированная отправка: если канал не подтвердил отправку за
+        HEDGE_DELAY_SECONDS, параллельно запускается следующий канал цепочки
+        (при явной неудаче канала - сразу). Побеждает первый успешный канал,
+        он и записывается в last_channel. Меняет поля уведомления в памяти и
+        возвращает список измененных полей.
+
+        Запрос каждого канала ограничен остатком DELIVERY_BUDGET_SECONDS.
+        Когда доставка завершилась, попытки, которые еще не начали запрос
+        (ждут поток или токен), отменяются. Если бюджет истек, исход уже
+        отправленных запросов ожидается еще HEDGE_SETTLE_SECONDS: поздний успех
+        записывается как успех, а не как неудача, после которой повторная
+        попытка отправила бы сообщение второй раз.
+        """
+
+        user = notification.user
+        message = notification.message
+        executor = get_hedge_executor()
+
+        remaining = list(channels)
+        running = {}
+        cancelled = threading.Event()
+        deadline = time.monotonic() + settings.DELIVERY_BUDGET_SECONDS
+        next_launch = time.monotonic()
+
+        try:
+            while remaining or running:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+
+                if remaining and (not running or now >= next_launch):
+                    channel = remaining.pop(0)
+                    future = executor.submit(
+                        NotificationService.attempt, channel, user, message, deadline - now, cancelled
+                    )
+                    running[future] = channel
+                    notification.last_channel = channel
+                    next_launch = now + settings.HEDGE_DELAY_SECONDS
+                    continue
+
+                wake_at = min(deadline, next_launch) if remaining else deadline
+                done, _ = wait(running, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    channel = running.pop(future)
+                    if future.result():
+                        return NotificationService.record_attempt(notification, channel, True)
+                    next_launch = time.monotonic()
+
+            cancelled.set()
+            if running:
+                done, _ = wait(running, timeout=HEDGE_SETTLE_SECONDS)
+                for future in done:
+                    if not future.cancelled() and future.result():
+                        return NotificationService.record_attempt(notification, running[future], True)
+        finally:
+            cancelled.set()
+            for future in running:
+                future.cancel()
+
+        return NotificationService.record_failure(notification)
+
+    @staticmethod
+    def deliver(notification, channels=None, hedged=None):
+        """
+        Пытается отправить уведомление с fallback по каналам, не сохраняя его.
+        Меняет поля уведомления в памяти и возвращает список измененных полей.
+        Отправка ограничена DELIVERY_BUDGET_SECONDS: остаток бюджета передается
+        в попытку каждого канала как таймаут (attempt), а после его
+        исчерпания следующий канал не пробуется. При DELIVERY_MODE = "hedged"
+        (или hedged=True) используется deliver_hedged.
+        """
+
+        user = notification.user
+        message = notification.message
+
+        if NotificationService.check_exhausted(notification):
+            return EXHAUSTED_FIELDS
+
+        if channels is None:
+            channels = NotificationService.channel_order(notification)
+
+        if hedged is None:
+            hedged = settings.DELIVERY_MODE == "hedged"
+
+        if hedged:
+            return NotificationService.deliver_hedged(notification, channels)
+
+        deadline = time.monotonic() + settings.DELIVERY_BUDGET_SECONDS
+
+        for channel in channels:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+
+            success = NotificationService.attempt(channel, user, message, timeout=left)
+
+            update_fields = NotificationService.record_attempt(notification, channel, success)
+            if update_fields:
+                return update_fields
+
+        return NotificationService.record_failure(notification)
+
+    @staticmethod
+    def send_notification(notification):
+        """
+        Пытается отправить уведомление синхронно с fallback по каналам.
+        При полном провале назначает время повторной попытки (next_attempt_at).
+        Результат сохраняется сразу или, при STATUS_WRITE_BEHIND = True,
+        через отложенный писатель (persist). Об изменении сообщается через
+        status_changed.
+        """
+
+        update_fields = NotificationService.deliver(notification)
+        NotificationService.save_result(notification, update_fields)
 
         return notification
+
+    @staticmethod
+    def save_result(notification, update_fields):
+        """
+        Сохраняет результат отправки одного уведомления: сразу (только
+        `update_fields` и updated_at) с вызовом status_changed или, при
+        STATUS_WRITE_BEHIND = True, через отложенный писатель (persist).
+        """
+
+        if settings.STATUS_WRITE_BEHIND:
+            NotificationService.persist([notification])
+        else:
+            notification.save(update_fields=[*update_fields, "updated_at"])
+            NotificationService.status_changed([notification])
+
+    @staticmethod
+    def persist(notifications):
+        """
+        Сохраняет результаты отправки: при STATUS_WRITE_BEHIND = True - через
+        буфер отложенной записи воркера (writer.StatusWriter), иначе сразу (save_batch).
+        """
+
+        if settings.STATUS_WRITE_BEHIND:
+            get_status_writer().add(notifications)
+        else:
+            NotificationService.save_batch(notifications)
+
+    @staticmethod
+    def status_changed(notifications):
+        """
+        Вызывается после сохранения уведомлений: обновляет кэш статусов,
+        публикует изменения в поток статусов (events) и записывает в outbox
+        события для webhook-подписок (webhooks).
+        """
+
+        entries = store_statuses(notifications)
+        publish_statuses(entries)
+        record_webhook_events(entries)
+
+    @staticmethod
+    def save_batch(notifications):
+        """
+        Сохраняет результаты отправки пачки одним bulk_update и сообщает
+        об изменениях (status_changed). bulk_update не заполняет auto_now, поэтому updated_at
+        выставляется вручную.
+        """
+
+        now = timezone.now()
+        for notification in notifications:
+            notification.updated_at = now
+
+        Notification.objects.bulk_update(notifications, STATUS_FIELDS)
+        NotificationService.status_changed(notifications)
+
+    @staticmethod
+    def send_sms_grouped(notifications):
+        """
+        Отправляет SMS пачкой: уведомления с одинаковым текстом уходят одним
+        запросом к SMS.ru на SMS_BATCH_SIZE номеров, результат по каждому номеру
+        записывается в свое уведомление. Уведомления не сохраняются.
+        Выключатель SMS, как и в attempt, учитывает только успехи и сбои
+        провайдера: если SMS.ru отклонил все номера пачки, он не меняется.
+        Ожидание токена и запрос каждой пачки, как и попытка одного
+        уведомления, ограничены DELIVERY_BUDGET_SECONDS.
+        """
+
+        groups = defaultdict(list)
+        for notification in notifications:
+            groups[notification.message].append(notification)
+
+        breaker = get_circuit_breaker()
+        limiter = get_rate_limiter()
+        sender = SENDERS_MAP["sms"]
+
+        for message, group in groups.items():
+            for chunk in chunked(group, SMS_BATCH_SIZE):
+                deadline = time.monotonic() + settings.DELIVERY_BUDGET_SECONDS
+                if breaker.allow("sms") and limiter.wait("sms", settings.DELIVERY_BUDGET_SECONDS) \
+                        and deadline > time.monotonic():
+                    started = time.monotonic()
+                    outage = False
+                    try:
+                        results = sender.send_bulk(
+                            [notification.user for notification in chunk], message,
+                            timeout=deadline - started
+                        )
+                    except ProviderUnavailable:
+                        results, outage = [False] * len(chunk), True
+                    get_channel_stats().record("sms", time.monotonic() - started, any(results))
+                    if any(results) or outage:
+                        breaker.record("sms", any(results))
+                else:
+                    results = [False] * len(chunk)
+
+                for notification, success in zip(chunk, results):
+                    NotificationService.record_attempt(notification, "sms", success)
+
+    @staticmethod
+    def deliver_batch(notifications):
+        """
+        Отправляет пачку уведомлений, не сохраняя их.
+        Если SMS - первый канал, SMS отправляются сгруппированно (send_sms_grouped),
+        а остальные каналы пробуются только для уведомлений, SMS которых не дошли.
+        Пользователи должны быть загружены заранее (select_related("user")).
+        """
+
+        notifications = list(notifications)
+        sms_grouped = SMS_BATCH_SIZE > 1 and NotificationService.channel_order()[:1] == ("sms",)
+
+        if sms_grouped:
+            NotificationService.send_sms_grouped([
+                notification for notification in notifications
+                if not NotificationService.check_exhausted(notification)
+                and notification.user.phone_number
+            ])
+
+        for notification in notifications:
+            if notification.status != "pending":
+                continue
+            channels = NotificationService.channel_order(notification)
+            if sms_grouped:
+                channels = tuple(channel for channel in channels if channel != "sms")
+            NotificationService.deliver(notification, channels)
+
+        return notifications
+
+    @staticmethod
+    def send_batch(notifications):
+        """
+        Отправляет пачку уведомлений (deliver_batch) и сохраняет результаты (persist).
+        """
+
+        notifications = NotificationService.deliver_batch(notifications)
+        NotificationService.persist(notifications)
+
+        return notifications
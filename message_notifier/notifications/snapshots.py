@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .constants import SNAPSHOT_SCHEMA
+from .models import Notification
+from .services import NotificationService
+
+# Поля пользователя, которые нужны отправителям
+CONTACT_FIELDS = ("email", "phone_number", "telegram_id")
+
+
+def contact_of(user):
+    return {field: getattr(user, field) for field in CONTACT_FIELDS}
+
+
+def build_snapshot(notification, contact):
+    """
+    Собирает снимок уведомления для payload задачи: все, что нужно для
+    отправки, без обращения воркера к БД.
+
+    Поля:
+        schema: версия формата (SNAPSHOT_SCHEMA);
+        id, user, message, retry_count, priority, created_at: данные уведомления;
+        version: updated_at уведомления на момент снимка - по нему при
+            записи результата определяется, что строка не изменилась;
+        contact: контакты пользователя (CONTACT_FIELDS).
+
+    Аргументы:
+        notification (Notification): Сохраненное уведомление.
+        contact (dict): Контакты пользователя (contact_of).
+    """
+    return {
+        "schema": SNAPSHOT_SCHEMA,
+        "id": notification.id,
+        "user": notification.user_id,
+        "message": notification.message,
+        "retry_count": notification.retry_count,
+        "priority": notification.priority,
+        "created_at": notification.created_at.isoformat(),
+        "version": notification.updated_at.isoformat(),
+        "contact": contact,
+    }
+
+
+def restore(snapshot):
+    """
+    Восстанавливает из снимка несохраненный объект Notification с
+    пользователем, достаточный для NotificationService.deliver.
+    """
+    return Notification(
+        id=snapshot["id"],
+        user=get_user_model()(id=snapshot["user"], **snapshot["contact"]),
+        message=snapshot["message"],
+        retry_count=snapshot["retry_count"],
+        priority=snapshot.get("priority", "normal"),
+        created_at=datetime.fromisoformat(snapshot["created_at"]),
+        updated_at=datetime.fromisoformat(snapshot["version"]),
+    )
+
+
+def save_results(notifications):
+    """
+    Сохраняет результаты отправки уведомлений, восстановленных из снимков.
+
+    Строки блокируются одним SELECT ... FOR UPDATE; сохраняются только
+    уведомления, которые все еще в статусе pending и чей updated_at совпадает
+    с версией снимка. Остальные (строку уже изменил другой воркер, например
+    при повторной доставке задачи брокером) считаются устаревшими и не
+    перезаписывают более новое состояние.
+
+    Возвращает:
+        tuple[list[Notification], list[Notification]]: Сохраненные и устаревшие уведомления.
+    """
+    versions = {notification.id: notification.updated_at for notification in notifications}
+
+    with transaction.atomic():
+        current = dict(
+            Notification.objects
+            .select_for_update()
+            .filter(pk__in=versions, status="pending")
+            .values_list("id", "updated_at")
+        )
+        fresh = [n for n in notifications if current.get(n.id) == versions[n.id]]
+        stale = [n for n in notifications if current.get(n.id) != versions[n.id]]
+        if fresh:
+            NotificationService.save_batch(fresh)
+
+    return fresh, stale
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import deque
+
+from .constants import (
+    ADAPTIVE_MIN_SAMPLES,
+    ADAPTIVE_MIN_SUCCESS_RATE,
+    CHANNEL_STATS_MAX_AGE_SECONDS,
+    CHANNEL_STATS_WINDOW,
+)
+
+
+def percentile(values, fraction):
+    """
+    Возвращает перцентиль `fraction` (0..1) отсортированного списка значений.
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+class ChannelStats:
+    """
+    Скользящая статистика отправок по каналам в текущем процессе воркера.
+
+    Для каждого канала хранятся последние CHANNEL_STATS_WINDOW попыток не
+    старше CHANNEL_STATS_MAX_AGE_SECONDS: длительность и результат. Старые
+    попытки отбрасываются, поэтому канал, который давно не пробовали
+    (например, потому что он был последним в цепочке), снова считается
+    неизвестным и получает шанс проявить себя.
+
+    Методы:
+        record(channel, latency, success):
+            Учитывает попытку отправки через канал.
+
+        snapshot(channel):
+            Возвращает словарь {"samples", "success_rate", "p50", "p95"}
+            (задержки в секундах; None, если попыток нет).
+
+        rank(channels):
+            Упорядочивает каналы: сначала рабочие (доля успехов не ниже
+            ADAPTIVE_MIN_SUCCESS_RATE), среди них - по возрастанию p50,
+            затем p95. Каналы, по которым меньше ADAPTIVE_MIN_SAMPLES попыток,
+            идут первыми, чтобы статистика по ним набиралась. При равенстве
+            сохраняется исходный порядок.
+    """
+    def __init__(self, window=CHANNEL_STATS_WINDOW, max_age=CHANNEL_STATS_MAX_AGE_SECONDS):
+        self.window = window
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def _prune(self, samples, now):
+        while samples and now - samples[0][0] > self.max_age:
+            samples.popleft()
+
+    def record(self, channel, latency, success):
+        with self._lock:
+            samples = self._samples.setdefault(channel, deque(maxlen=self.window))
+            samples.append((time.monotonic(), latency, success))
+
+    def snapshot(self, channel):
+        with self._lock:
+            samples = self._samples.get(channel, deque())
+            self._prune(samples, time.monotonic())
+            latencies = sorted(latency for _, latency, _ in samples)
+            successes = sum(1 for _, _, success in samples if success)
+
+        return {
+            "samples": len(latencies),
+            "success_rate": successes / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+        }
+
+    def rank(self, channels):
+        def key(channel):
+            stats = self.snapshot(channel)
+            if stats["samples"] < ADAPTIVE_MIN_SAMPLES:
+                return (0, 0, 0)
+            broken = stats["success_rate"] < ADAPTIVE_MIN_SUCCESS_RATE
+            return (1 if broken else 0, stats["p50"], stats["p95"])
+
+        return tuple(sorted(channels, key=key))
+
+
+_channel_stats = None
+
+
+def get_channel_stats():
+    """
+    Возвращает статистику каналов текущего процесса (создается при первом вызове).
+    """
+    global _channel_stats
+    if _channel_stats is None:
+        _channel_stats = ChannelStats()
+    return _channel_stats
@@ -0,0 +1,79 @@
+import hashlib
+import json
+
+import redis
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .constants import STATUS_CACHE_TIMEOUT
+from .models import Notification
+
+
+def status_cache_key(pk):
+    return f"notifier:status:{pk}"
+
+
+def build_status_entry(notification):
+    """
+    Собирает запись кэша для уведомления: сериализованные данные, ETag
+    (хэш данных), время последнего изменения для Last-Modified (updated_at,
+    целые секунды) и версию (updated_at с микросекундами) для long-poll.
+    """
+    from .api.serializers import NotificationSerializer
+
+    data = dict(NotificationSerializer(notification).data)
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return {
+        "data": data,
+        "etag": f'"{hashlib.md5(body.encode()).hexdigest()}"',
+        "last_modified": int(notification.updated_at.timestamp()),
+        "version": notification.updated_at.timestamp(),
+    }
+
+
+def get_status(pk):
+    """
+    Возвращает запись кэша уведомления `pk` (см. build_status_entry) или None,
+    если уведомления нет. При промахе запись читается из БД и кладется в кэш
+    через cache.add: если NotificationService уже записал более свежую версию,
+    она не будет перезаписана устаревшими данными. Если кэш недоступен,
+    запись собирается из БД.
+    """
+    try:
+        entry = cache.get(status_cache_key(pk))
+    except redis.RedisError as e:
+        print(f"Кэш статусов недоступен, статус читается из БД: {e}")
+        entry = None
+    if entry is not None:
+        return entry
+
+    notification = Notification.objects.filter(pk=pk).first()
+    if notification is None:
+        return None
+
+    entry = build_status_entry(notification)
+    try:
+        cache.add(status_cache_key(pk), entry, STATUS_CACHE_TIMEOUT)
+    except redis.RedisError as e:
+        print(f"Кэш статусов недоступен, статус не закэширован: {e}")
+    return entry
+
+
+def store_statuses(notifications):
+    """
+    Обновляет кэш после того, как NotificationService изменил уведомления:
+    записи заменяются актуальными данными (write-through), поэтому следующий
+    опрос статуса не идет в БД. Обновление кэша необязательно: если кэш
+    недоступен, ошибка выводится, а записи все равно возвращаются для
+    публикации и webhook-событий (устаревшую запись вытеснит таймаут
+    STATUS_CACHE_TIMEOUT).
+    """
+    entries = [build_status_entry(notification) for notification in notifications]
+    try:
+        cache.set_many({
+            status_cache_key(entry["data"]["id"]): entry
+            for entry in entries
+        }, STATUS_CACHE_TIMEOUT)
+    except redis.RedisError as e:
+        print(f"Кэш статусов недоступен, записи не обновлены: {e}")
+    return entries
@@ -1,12 +1,449 @@
-from celery import shared_task
-from .models import Notification
-from .services import NotificationService
+from datetime import timedelta
+
+from celery import current_app, shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .constants import (
+    BATCH_TASK_SIZE,
+    CAMPAIGN_STALL_SECONDS,
+    ENQUEUE_LEASE_SECONDS,
+    SNAPSHOT_SCHEMA,
+    STUCK_NOTIFICATION_GRACE_SECONDS,
+    SWEEP_BATCH_SIZE,
+)
+from .dedup import DedupKeys, find_duplicates
+from .digest import defer, send_digests, split_window
+from .engine import AsyncDeliveryEngine
+from .models import Campaign, Notification, WebhookEvent, WebhookSubscription
+from .routing import channel_queue, group_by_queue, queue_for
+from .services import EXHAUSTED_FIELDS, NotificationService
+from .snapshots import CONTACT_FIELDS, build_snapshot, contact_of, restore, save_results
+from .templating import get_compiled_template
+from .utils import chunked
+from .webhooks import flush_subscription
 
 
 @shared_task
 def process_notification(notification_id):
     notification = Notification.objects.get(pk=notification_id)
 
+    if notification.status != "pending":
+        return {"status": "skipped", "id": notification.id}
+
+    if settings.NOTIFICATION_DIGEST_WINDOW:
+        schedule_retries(send_coalesced([notification]))
+        return {"status": "ok", "id": notification.id}
+
+    if settings.CHANNEL_TASKS:
+        dispatch_channels([notification])
+        return {"status": "dispatched", "id": notification.id}
+
     result = NotificationService.send_notification(notification)
+    schedule_retries([result])
 
     return {"status": "ok", "id": notification.id}
+
+
+@shared_task
+def process_notification_batch(notification_ids):
+    notifications = (
+        Notification.objects
+        .select_related("user")
+        .filter(pk__in=notification_ids, status="pending")
+    )
+
+    result = send_loaded(notifications)
+    schedule_retries(result)
+
+    return {"status": "ok", "ids": [notification.id for notification in result]}
+
+
+@shared_task
+def render_notifications(template_id, version, user_ids, updated_at=None):
+    """
+    Создает уведомления по шаблону для пачки пользователей.
+
+    Шаблон берется из кэша скомпилированных шаблонов воркера
+    (templating.get_compiled_template), пользователи загружаются одним
+    запросом только с нужными шаблону и отправителям полями, тексты
+    рендерятся для всей пачки сразу. Дальше путь тот же, что у
+    NotificationBulkCreateView: уведомления вставляются одним bulk_create
+    и в той же транзакции записываются в outbox (при TASK_PAYLOAD_SNAPSHOT
+    - со снимками), а задачи отправки в очереди их приоритета публикует
+    ретранслятор outbox. При включенном окне NOTIFICATION_DEDUP_WINDOW
+    уведомления, уже созданные в окне (например, при повторе задачи), не
+    создаются повторно (dedup.find_duplicates). Аргумент updated_at не
+    используется: он остался в задачах, поставленных в очередь раньше.
+    """
+    from .outbox import add_to_outbox
+
+    template = get_compiled_template(template_id)
+    if template.version != version:
+        print(f"Шаблон {template_id} изменен (v{version} -> v{template.version}), используется новая версия")
+
+    users = list(
+        get_user_model().objects
+        .filter(pk__in=user_ids)
+        .only(*dict.fromkeys((*CONTACT_FIELDS, *template.fields)))
+    )
+    messages = template.render_many([
+        {field: getattr(user, field) for field in template.fields}
+        for user in users
+    ])
+
+    keys = [DedupKeys.for_request(user.pk, message) for user, message in zip(users, messages)]
+    duplicates = find_duplicates([key for key in keys if key is not None])
+    rows = [
+        (user, message, key) for user, message, key in zip(users, messages, keys)
+        if key is None or key.db_key not in duplicates
+    ]
+
+    with transaction.atomic():
+        notifications = Notification.objects.bulk_create([
+            Notification(user=user, message=message, dedup_key=key.db_key if key is not None else None)
+            for user, message, key in rows
+        ])
+        snapshots = None
+        if settings.TASK_PAYLOAD_SNAPSHOT:
+            snapshots = [build_snapshot(notification, contact_of(notification.user)) for notification in notifications]
+        add_to_outbox([notification.id for notification in notifications], snapshots)
+
+    return {"status": "queued", "ids": [notification.id for notification in notifications]}
+
+
+@shared_task
+def send_via_channel(notification_id, channels):
+    """
+    Одна попытка отправки уведомления через первый канал из `channels`
+    (при CHANNEL_TASKS = True).
+
+    Задача выполняется в очереди канала (routing.channel_queue), поэтому
+    медленный канал занимает только свои воркеры. При неудаче попытка
+    следующего канала ставится в его очередь, после последнего канала
+    назначается повторная попытка (NotificationService.record_failure).
+    Хеджирование и DELIVERY_BUDGET_SECONDS в этом режиме не применяются:
+    время попытки ограничивает таймаут отправителя.
+    """
+    notification = Notification.objects.select_related("user").get(pk=notification_id)
+
+    if notification.status != "pending":
+        return {"status": "skipped", "id": notification.id}
+
+    if NotificationService.check_exhausted(notification):
+        NotificationService.save_result(notification, EXHAUSTED_FIELDS)
+        return {"status": "failed", "id": notification.id}
+
+    channel, rest = channels[0], channels[1:]
+    success = NotificationService.attempt(channel, notification.user, notification.message)
+    update_fields = NotificationService.record_attempt(notification, channel, success)
+
+    if update_fields is None and rest:
+        send_via_channel.apply_async(
+            (notification.id, rest),
+            queue=channel_queue(rest[0], notification.priority)
+        )
+        return {"status": "next", "id": notification.id, "channel": rest[0]}
+
+    if update_fields is None:
+        update_fields = NotificationService.record_failure(notification)
+
+    NotificationService.save_result(notification, update_fields)
+    schedule_retries([notification])
+
+    return {"status": notification.status, "id": notification.id, "channel": channel}
+
+
+@shared_task
+def process_notification_snapshots(snapshots):
+    """
+    Обрабатывает пачку уведомлений по снимкам из payload задачи
+    (notifications.snapshots): отправка идет без чтения уведомлений и
+    пользователей из БД. Как и process_notification_batch, задача учитывает
+    CHANNEL_TASKS (попытки ставятся задачами каналов). Результаты
+    сохраняются одной транзакцией с проверкой версии снимка (save_results)
+    и при STATUS_WRITE_BEHIND: отложенный писатель версию не проверяет и
+    затер бы изменения, сделанные после снимка. Снимки неизвестной версии формата обрабатываются
+    по ID из БД (process_notification_batch в очереди своего приоритета),
+    как и все снимки при включенном дайджесте: объединение уведомлений
+    требует чтения из БД.
+    """
+    if settings.NOTIFICATION_DIGEST_WINDOW:
+        return process_notification_batch([snapshot["id"] for snapshot in snapshots])
+
+    unknown = [
+        (snapshot["id"], snapshot.get("priority", "normal"))
+        for snapshot in snapshots if snapshot.get("schema") != SNAPSHOT_SCHEMA
+    ]
+    if unknown:
+        enqueue_by_priority(unknown)
+
+    notifications = [restore(snapshot) for snapshot in snapshots if snapshot.get("schema") == SNAPSHOT_SCHEMA]
+
+    if settings.CHANNEL_TASKS:
+        dispatch_channels(notifications)
+        return {"status": "dispatched", "ids": [notification.id for notification in notifications]}
+
+    if settings.ASYNC_DELIVERY_ENABLED:
+        notifications = AsyncDeliveryEngine().run(notifications)
+    else:
+        notifications = NotificationService.deliver_batch(notifications)
+
+    saved, stale = save_results(notifications)
+    if stale:
+        print(f"Уведомления изменились после снимка, результат не записан: {[n.id for n in stale]}")
+
+    schedule_retries(saved)
+
+    return {"status": "ok", "ids": [notification.id for notification in saved]}
+
+
+@shared_task
+def sweep_stuck_notifications():
+    """
+    Периодическая задача: снова ставит в очередь зависшие уведомления.
+
+    Зависшим считается уведомление в статусе pending, попытка которого
+    должна была начаться более STUCK_NOTIFICATION_GRACE_SECONDS назад, а
+    аренда задачи (enqueued_at) истекла больше ENQUEUE_LEASE_SECONDS назад
+    (задача потерялась при перезапуске брокера или воркера). Уведомления,
+    задачи которых просто ждут в очереди с отставанием (например, bulk),
+    не берутся, поэтому не отправляются дважды. За один проход берется не
+    больше SWEEP_BATCH_SIZE строк по частичному индексу notif_pending_idx;
+    строки блокируются через SKIP LOCKED, поэтому параллельные проходы не
+    берут одни и те же уведомления. У взятых строк next_attempt_at и
+    enqueued_at сдвигаются на текущее время, и следующий проход подберет
+    их, только если они снова зависнут.
+    """
+    now = timezone.now()
+    deadline = now - timedelta(seconds=STUCK_NOTIFICATION_GRACE_SECONDS)
+    lease_expired = now - timedelta(seconds=ENQUEUE_LEASE_SECONDS)
+
+    with transaction.atomic():
+        rows = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .due_for_retry(deadline)
+            .filter(Q(enqueued_at__isnull=True) | Q(enqueued_at__lte=lease_expired))
+            .values_list("id", "priority")[:SWEEP_BATCH_SIZE]
+        )
+        Notification.objects.filter(pk__in=[pk for pk, _ in rows]).update(next_attempt_at=now, enqueued_at=now)
+        transaction.on_commit(lambda: enqueue_by_priority(rows))
+
+    return {"status": "ok", "count": len(rows)}
+
+
+@shared_task
+def flush_webhooks(subscription_id=None):
+    """
+    Отправляет накопленные события webhook-подписок.
+
+    Запускается периодически (celery beat, раз в WEBHOOK_FLUSH_INTERVAL
+    секунд) для всех подписок, у которых есть события, готовые к отправке,
+    и сразу для одной подписки, когда у нее накопилось WEBHOOK_BATCH_SIZE
+    событий (record_webhook_events).
+    """
+    subscriptions = WebhookSubscription.objects.filter(is_active=True)
+    if subscription_id is not None:
+        subscriptions = subscriptions.filter(pk=subscription_id)
+    else:
+        due = WebhookEvent.objects.filter(status="pending", next_attempt_at__lte=timezone.now())
+        subscriptions = subscriptions.filter(pk__in=due.values("subscription_id"))
+
+    delivered = sum(flush_subscription(subscription) for subscription in subscriptions)
+
+    return {"status": "ok", "delivered": delivered}
+
+
+@shared_task
+def run_campaign(campaign_id):
+    """
+    Создает уведомления рассылки (notifications.campaigns.fan_out),
+    продолжая с сохраненной позиции.
+    """
+    from .campaigns import fan_out
+
+    campaign = fan_out(campaign_id)
+
+    return {"status": campaign.status, "id": campaign.id, "created": campaign.created_count}
+
+
+@shared_task
+def resume_campaigns():
+    """
+    Периодическая задача: продолжает рассылки, прерванные падением воркера.
+
+    Прерванной считается рассылка в статусе pending или running без
+    прогресса больше CAMPAIGN_STALL_SECONDS. Если рассылку на самом деле еще
+    обрабатывает другой воркер, повторный запуск остановится на первой же
+    части (store_chunk проверяет курсор под блокировкой).
+    """
+    deadline = timezone.now() - timedelta(seconds=CAMPAIGN_STALL_SECONDS)
+    ids = list(
+        Campaign.objects
+        .filter(status__in=("pending", "running"), updated_at__lt=deadline)
+        .values_list("id", flat=True)
+    )
+
+    with current_app.producer_or_acquire() as producer:
+        for campaign_id in ids:
+            run_campaign.apply_async((campaign_id,), producer=producer)
+
+    return {"status": "ok", "count": len(ids)}
+
+
+def send_loaded(notifications):
+    """
+    Отправляет пачку уведомлений с загруженными пользователями и сохраняет
+    результаты: дайджестами при NOTIFICATION_DIGEST_WINDOW > 0 (send_coalesced),
+    задачами отдельных каналов при CHANNEL_TASKS (dispatch_channels; тогда
+    результаты сохраняют они, и возвращается пустой список), через
+    AsyncDeliveryEngine при ASYNC_DELIVERY_ENABLED, иначе через
+    NotificationService.send_batch.
+    """
+    if settings.NOTIFICATION_DIGEST_WINDOW:
+        return send_coalesced(notifications)
+    if settings.CHANNEL_TASKS:
+        dispatch_channels(notifications)
+        return []
+    if settings.ASYNC_DELIVERY_ENABLED:
+        return AsyncDeliveryEngine().send_batch(notifications)
+    return NotificationService.send_batch(notifications)
+
+
+def send_coalesced(notifications):
+    """
+    Отправляет уведомления дайджестами (notifications.digest).
+
+    Уведомления, окно которых еще не закрылось, откладываются до его
+    закрытия (process_notification с eta), остальные отправляются вместе со
+    всеми ожидающими уведомлениями своих пользователей (send_digests).
+    Задачи отложенных уведомлений, уже вошедших в дайджест, пропускают их.
+
+    Возвращает:
+        list[Notification]: Первые уведомления отправленных дайджестов (send_digests).
+    """
+    due, early = split_window(notifications)
+
+    if early:
+        defer(early)
+        with current_app.producer_or_acquire() as producer:
+            for notification in early:
+                process_notification.apply_async(
+                    (notification.id,),
+                    eta=notification.next_attempt_at,
+                    queue=queue_for(notification.priority),
+                    producer=producer
+                )
+
+    return send_digests(due)
+
+
+def dispatch_channels(notifications):
+    """
+    Ставит первую попытку отправки каждого уведомления задачей
+    send_via_channel в очередь первого канала его цепочки
+    (NotificationService.channel_order).
+    """
+    with current_app.producer_or_acquire() as producer:
+        for notification in notifications:
+            channels = list(NotificationService.channel_order(notification))
+            send_via_channel.apply_async(
+                (notification.id, channels),
+                queue=channel_queue(channels[0], notification.priority),
+                producer=producer
+            )
+
+
+def schedule_retries(notifications):
+    """
+    Ставит в очередь повторные попытки для уведомлений, которые остались
+    в статусе pending после неудачной отправки. Каждая попытка запускается
+    в свое время next_attempt_at, назначенное NotificationService.record_failure.
+
+    Аргументы:
+        notifications (Iterable[Notification]): Уведомления после попытки отправки.
+    """
+    retries = [
+        notification for notification in notifications
+        if notification.status == "pending" and notification.retry_count > 0
+    ]
+    if not retries:
+        return
+
+    with current_app.producer_or_acquire() as producer:
+        for notification in retries:
+            process_notification.apply_async(
+                (notification.id,),
+                eta=notification.next_attempt_at,
+                queue=queue_for(notification.priority),
+                producer=producer
+            )
+
+
+def enqueue_snapshots(snapshots, batch_size=BATCH_TASK_SIZE, queue=None):
+    """
+    Ставит в очередь обработку уведомлений по снимкам (process_notification_snapshots)
+    задачами по `batch_size` снимков через одно соединение с брокером.
+
+    Аргументы:
+        snapshots (Iterable[dict]): Снимки уведомлений (snapshots.build_snapshot).
+        batch_size (int): Количество уведомлений в одной задаче.
+        queue (str | None): Очередь Celery (по умолчанию - CELERY_TASK_DEFAULT_QUEUE).
+    """
+    with current_app.producer_or_acquire() as producer:
+        for chunk in chunked(snapshots, max(1, batch_size)):
+            process_notification_snapshots.apply_async((chunk,), queue=queue, producer=producer)
+
+
+def enqueue_template(template, user_ids, batch_size=BATCH_TASK_SIZE):
+    """
+    Ставит в очередь отправку шаблона `template` (его текущей версии)
+    пользователям `user_ids` задачами render_notifications по `batch_size`
+    пользователей через одно соединение с брокером.
+    """
+    args = (template.pk, template.version)
+    with current_app.producer_or_acquire() as producer:
+        for chunk in chunked(user_ids, max(1, batch_size)):
+            render_notifications.apply_async((*args, chunk), producer=producer)
+
+
+def enqueue_by_priority(rows, batch_size=BATCH_TASK_SIZE):
+    """
+    Ставит в очередь обработку уведомлений, распределяя их по очередям
+    приоритетов (routing.queue_for): срочные уведомления не ждут за
+    рассылками.
+
+    Аргументы:
+        rows (Iterable[tuple[int, str]]): Пары (ID уведомления, приоритет).
+        batch_size (int): Количество уведомлений в одной задаче.
+    """
+    for queue, notification_ids in group_by_queue(rows).items():
+        enqueue_notifications(notification_ids, batch_size, queue)
+
+
+def enqueue_notifications(notification_ids, batch_size=BATCH_TASK_SIZE, queue=None):
+    """
+    Ставит в очередь обработку пачки уведомлений.
+
+    ID группируются в задачи process_notification_batch по `batch_size`
+    штук (при batch_size <= 1 - отдельная задача process_notification на
+    каждое уведомление). Все задачи публикуются через одно соединение с
+    брокером (producer_or_acquire), а не через отдельное соединение из пула
+    на каждый вызов .delay().
+
+    Аргументы:
+        notification_ids (Iterable[int]): ID уведомлений.
+        batch_size (int): Количество уведомлений в одной задаче.
+        queue (str | None): Очередь Celery (по умолчанию - CELERY_TASK_DEFAULT_QUEUE).
+    """
+    with current_app.producer_or_acquire() as producer:
+        if batch_size <= 1:
+            for notification_id in notification_ids:
+                process_notification.apply_async((notification_id,), queue=queue, producer=producer)
+            return
+
+        for chunk in chunked(notification_ids, batch_size):
+            process_notification_batch.apply_async((chunk,), queue=queue, producer=producer)
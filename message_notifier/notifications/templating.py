@@ -0,0 +1,94 @@
+import re
+from functools import lru_cache
+
+from .constants import TEMPLATE_CACHE_SIZE, TEMPLATE_FIELDS
+from .models import NotificationTemplate
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class CompiledTemplate:
+    """
+    Скомпилированный шаблон уведомления.
+
+    Текст шаблона один раз разбирается на чередующиеся литералы и имена
+    полей, после чего подстановка - это только склейка строк, без
+    повторного разбора для каждого получателя.
+
+    Атрибуты:
+        template_id (int): ID шаблона.
+        version (int): Версия шаблона.
+        fields (tuple[str]): Поля пользователя, которые использует шаблон.
+
+    Методы:
+        render(values):
+            Подставляет значения из словаря `values` (отсутствующие и None - пустая строка).
+
+        render_many(rows):
+            Рендерит шаблон для списка словарей полей пользователей.
+
+    Исключения:
+        ValueError: Если шаблон использует поле не из TEMPLATE_FIELDS.
+    """
+    def __init__(self, template_id, version, body):
+        self.template_id = template_id
+        self.version = version
+
+        parts = PLACEHOLDER.split(body)
+        self.literals = tuple(parts[0::2])
+        self.placeholders = tuple(parts[1::2])
+        self.fields = tuple(dict.fromkeys(self.placeholders))
+
+        unknown = [field for field in self.fields if field not in TEMPLATE_FIELDS]
+        if unknown:
+            raise ValueError(f"Недопустимые поля шаблона: {', '.join(unknown)}")
+
+    def render(self, values):
+        chunks = [self.literals[0]]
+        for field, literal in zip(self.placeholders, self.literals[1:]):
+            value = values.get(field)
+            chunks.append("" if value is None else str(value))
+            chunks.append(literal)
+        return "".join(chunks)
+
+    def render_many(self, rows):
+        if not self.placeholders:
+            return [self.literals[0]] * len(rows)
+        return [self.render(row) for row in rows]
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(template_id, version, body):
+    """
+    Компилирует шаблон с кэшированием в процессе (LRU на TEMPLATE_CACHE_SIZE
+    шаблонов). Ключ - (id, version, текст): текст сравнивается по хэшу, и
+    шаблон, созданный заново с тем же id и снова получивший версию 1
+    (например, SQLite повторно использует id после удаления), не совпадет
+    с закэшированным.
+    """
+    return CompiledTemplate(template_id, version, body)
+
+
+def get_compiled_template(template_id):
+    """
+    Возвращает скомпилированную текущую версию шаблона `template_id`.
+
+    Текст и версия читаются из БД одним запросом по первичному ключу, а
+    компиляция берется из кэша compile_template, поэтому воркер никогда не
+    отдает устаревший текст (тексты старых версий не хранятся).
+
+    Исключения:
+        NotificationTemplate.DoesNotExist: Если шаблона нет.
+    """
+    template = NotificationTemplate.objects.only("body", "version").get(pk=template_id)
+    return compile_template(template.pk, template.version, template.body)
+
+
+def compile_body(body):
+    """
+    Проверяет текст шаблона без сохранения.
+
+    Исключения:
+        ValueError: Если шаблон использует поле не из TEMPLATE_FIELDS.
+    """
+    return CompiledTemplate(None, None, body)
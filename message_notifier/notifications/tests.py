@@ -1 +1,1784 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import hmac
+import io
+import os
+import smtplib
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import redis
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ReadTimeoutError
+
+from notifications import digest, webhooks
+from notifications.breaker import CircuitBreaker, LocalCircuitState
+from notifications.campaigns import fan_out, progress
+from notifications.constants import (
+    ADAPTIVE_MIN_SAMPLES,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_PROBE_SECONDS,
+    ENQUEUE_LEASE_SECONDS,
+    MAX_RETRIES,
+    RETRY_DELAY_SECONDS,
+    STUCK_NOTIFICATION_GRACE_SECONDS,
+)
+from notifications.dedup import DedupKeys, Deduplicator
+from notifications.engine import AsyncDeliveryEngine
+from notifications.manager import NotificationManager
+from notifications.models import (
+    Campaign,
+    Notification,
+    NotificationOutbox,
+    NotificationTemplate,
+    WebhookEvent,
+    WebhookSubscription,
+)
+from notifications.outbox import relay_outbox
+from notifications.ratelimit import LocalTokenBucket, RateLimiter
+from notifications.senders.base import AsyncBaseSender, ProviderUnavailable, RateLimitExceeded, SyncSenderAdapter
+from notifications.senders.email import EmailSender
+from notifications.senders.http import HTTPSessionMixin, build_session
+from notifications.senders.sms import SMSSender
+from notifications.senders.smtp_pool import SMTPConnectionPool
+from notifications.snapshots import restore, save_results
+from notifications.stats import ChannelStats
+from notifications.tasks import (
+    dispatch_channels,
+    enqueue_notifications,
+    process_notification,
+    process_notification_batch,
+    process_notification_snapshots,
+    render_notifications,
+    send_coalesced,
+    send_via_channel,
+    sweep_stuck_notifications,
+)
+from notifications.templating import compile_body, compile_template, get_compiled_template
+from notifications.utils import backoff_delay
+from notifications.writer import StatusWriter
+from notifications.services import NotificationService
+from users.models import User
+
+
+@skipUnless(connection.vendor == "postgresql", "Планы запросов проверяются только на PostgreSQL")
+class NotificationQueryPlanTests(TestCase):
+    """
+    Проверяет, что горячие запросы к таблице уведомлений используют свои индексы.
+
+    В тестовой базе всего несколько строк, и на такой таблице планировщик
+    PostgreSQL честно выбирает последовательное сканирование. Поэтому перед
+    EXPLAIN последовательное сканирование запрещается (enable_seqscan = off):
+    если подходящего индекса нет или запрос написан так, что индекс
+    применить нельзя, в плане все равно останется Seq Scan и тест упадет.
+
+    Запуск (нужна база PostgreSQL из настроек проекта):
+        python manage.py test notifications
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="plan@example.com",
+            username="plan",
+            phone_number="79990000000"
+        )
+        Notification.objects.bulk_create([
+            Notification(user=cls.user, message=f"message {i}", status=status)
+            for i, status in enumerate(("pending", "sent", "failed") * 10)
+        ])
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        self.addCleanup(self._reset_seqscan)
+
+    @staticmethod
+    def _reset_seqscan():
+        with connection.cursor() as cursor:
+            cursor.execute("RESET enable_seqscan")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_retry_sweep_uses_partial_pending_index(self):
+        self.assertUsesIndex(
+            Notification.objects.due_for_retry(timezone.now()),
+            "notif_pending_idx"
+        )
+
+    def test_status_dashboard_uses_status_created_index(self):
+        self.assertUsesIndex(
+            Notification.objects.with_status("sent", since=timezone.now() - timedelta(days=1)),
+            "notif_status_created_idx"
+        )
+
+    def test_user_history_uses_user_created_index(self):
+        self.assertUsesIndex(
+            Notification.objects.for_user(self.user),
+            "notif_user_created_idx"
+        )
+
+    def test_campaign_progress_uses_campaign_status_index(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(campaign_id=1).values_list("status").annotate(count=Count("id")).order_by(),
+            "notif_campaign_status_idx"
+        )
+
+    def test_list_page_uses_created_id_index(self):
+        self.assertUsesIndex(
+            Notification.objects.newest_first(before=(timezone.now(), 10**9))[:50],
+            "notif_created_id_idx"
+        )
+
+    def test_user_list_page_uses_user_created_index(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user).newest_first(before=(timezone.now(), 10**9))[:50],
+            "notif_user_created_idx"
+        )
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class NotificationStatusCacheTests(TestCase):
+    """
+    Проверяет кэш статусов и условные GET-запросы к эндпоинту уведомления.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="cache@example.com", username="cache")
+        cls.notification = Notification.objects.create(user=cls.user, message="hello")
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("notifications-detail", args=[self.notification.pk])
+
+    def test_repeated_poll_is_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "pending")
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_service_update_refreshes_cached_status(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        notification = Notification.objects.select_related("user").get(pk=self.notification.pk)
+        notification.status = "failed"
+        NotificationService.save_batch([notification])
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "failed")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_missing_notification_returns_404(self):
+        response = self.client.get(reverse("notifications-detail", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cache_outage_falls_back_to_database(self):
+        error = redis.ConnectionError("down")
+        with mock.patch.multiple(cache, get=mock.Mock(side_effect=error), add=mock.Mock(side_effect=error)), \
+                mock.patch("builtins.print"):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "pending")
+
+    def test_cache_outage_does_not_break_status_update(self):
+        notification = Notification.objects.select_related("user").get(pk=self.notification.pk)
+        notification.status = "sent"
+        with mock.patch.object(cache, "set_many", side_effect=redis.ConnectionError("down")), \
+                mock.patch("notifications.services.record_webhook_events") as record, \
+                mock.patch("builtins.print"):
+            NotificationService.save_batch([notification])
+
+        self.assertEqual(Notification.objects.get(pk=notification.pk).status, "sent")
+        self.assertEqual(record.call_args.args[0][0]["data"]["status"], "sent")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class WebhookOutboxTests(TestCase):
+    """
+    Проверяет outbox событий webhook-подписок и его отправку пачками.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="hook@example.com", username="hook")
+        cls.subscription = WebhookSubscription.objects.create(name="crm", url="http://crm.local/hook")
+        WebhookSubscription.objects.create(name="audit", url="http://audit.local/hook", statuses=["failed"])
+
+    def setUp(self):
+        cache.clear()
+        webhooks._subscriptions = None
+        self.notifications = list(Notification.objects.bulk_create([
+            Notification(user=self.user, message=f"message {i}") for i in range(3)
+        ]))
+        for notification in self.notifications:
+            notification.user = self.user
+
+    def save(self, status):
+        for notification in self.notifications:
+            notification.status = status
+        NotificationService.save_batch(self.notifications)
+
+    def test_final_statuses_are_recorded_per_matching_subscription(self):
+        self.save("pending")
+        self.assertFalse(WebhookEvent.objects.exists())
+
+        self.save("sent")
+        self.assertEqual(WebhookEvent.objects.filter(subscription=self.subscription).count(), 3)
+        self.assertEqual(WebhookEvent.objects.count(), 3)
+
+    def test_delivered_batch_is_removed_from_outbox(self):
+        self.save("sent")
+        with mock.patch.object(webhooks.dispatcher, "deliver", return_value=True) as deliver:
+            self.assertEqual(webhooks.flush_subscription(self.subscription), 3)
+
+        deliver.assert_called_once()
+        self.assertEqual(len(deliver.call_args.args[1]), 3)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_failed_batch_is_retried_later(self):
+        self.save("sent")
+        with mock.patch.object(webhooks.dispatcher, "deliver", return_value=False):
+            self.assertEqual(webhooks.flush_subscription(self.subscription), 0)
+
+        events = WebhookEvent.objects.filter(subscription=self.subscription)
+        self.assertTrue(all(event.attempts == 1 for event in events))
+        self.assertTrue(all(event.next_attempt_at > timezone.now() for event in events))
+
+    def test_full_batch_triggers_flush_once_per_window(self):
+        with mock.patch("notifications.webhooks.WEBHOOK_BATCH_SIZE", 3), \
+                mock.patch("notifications.webhooks.current_app.send_task") as send_task:
+            self.save("sent")
+            self.save("sent")
+
+        send_task.assert_called_once_with("notifications.tasks.flush_webhooks", (self.subscription.pk,))
+
+    def test_batch_is_leased_while_posting(self):
+        self.save("sent")
+
+        def deliver(subscription, payloads):
+            # Пока идет запрос, события пачки не достаются параллельной отправке
+            self.assertEqual(webhooks.flush_subscription(subscription), 0)
+            return True
+
+        with mock.patch.object(webhooks.dispatcher, "deliver", side_effect=deliver) as mocked:
+            self.assertEqual(webhooks.flush_subscription(self.subscription), 3)
+
+        mocked.assert_called_once()
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_signature_is_hmac_of_body(self):
+        expected = hmac.new(b"secret", b"{}", hashlib.sha256).hexdigest()
+        self.assertEqual(webhooks.sign("secret", b"{}"), f"sha256={expected}")
+
+
+class NotificationOutboxTests(TestCase):
+    """
+    Проверяет, что API пишет уведомления в outbox, а ретранслятор публикует их.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="outbox@example.com", username="outbox")
+
+    def test_create_writes_outbox_without_publishing(self):
+        with mock.patch("notifications.tasks.enqueue_notifications") as enqueue:
+            response = self.client.post(
+                reverse("notifications-create"),
+                {"user": self.user.pk, "message": "hello"},
+                content_type="application/json"
+            )
+
+        self.assertEqual(response.status_code, 201)
+        enqueue.assert_not_called()
+        self.assertTrue(NotificationOutbox.objects.filter(notification_id=response.json()["id"]).exists())
+
+    def test_relay_publishes_and_clears_outbox(self):
+        response = self.client.post(
+            reverse("notifications-bulk-create"),
+            [{"user": self.user.pk, "message": f"message {i}"} for i in range(3)],
+            content_type="application/json"
+        )
+        ids = response.json()["ids"]
+
+        with mock.patch("notifications.tasks.enqueue_notifications") as enqueue:
+            self.assertEqual(relay_outbox(batch_size=2), 2)
+            self.assertEqual(relay_outbox(batch_size=2), 1)
+
+        self.assertEqual([call.args[0] for call in enqueue.call_args_list], [ids[:2], ids[2:]])
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_relay_command_closes_connections_after_error(self):
+        path = "notifications.management.commands.relay_outbox"
+        with mock.patch(f"{path}.relay_outbox", side_effect=Exception("db down")), \
+                mock.patch(f"{path}.close_old_connections") as close, \
+                mock.patch("builtins.print"):
+            call_command("relay_outbox", "--once")
+
+        self.assertEqual(close.call_count, 2)
+
+    def test_relay_routes_by_priority(self):
+        urgent = Notification.objects.create(user=self.user, message="code", priority="high")
+        bulk = Notification.objects.create(user=self.user, message="promo", priority="low")
+        regular = Notification.objects.create(user=self.user, message="hello")
+        NotificationOutbox.objects.bulk_create([
+            NotificationOutbox(notification=notification) for notification in (urgent, bulk, regular)
+        ])
+
+        with mock.patch("notifications.tasks.enqueue_notifications") as enqueue:
+            relay_outbox()
+
+        self.assertEqual(
+            {call.args[2]: call.args[0] for call in enqueue.call_args_list},
+            {"priority": [urgent.pk], "bulk": [bulk.pk], "default": [regular.pk]}
+        )
+
+    def test_failed_publish_keeps_outbox_rows(self):
+        notification = Notification.objects.create(user=self.user, message="hello")
+        NotificationOutbox.objects.create(notification=notification)
+
+        with mock.patch("notifications.tasks.enqueue_notifications", side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                relay_outbox()
+
+        self.assertTrue(NotificationOutbox.objects.filter(notification=notification).exists())
+
+
+@override_settings(
+    TASK_PAYLOAD_SNAPSHOT=True,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class NotificationSnapshotTests(TestCase):
+    """
+    Проверяет снимки уведомлений в payload задач: отправка без запросов к
+    БД и отказ записывать результат, если строка изменилась после снимка.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="snap@example.com", username="snap", phone_number="79990000001")
+
+    def create_snapshots(self, count):
+        self.client.post(
+            reverse("notifications-bulk-create"),
+            [{"user": self.user.pk, "message": f"message {i}"} for i in range(count)],
+            content_type="application/json"
+        )
+        with mock.patch("notifications.outbox.enqueue_snapshots") as enqueue:
+            relay_outbox()
+        return enqueue.call_args.args[0]
+
+    def test_snapshot_is_delivered_without_queries(self):
+        snapshots = self.create_snapshots(2)
+        self.assertEqual(snapshots[0]["contact"]["phone_number"], "79990000001")
+
+        with mock.patch.object(NotificationService, "attempt", return_value=True), \
+                mock.patch("notifications.services.SMS_BATCH_SIZE", 1):
+            with self.assertNumQueries(0):
+                notifications = NotificationService.deliver_batch([restore(s) for s in snapshots])
+
+        saved, stale = save_results(notifications)
+        self.assertEqual((len(saved), stale), (2, []))
+        self.assertEqual(Notification.objects.filter(status="sent").count(), 2)
+
+    def test_changed_row_is_not_overwritten(self):
+        snapshots = self.create_snapshots(1)
+        Notification.objects.filter(pk=snapshots[0]["id"]).update(updated_at=timezone.now())
+
+        notification = restore(snapshots[0])
+        notification.status = "sent"
+        saved, stale = save_results([notification])
+
+        self.assertEqual((saved, stale), ([], [notification]))
+        self.assertEqual(Notification.objects.get(pk=notification.id).status, "pending")
+
+
+    def test_task_checks_version_under_write_behind_and_routes_unknown_schema(self):
+        snapshots = self.create_snapshots(2)
+        legacy = {"id": 0, "priority": "high"}
+        Notification.objects.filter(pk=snapshots[1]["id"]).update(updated_at=timezone.now())
+
+        def deliver(notifications):
+            for notification in notifications:
+                notification.status = "sent"
+            return notifications
+
+        with override_settings(STATUS_WRITE_BEHIND=True), \
+                mock.patch.object(NotificationService, "deliver_batch", side_effect=deliver), \
+                mock.patch.object(NotificationService, "persist") as persist, \
+                mock.patch("notifications.tasks.enqueue_by_priority") as enqueue, \
+                mock.patch("builtins.print"):
+            result = process_notification_snapshots([*snapshots, legacy])
+
+        enqueue.assert_called_once_with([(0, "high")])
+        persist.assert_not_called()
+        self.assertEqual(result["ids"], [snapshots[0]["id"]])
+        self.assertEqual(Notification.objects.get(pk=snapshots[1]["id"]).status, "pending")
+
+    def test_task_dispatches_channel_tasks(self):
+        snapshots = self.create_snapshots(1)
+
+        with override_settings(CHANNEL_TASKS=True), \
+                mock.patch("notifications.tasks.dispatch_channels") as dispatch, \
+                mock.patch.object(NotificationService, "deliver_batch") as deliver:
+            process_notification_snapshots(snapshots)
+
+        deliver.assert_not_called()
+        self.assertEqual(dispatch.call_args.args[0][0].id, snapshots[0]["id"])
+
+
+class StatusWriterTests(TestCase):
+    """
+    Проверяет буфер отложенной записи статусов (без фонового сброса по времени).
+    """
+    def setUp(self):
+        self.saved = []
+        self.writer = StatusWriter(self.saved.append, max_size=3, interval=3600)
+        self.addCleanup(self.writer.stop)
+
+    def test_flushes_latest_state_when_buffer_is_full(self):
+        first, second = Notification(pk=1, status="pending"), Notification(pk=2)
+        self.writer.add([first, second])
+        self.assertEqual(self.saved, [])
+
+        updated = Notification(pk=1, status="sent")
+        self.writer.add([updated, Notification(pk=3)])
+
+        self.assertEqual(len(self.saved), 1)
+        self.assertEqual({n.pk: n.status for n in self.saved[0]}[1], "sent")
+
+    def test_failed_flush_keeps_buffer(self):
+        def fail(batch):
+            raise ConnectionError("db is down")
+
+        self.writer.save = fail
+        self.writer.add([Notification(pk=1)])
+        self.assertEqual(self.writer.flush(), 0)
+
+        self.writer.save = self.saved.append
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual([n.pk for n in self.saved[0]], [1])
+
+    def test_background_thread_survives_errors_and_reconnects(self):
+        flushed = threading.Event()
+        calls = []
+
+        def save(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise OperationalError("server closed the connection")
+            flushed.set()
+
+        writer = StatusWriter(save, max_size=10, interval=0.01)
+        self.addCleanup(writer.stop)
+        flush = writer.flush
+        attempts = []
+
+        def flaky_flush():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("boom")
+            return flush()
+
+        with mock.patch("notifications.writer.close_old_connections") as close, \
+                mock.patch.object(writer, "flush", side_effect=flaky_flush), \
+                mock.patch("builtins.print"):
+            writer.add([Notification(pk=1)])
+            self.assertTrue(flushed.wait(1))
+
+        self.assertEqual([[n.pk for n in batch] for batch in calls], [[1], [1]])
+        self.assertGreaterEqual(close.call_count, 4)
+
+
+class NotificationListTests(TestCase):
+    """
+    Проверяет фильтры и курсорную пагинацию списка уведомлений.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="list@example.com", username="list")
+        cls.other = User.objects.create(email="other@example.com", username="other")
+        created = timezone.now()
+        cls.notifications = Notification.objects.bulk_create([
+            Notification(user=cls.user, message=f"message {i}", status="sent" if i % 2 else "pending")
+            for i in range(5)
+        ] + [Notification(user=cls.other, message="other")])
+        # Одинаковое время создания у части строк проверяет порядок по id внутри created_at
+        Notification.objects.filter(pk__in=[n.pk for n in cls.notifications[:3]]).update(created_at=created)
+
+    def test_pages_cover_all_rows_once(self):
+        url = reverse("notifications-list") + f"?user={self.user.pk}&limit=2"
+        ids = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row["id"] for row in response.json()["results"])
+            url = response.json()["next"]
+
+        expected = list(
+            Notification.objects.filter(user=self.user)
+            .order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_filters(self):
+        response = self.client.get(reverse("notifications-list"), {"status": "sent", "user": self.user.pk})
+        self.assertEqual({row["status"] for row in response.json()["results"]}, {"sent"})
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_invalid_cursor_returns_400(self):
+        response = self.client.get(reverse("notifications-list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class NotificationDedupTests(TestCase):
+    """
+    Проверяет Idempotency-Key и окно дедупликации при создании уведомлений.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="dedup@example.com", username="dedup")
+
+    def post(self, message="hello", **headers):
+        return self.client.post(
+            reverse("notifications-create"),
+            {"user": self.user.pk, "message": message},
+            content_type="application/json",
+            headers=headers
+        )
+
+    def test_idempotency_key_replays_existing_notification(self):
+        first = self.post(**{"Idempotency-Key": "order-1"})
+        second = self.post(**{"Idempotency-Key": "order-1"})
+
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(second.json()["id"], first.json()["id"])
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_idempotency_key_with_other_payload_is_rejected(self):
+        self.post(**{"Idempotency-Key": "order-2"})
+        response = self.post("other text", **{"Idempotency-Key": "order-2"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_same_content_is_deduplicated_only_inside_window(self):
+        self.post()
+        self.post()
+        self.assertEqual(Notification.objects.count(), 2)
+
+        with self.settings(NOTIFICATION_DEDUP_WINDOW=60):
+            first = self.post("window")
+            second = self.post("window")
+        self.assertEqual(second.json()["id"], first.json()["id"])
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_database_hit_rearms_redis_for_remaining_window(self):
+        keys = DedupKeys(self.user.pk, "rearm", window=60)
+        notification = Notification.objects.create(user=self.user, message="rearm", dedup_key=keys.db_key)
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(seconds=50))
+
+        deduplicator = Deduplicator()
+        deduplicator.client = mock.Mock()
+        deduplicator.client.get.return_value = None
+
+        self.assertEqual(deduplicator.find(keys), notification.pk)
+        ttl = deduplicator.client.set.call_args.kwargs["ex"]
+        self.assertTrue(0 < ttl <= 10)
+
+
+class NotificationTemplateTests(TestCase):
+    """
+    Проверяет компиляцию шаблонов, версии и рендер уведомлений в воркере.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(email=f"tpl{i}@example.com", username=f"tpl{i}", first_name=name)
+            for i, name in enumerate(("Анна", ""))
+        ])
+
+    def setUp(self):
+        compile_template.cache_clear()
+
+    def test_compiled_template_renders_fields(self):
+        template = compile_body("Привет, {{ first_name }}! {{username}}")
+        self.assertEqual(template.fields, ("first_name", "username"))
+        self.assertEqual(
+            template.render_many([{"first_name": "Анна", "username": "anna"}, {"username": None}]),
+            ["Привет, Анна! anna", "Привет, ! "]
+        )
+
+        with self.assertRaises(ValueError):
+            compile_body("{{ password }}")
+
+    def test_body_change_bumps_version(self):
+        template = NotificationTemplate.objects.create(name="t", body="a")
+        template.name = "renamed"
+        template.save()
+        self.assertEqual(template.version, 1)
+
+        template.body = "b"
+        template.save()
+        template.refresh_from_db()
+        self.assertEqual(template.version, 2)
+        self.assertEqual(get_compiled_template(template.pk).render({}), "b")
+        self.assertIs(get_compiled_template(template.pk), get_compiled_template(template.pk))
+
+    def test_recreated_template_is_not_served_from_cache(self):
+        template = NotificationTemplate.objects.create(name="t", body="old")
+        pk = template.pk
+        self.assertEqual(get_compiled_template(pk).render({}), "old")
+
+        # Новый шаблон с тем же id снова получает версию 1
+        template.delete()
+        template = NotificationTemplate.objects.create(pk=pk, name="t", body="new")
+        self.assertEqual(template.version, 1)
+        self.assertEqual(get_compiled_template(pk).render({}), "new")
+
+    def test_render_task_creates_notifications_through_outbox(self):
+        template = NotificationTemplate.objects.create(name="t", body="Привет, {{ first_name }}")
+
+        with mock.patch("notifications.tasks.send_loaded") as send:
+            result = render_notifications(template.pk, template.version, [user.pk for user in self.users])
+
+        send.assert_not_called()
+        self.assertEqual(
+            sorted(Notification.objects.values_list("message", flat=True)),
+            ["Привет, ", "Привет, Анна"]
+        )
+
+        with mock.patch("notifications.outbox.enqueue_by_priority") as enqueue:
+            relay_outbox()
+        self.assertEqual(sorted(enqueue.call_args.args[0]), [(pk, "normal") for pk in sorted(result["ids"])])
+
+    @override_settings(NOTIFICATION_DEDUP_WINDOW=60)
+    def test_repeated_render_task_does_not_duplicate(self):
+        template = NotificationTemplate.objects.create(name="t", body="Привет, {{ first_name }}")
+        args = (template.pk, template.version, [user.pk for user in self.users])
+
+        first = render_notifications(*args)
+        second = render_notifications(*args)
+
+        self.assertEqual((len(first["ids"]), second["ids"]), (2, []))
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+
+    def test_send_rejects_unknown_users(self):
+        template = NotificationTemplate.objects.create(name="t", body="x")
+        url = reverse("notifications-template-send", args=[template.pk])
+
+        response = self.client.post(url, {"users": [self.users[0].pk, 999999]}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        with mock.patch("notifications.api.api_views.enqueue_template") as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {"users": [self.users[0].pk]}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        enqueue.assert_called_once_with(template, [self.users[0].pk])
+
+
+class CampaignTests(TestCase):
+    """
+    Проверяет создание уведомлений рассылки частями и продолжение после сбоя.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(email=f"c{i}@{'vip' if i % 2 else 'mail'}.example.com", username=f"c{i}", first_name=f"U{i}")
+            for i in range(7)
+        ])
+        User.objects.create(email="off@vip.example.com", username="off", is_active=False)
+
+    def setUp(self):
+        compile_template.cache_clear()
+
+    def test_fan_out_creates_notifications_for_segment(self):
+        template = NotificationTemplate.objects.create(name="t", body="Hi {{ first_name }}")
+        campaign = Campaign.objects.create(name="vip", template=template, filters={"email__iendswith": "@vip.example.com"})
+
+        fan_out(campaign.pk, chunk_size=2)
+
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.total, campaign.created_count), ("completed", 3, 3))
+        self.assertEqual(
+            sorted(campaign.notifications.values_list("message", flat=True)),
+            ["Hi U1", "Hi U3", "Hi U5"]
+        )
+        self.assertEqual(NotificationOutbox.objects.count(), 3)
+        self.assertEqual(progress(campaign), {"pending": 3, "sent": 0, "failed": 0})
+
+    def test_fan_out_resumes_from_cursor(self):
+        campaign = Campaign.objects.create(name="all", message="hello")
+
+        with mock.patch("notifications.campaigns.add_to_outbox", side_effect=[None, RuntimeError("crash")]):
+            with self.assertRaises(RuntimeError):
+                fan_out(campaign.pk, chunk_size=3)
+
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.created_count), ("running", 3))
+        self.assertEqual(campaign.notifications.count(), 3)
+
+        fan_out(campaign.pk, chunk_size=3)
+
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.created_count), ("completed", 7))
+        self.assertEqual(
+            sorted(campaign.notifications.values_list("user_id", flat=True)),
+            [user.pk for user in self.users]
+        )
+
+    def test_api_rejects_unknown_filters(self):
+        url = reverse("notifications-campaigns")
+        response = self.client.post(url, {"name": "x", "message": "m", "filters": {"password": "1"}}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url, {"name": "x", "message": "m", "filters": {"date_joined__gte": "nope"}}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        with mock.patch("notifications.api.api_views.run_campaign") as run:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {"name": "x", "message": "m"}, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        run.delay.assert_called_once_with(response.json()["id"])
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportCommandTests(TestCase):
+    """
+    Проверяет потоковый импорт уведомлений из файла.
+    """
+    def write(self, suffix, content):
+        file = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, encoding="utf-8")
+        file.write(content)
+        file.close()
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def run_import(self, command, *args):
+        stdout = io.StringIO()
+        with mock.patch("sys.stderr", io.StringIO()):
+            call_command(command, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import_notifications_queues_and_skips_used_keys(self):
+        user = User.objects.create(email="n@example.com", username="n")
+        path = self.write(".ndjson", (
+            f'{{"user": {user.pk}, "message": "a", "idempotency_key": "k"}}\n'
+            '{"email": "n@example.com", "message": "b"}\n'
+            '{"email": "missing@example.com", "message": "c"}\n'
+            "broken\n"
+        ))
+
+        output = self.run_import("import_notifications", path)
+        self.assertIn("создано: 2, обновлено: 0, пропущено: 0, ошибок: 2", output)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+
+        self.run_import("import_notifications", path, "--no-queue")
+        self.assertEqual(Notification.objects.filter(message="a").count(), 1)
+        self.assertEqual(Notification.objects.filter(message="b").count(), 2)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    NOTIFICATION_DIGEST_WINDOW=60,
+    CHANNEL_ORDERING="static",
+    DELIVERY_MODE="sequential",
+)
+class NotificationDigestTests(TestCase):
+    """
+    Проверяет объединение уведомлений пользователя в дайджест.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="digest@example.com", username="digest", phone_number="79990000002")
+        cls.other = User.objects.create(email="other@example.com", username="other", phone_number="79990000003")
+
+    def create(self, user, message, age):
+        notification = Notification.objects.create(user=user, message=message)
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(seconds=age))
+        return notification
+
+    def test_burst_is_sent_as_one_message(self):
+        first = self.create(self.user, "one", 120)
+        self.create(self.user, "two", 90)
+        self.create(self.user, "three", 10)
+        alone = self.create(self.other, "solo", 120)
+
+        with mock.patch.object(NotificationService, "attempt", return_value=True) as attempt, \
+                mock.patch("notifications.services.SMS_BATCH_SIZE", 1):
+            process_notification_batch([first.pk, alone.pk])
+
+        self.assertEqual(attempt.call_count, 2)
+        messages = {call.args[1].pk: call.args[2] for call in attempt.call_args_list}
+        self.assertEqual(messages[self.user.pk], "Новых уведомлений: 3\n\none\n\ntwo\n\nthree")
+        self.assertEqual(messages[self.other.pk], "solo")
+        self.assertFalse(Notification.objects.filter(status="pending").exists())
+        self.assertEqual(Notification.objects.get(pk=first.pk).message, "one")
+
+    def test_rows_are_leased_before_sending(self):
+        first = self.create(self.user, "one", 120)
+        self.create(self.user, "two", 90)
+        claimed = []
+
+        def attempt(channel, user, message, **kwargs):
+            # Во время отправки строки уже арендованы: параллельная задача их не выберет
+            claimed.append(digest.claim(self.user.pk))
+            leased = Notification.objects.filter(user=self.user, next_attempt_at__gt=timezone.now())
+            return leased.count() == 2
+
+        with mock.patch.object(NotificationService, "attempt", side_effect=attempt), \
+                mock.patch("notifications.services.SMS_BATCH_SIZE", 1):
+            process_notification_batch([first.pk])
+
+        self.assertEqual(claimed, [[]])
+        self.assertEqual(Notification.objects.filter(user=self.user, status="sent").count(), 2)
+
+    def test_failed_digest_schedules_one_retry_and_remerges(self):
+        first = self.create(self.user, "one", 120)
+        second = self.create(self.user, "two", 90)
+
+        with mock.patch.object(NotificationService, "attempt", return_value=False), \
+                mock.patch("notifications.services.SMS_BATCH_SIZE", 1), \
+                mock.patch("notifications.tasks.process_notification.apply_async") as retry:
+            process_notification_batch([first.pk, second.pk])
+
+        retry.assert_called_once()
+        self.assertEqual(retry.call_args.args[0], (first.pk,))
+        self.assertEqual(
+            set(Notification.objects.filter(user=self.user).values_list("retry_count", "next_attempt_at")),
+            {(1, retry.call_args.kwargs["eta"])}
+        )
+
+        Notification.objects.filter(user=self.user).update(next_attempt_at=timezone.now())
+        with mock.patch.object(NotificationService, "attempt", return_value=True) as attempt, \
+                mock.patch("notifications.services.SMS_BATCH_SIZE", 1):
+            process_notification(first.pk)
+
+        attempt.assert_called_once()
+        self.assertEqual(attempt.call_args.args[2], "Новых уведомлений: 2\n\none\n\ntwo")
+        self.assertFalse(Notification.objects.filter(status="pending").exists())
+
+    def test_notification_waits_for_window_to_close(self):
+        fresh = self.create(self.user, "fresh", 5)
+
+        with mock.patch.object(NotificationService, "attempt") as attempt, \
+                mock.patch("notifications.tasks.process_notification.apply_async") as apply_async:
+            self.assertEqual(send_coalesced([Notification.objects.get(pk=fresh.pk)]), [])
+
+        attempt.assert_not_called()
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, "pending")
+        self.assertEqual(fresh.next_attempt_at, fresh.created_at + timedelta(seconds=60))
+        self.assertEqual(apply_async.call_args.kwargs["eta"], fresh.next_attempt_at)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CHANNEL_ORDERING="static",
+)
+class ChannelTaskTests(TestCase):
+    """
+    Проверяет разбиение цепочки каналов на задачи в очередях каналов.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="chain@example.com", username="chain", phone_number="79990000004")
+
+    def test_dispatch_uses_channel_or_priority_queue(self):
+        regular = Notification.objects.create(user=self.user, message="hello")
+        urgent = Notification.objects.create(user=self.user, message="code", priority="high")
+
+        with mock.patch("notifications.tasks.send_via_channel.apply_async") as apply_async, \
+                mock.patch("notifications.services.CHANNEL_ORDER", ("email", "telegram")):
+            dispatch_channels([regular, urgent])
+
+        calls = [(call.args[0], call.kwargs["queue"]) for call in apply_async.call_args_list]
+        self.assertEqual(calls, [
+            ((regular.pk, ["email", "telegram"]), "email"),
+            ((urgent.pk, ["email", "telegram"]), "priority"),
+        ])
+
+    def test_failed_channel_passes_to_next_queue(self):
+        notification = Notification.objects.create(user=self.user, message="hello")
+
+        with mock.patch.object(NotificationService, "attempt", return_value=False), \
+                mock.patch("notifications.tasks.send_via_channel.apply_async") as apply_async:
+            send_via_channel(notification.pk, ["email", "telegram"])
+
+        apply_async.assert_called_once_with((notification.pk, ["telegram"]), queue="telegram")
+        self.assertEqual(Notification.objects.get(pk=notification.pk).retry_count, 0)
+
+        with mock.patch.object(NotificationService, "attempt", return_value=False), \
+                mock.patch("notifications.tasks.process_notification.apply_async") as retry:
+            send_via_channel(notification.pk, ["telegram"])
+
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.retry_count, notification.last_channel), ("pending", 1, "telegram"))
+        self.assertEqual(retry.call_args.kwargs["queue"], "default")
+
+
+class HTTPSessionTests(TestCase):
+    """
+    Проверяет пул HTTP-сессий отправителей SMS и Telegram.
+    """
+    def test_only_connect_errors_are_retried(self):
+        with self.settings(HTTP_RETRY_ATTEMPTS=2):
+            retry = build_session().get_adapter("https://sms.ru").max_retries
+        self.assertEqual((retry.connect, retry.read, retry.status), (2, 0, 0))
+        self.assertFalse(retry._is_method_retryable("POST"))
+
+        # Ошибка подключения повторяется, таймаут чтения - нет
+        retry = retry.increment("POST", "/", error=NewConnectionError(None, "refused"))
+        self.assertEqual(retry.connect, 1)
+        with self.assertRaises(MaxRetryError):
+            retry.increment("GET", "/", error=ReadTimeoutError(None, "/", "timeout"))
+
+    def test_session_is_reused_and_rebuilt_after_fork(self):
+        class Sender(HTTPSessionMixin):
+            pass
+
+        sender = Sender()
+        with mock.patch("notifications.senders.http.os.getpid", return_value=1):
+            first = sender.session
+            self.assertIs(sender.session, first)
+        with mock.patch("notifications.senders.http.os.getpid", return_value=2):
+            self.assertIsNot(sender.session, first)
+
+    def test_server_errors_raise_provider_unavailable(self):
+        sender = SMSSender()
+        user = User(phone_number="89990000000")
+
+        with mock.patch.object(SMSSender, "session", new_callable=mock.PropertyMock) as session, \
+                mock.patch("builtins.print"):
+            session.return_value.get.return_value = mock.Mock(status_code=503)
+            with self.assertRaises(ProviderUnavailable):
+                sender.send(user, "hi")
+
+            session.return_value.get.side_effect = requests.Timeout("timeout")
+            with self.assertRaises(ProviderUnavailable):
+                sender.send(user, "hi")
+
+    def test_sms_sender_uses_session(self):
+        sender = SMSSender()
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"sms": {"79990000000": {"status_code": 100}}}
+        user = User(phone_number="89990000000")
+
+        with mock.patch.object(SMSSender, "session", new_callable=mock.PropertyMock) as session:
+            session.return_value.get.return_value = response
+            with mock.patch("builtins.print"):
+                self.assertTrue(sender.send(user, "hi"))
+
+        self.assertEqual(session.return_value.get.call_args.kwargs["params"]["to"], "89990000000")
+
+
+class RateLimiterTests(TestCase):
+    """
+    Проверяет token bucket каналов и ожидание токена в RateLimiter.
+    """
+    def test_bucket_refills_at_rate(self):
+        bucket = LocalTokenBucket()
+        with mock.patch("notifications.ratelimit.time.monotonic", return_value=100.0) as clock:
+            self.assertEqual(bucket.try_acquire("sms", 2, 2), 0)
+            self.assertEqual(bucket.try_acquire("sms", 2, 2), 0)
+            self.assertAlmostEqual(bucket.try_acquire("sms", 2, 2), 0.5)
+
+            clock.return_value = 100.25
+            self.assertAlmostEqual(bucket.try_acquire("sms", 2, 2), 0.25)
+
+            clock.return_value = 100.5
+            self.assertEqual(bucket.try_acquire("sms", 2, 2), 0)
+
+            # Запас не превышает размер всплеска
+            clock.return_value = 200.0
+            self.assertEqual([bucket.try_acquire("sms", 2, 2) for _ in range(2)], [0, 0])
+            self.assertGreater(bucket.try_acquire("sms", 2, 2), 0)
+
+    def test_block_pauses_channel(self):
+        bucket = LocalTokenBucket()
+        with mock.patch("notifications.ratelimit.time.monotonic", return_value=100.0) as clock:
+            bucket.block("telegram", 3)
+            self.assertEqual(bucket.try_acquire("telegram", 30, 30), 3)
+            clock.return_value = 103.0
+            self.assertEqual(bucket.try_acquire("telegram", 30, 30), 0)
+
+    def test_wait_gives_up_after_max_wait(self):
+        limiter = RateLimiter(backend="local", max_wait=0.5)
+        limiter.local.block("sms", 10)
+        with mock.patch("notifications.ratelimit.time.sleep") as sleep:
+            self.assertFalse(limiter.wait("sms"))
+        sleep.assert_not_called()
+
+    def test_wait_async_queries_redis_outside_event_loop(self):
+        limiter = RateLimiter(backend="local")
+        threads = []
+        limiter.shared = mock.Mock()
+        limiter.shared.try_acquire.side_effect = lambda *args: threads.append(threading.get_ident()) or 0
+
+        async def wait():
+            return await limiter.wait_async("sms"), threading.get_ident()
+
+        acquired, loop_thread = asyncio.run(wait())
+        self.assertTrue(acquired)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+
+
+class CircuitBreakerTests(TestCase):
+    """
+    Проверяет переходы выключателя канала и то, какие неудачи он учитывает.
+    """
+    def setUp(self):
+        self.clock = mock.patch("notifications.breaker.time.monotonic", return_value=1000.0).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_opens_after_threshold_and_probes_when_half_open(self):
+        state = LocalCircuitState()
+        for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+            state.record_failure("sms")
+        self.assertTrue(state.allow("sms"))
+
+        state.record_failure("sms")
+        self.assertFalse(state.allow("sms"))
+
+        # Полуоткрыт: пропускается одна пробная отправка за CIRCUIT_PROBE_SECONDS
+        self.clock.return_value += CIRCUIT_OPEN_SECONDS
+        self.assertTrue(state.allow("sms"))
+        self.assertFalse(state.allow("sms"))
+        self.clock.return_value += CIRCUIT_PROBE_SECONDS
+        self.assertTrue(state.allow("sms"))
+
+        # Неудачная проба снова открывает выключатель, успешная - закрывает
+        state.record_failure("sms")
+        self.assertFalse(state.allow("sms"))
+        self.clock.return_value += CIRCUIT_OPEN_SECONDS
+        self.assertTrue(state.allow("sms"))
+        state.record_success("sms")
+        self.assertTrue(state.allow("sms"))
+        self.assertTrue(state.allow("sms"))
+
+    def test_only_provider_outages_open_breaker(self):
+        breaker = CircuitBreaker(backend="local")
+        user = User(email="breaker@example.com", phone_number="")
+        sender = mock.Mock()
+
+        with mock.patch("notifications.services.get_circuit_breaker", return_value=breaker), \
+                mock.patch("notifications.services.get_rate_limiter") as limiter, \
+                mock.patch("notifications.services.get_channel_stats"), \
+                mock.patch.dict("notifications.services.SENDERS_MAP", {"sms": sender}):
+            limiter.return_value.wait.return_value = True
+
+            sender.send.return_value = False
+            for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+                self.assertFalse(NotificationService.attempt("sms", user, "hi"))
+            self.assertTrue(breaker.allow("sms"))
+
+            sender.send.side_effect = ProviderUnavailable("timeout")
+            for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+                self.assertFalse(NotificationService.attempt("sms", user, "hi"))
+            self.assertFalse(breaker.allow("sms"))
+            self.assertEqual(sender.send.call_count, 2 * CIRCUIT_FAILURE_THRESHOLD)
+
+    def test_grouped_sms_rejections_are_neutral(self):
+        breaker = mock.Mock()
+        breaker.allow.return_value = True
+        sms = mock.Mock()
+        user = User(email="group@example.com", phone_number="1")
+        notifications = [Notification(user=user, message="hi") for _ in range(2)]
+
+        with mock.patch("notifications.services.get_circuit_breaker", return_value=breaker), \
+                mock.patch("notifications.services.get_rate_limiter") as limiter, \
+                mock.patch("notifications.services.get_channel_stats"), \
+                mock.patch.dict("notifications.services.SENDERS_MAP", {"sms": sms}):
+            limiter.return_value.wait.return_value = True
+
+            sms.send_bulk.return_value = [False, False]
+            NotificationService.send_sms_grouped(notifications)
+            breaker.record.assert_not_called()
+
+            sms.send_bulk.side_effect = ProviderUnavailable("503")
+            NotificationService.send_sms_grouped(notifications)
+            breaker.record.assert_called_once_with("sms", False)
+
+
+class RetryScheduleTests(TestCase):
+    """
+    Проверяет расписание повторных попыток и подбор зависших уведомлений.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="retry@example.com", username="retry")
+
+    def test_backoff_grows_with_jitter_and_cap(self):
+        with mock.patch("notifications.utils.random.uniform", side_effect=lambda low, high: (low, high)):
+            self.assertEqual(backoff_delay(1, 60, 3600), (30, 60))
+            self.assertEqual(backoff_delay(3, 60, 3600), (120, 240))
+            self.assertEqual(backoff_delay(10, 60, 3600), (1800, 3600))
+
+    def test_failure_reschedules_and_moves_lease(self):
+        notification = Notification(user=self.user, message="x")
+        with mock.patch("notifications.services.backoff_delay", return_value=RETRY_DELAY_SECONDS):
+            fields = NotificationService.record_failure(notification)
+
+        self.assertIn("enqueued_at", fields)
+        self.assertEqual(notification.retry_count, 1)
+        self.assertEqual(notification.enqueued_at, notification.next_attempt_at)
+        self.assertAlmostEqual(
+            (notification.next_attempt_at - timezone.now()).total_seconds(), RETRY_DELAY_SECONDS, delta=5
+        )
+
+        notification.retry_count = MAX_RETRIES - 1
+        NotificationService.record_failure(notification)
+        self.assertEqual((notification.status, notification.enqueued_at), ("failed", None))
+
+    def test_sweeper_skips_notifications_with_active_lease(self):
+        stale = timezone.now() - timedelta(seconds=STUCK_NOTIFICATION_GRACE_SECONDS + 60)
+        queued, lost, sent = Notification.objects.bulk_create([
+            Notification(user=self.user, message="queued", next_attempt_at=stale, enqueued_at=timezone.now()),
+            Notification(
+                user=self.user, message="lost", next_attempt_at=stale,
+                enqueued_at=timezone.now() - timedelta(seconds=ENQUEUE_LEASE_SECONDS + 60)
+            ),
+            Notification(user=self.user, message="sent", status="sent", next_attempt_at=stale, enqueued_at=None),
+        ])
+
+        with mock.patch("notifications.tasks.enqueue_by_priority") as enqueue, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_stuck_notifications()["count"], 1)
+
+        enqueue.assert_called_once_with([(lost.pk, "normal")])
+        lost.refresh_from_db()
+        self.assertGreater(lost.enqueued_at, timezone.now() - timedelta(seconds=60))
+
+        # Повторный проход не берет уведомление, пока не истечет новая аренда
+        with mock.patch("notifications.tasks.enqueue_by_priority"), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_stuck_notifications()["count"], 0)
+
+    def test_relay_starts_lease(self):
+        notification = Notification.objects.create(user=self.user, message="x", enqueued_at=None)
+        NotificationOutbox.objects.create(notification=notification)
+
+        with mock.patch("notifications.tasks.enqueue_notifications"):
+            relay_outbox()
+
+        notification.refresh_from_db()
+        self.assertIsNotNone(notification.enqueued_at)
+
+
+@override_settings(DELIVERY_BUDGET_SECONDS=0.2, HEDGE_DELAY_SECONDS=0.05)
+class DeliveryBudgetTests(TestCase):
+    """
+    Проверяет бюджет доставки в последовательном и хеджированном режимах.
+    """
+    def setUp(self):
+        self.user = User(email="budget@example.com", phone_number="1")
+        self.notification = Notification(user=self.user, message="hi")
+        self.sms = mock.Mock()
+        self.email = mock.Mock()
+        for patcher in (
+            mock.patch("notifications.services.get_circuit_breaker", return_value=CircuitBreaker(backend="local")),
+            mock.patch("notifications.services.get_rate_limiter", return_value=RateLimiter(backend="local")),
+            mock.patch("notifications.services.get_channel_stats"),
+            mock.patch.dict("notifications.services.SENDERS_MAP", {"sms": self.sms, "email": self.email}),
+        ):
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_sequential_passes_remaining_budget_as_timeout(self):
+        self.sms.send.return_value = False
+        self.email.send.return_value = True
+
+        NotificationService.deliver(self.notification, ("sms", "email"), hedged=False)
+
+        self.assertEqual(self.notification.status, "sent")
+        first = self.sms.send.call_args.kwargs["timeout"]
+        second = self.email.send.call_args.kwargs["timeout"]
+        self.assertTrue(0 < second <= first <= 0.2)
+
+    def test_cancelled_attempt_does_not_send(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        self.assertFalse(NotificationService.attempt("sms", self.user, "hi", cancelled=cancelled))
+        self.sms.send.assert_not_called()
+
+    def test_hedged_late_success_after_budget_is_recorded(self):
+        def slow_send(user, message, timeout=None):
+            time.sleep(0.3)
+            return True
+
+        self.sms.send.side_effect = slow_send
+
+        fields = NotificationService.deliver(self.notification, ("sms",), hedged=True)
+
+        self.assertIn("sent_at", fields)
+        self.assertEqual((self.notification.status, self.notification.retry_count), ("sent", 0))
+
+    def test_hedged_failure_after_budget_and_settle(self):
+        def hung_send(user, message, timeout=None):
+            time.sleep(0.5)
+            return True
+
+        self.sms.send.side_effect = hung_send
+        self.email.send.return_value = False
+
+        with mock.patch("notifications.services.HEDGE_SETTLE_SECONDS", 0.05):
+            NotificationService.deliver(self.notification, ("sms", "email"), hedged=True)
+
+        self.assertEqual((self.notification.status, self.notification.retry_count), ("pending", 1))
+        self.assertLessEqual(self.email.send.call_args.kwargs["timeout"], 0.2)
+
+
+@mock.patch.dict(os.environ, {"EMAIL_HOST": "smtp.example.com", "EMAIL_PORT": "465", "EMAIL_HOST_USER": "bot@example.com"})
+class SMTPPoolTests(TestCase):
+    """
+    Проверяет переиспользование и пересоздание соединений пула SMTP.
+    """
+    def setUp(self):
+        self.connect = mock.patch("notifications.senders.smtp_pool.smtplib.SMTP_SSL").start()
+        self.connect.side_effect = lambda *args, **kwargs: mock.Mock(timeout=kwargs["timeout"], sock=None)
+        self.addCleanup(mock.patch.stopall)
+        self.users = [User(email=f"user{i}@example.com") for i in range(3)]
+
+    def test_batch_is_sent_through_one_session(self):
+        sender = EmailSender(SMTPConnectionPool(size=1, max_messages=10, max_age=60, ping_after=60, timeout=5))
+
+        self.assertEqual(sender.send_many([(user, "hi") for user in self.users]), [True] * 3)
+        self.assertTrue(sender.send(self.users[0], "hi"))
+
+        self.connect.assert_called_once_with("smtp.example.com", 465, timeout=5)
+        server = sender.pool._idle[0].server
+        server.login.assert_called_once()
+        self.assertEqual(server.send_message.call_count, 4)
+
+    def test_connection_is_replaced_after_max_messages(self):
+        sender = EmailSender(SMTPConnectionPool(size=1, max_messages=2, max_age=60, ping_after=60, timeout=5))
+
+        for user in self.users:
+            self.assertTrue(sender.send(user, "hi"))
+
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_dead_idle_connection_is_replaced(self):
+        pool = SMTPConnectionPool(size=1, max_messages=10, max_age=60, ping_after=0, timeout=5)
+        sender = EmailSender(pool)
+        self.assertTrue(sender.send(self.users[0], "hi"))
+        stale = pool._idle[0].server
+        stale.noop.side_effect = smtplib.SMTPServerDisconnected()
+
+        self.assertTrue(sender.send(self.users[1], "hi"))
+
+        self.assertEqual(self.connect.call_count, 2)
+        stale.send_message.assert_called_once()
+
+    def test_batch_reconnects_once_after_disconnect(self):
+        sender = EmailSender(SMTPConnectionPool(size=1, max_messages=10, max_age=60, ping_after=60, timeout=5))
+        first = mock.Mock(timeout=5, sock=None)
+        first.send_message.side_effect = [None, smtplib.SMTPServerDisconnected()]
+        self.connect.side_effect = [first, mock.Mock(timeout=5, sock=None)]
+
+        with mock.patch("builtins.print"):
+            self.assertEqual(sender.send_many([(user, "hi") for user in self.users]), [True] * 3)
+
+        self.assertEqual(self.connect.call_count, 2)
+        self.assertEqual(sender.pool._idle[0].sent, 2)
+
+    def test_rejected_recipient_keeps_connection(self):
+        sender = EmailSender(SMTPConnectionPool(size=1, max_messages=10, max_age=60, ping_after=60, timeout=5))
+        server = mock.Mock(timeout=5, sock=None)
+        server.send_message.side_effect = [smtplib.SMTPRecipientsRefused({}), None]
+        self.connect.side_effect = [server]
+
+        with mock.patch("builtins.print"):
+            self.assertEqual(sender.send_many([(user, "hi") for user in self.users[:2]]), [False, True])
+
+        self.assertIs(sender.pool._idle[0].server, server)
+
+    def test_unreachable_server_raises_provider_unavailable(self):
+        sender = EmailSender(SMTPConnectionPool(size=1, max_messages=10, max_age=60, ping_after=60, timeout=5))
+        self.connect.side_effect = ConnectionRefusedError()
+
+        with mock.patch("builtins.print"), self.assertRaises(ProviderUnavailable):
+            sender.send(self.users[0], "hi")
+        self.assertEqual(self.connect.call_count, 2)
+
+
+class NotificationBulkCreateTests(TestCase):
+    """
+    Проверяет массовое создание уведомлений (JSON-массив и NDJSON).
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="bulk@example.com", username="bulk")
+
+    def post(self, items):
+        return self.client.post(reverse("notifications-bulk-create"), items, content_type="application/json")
+
+    def test_creates_notifications_and_outbox_in_request_order(self):
+        response = self.post([
+            {"user": self.user.pk, "message": f"message {i}", "priority": "high" if i == 0 else "normal"}
+            for i in range(3)
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        ids = response.json()["ids"]
+        self.assertEqual(response.json()["count"], 3)
+        self.assertEqual(
+            list(Notification.objects.filter(pk__in=ids).order_by("pk").values_list("message", "priority")),
+            [("message 0", "high"), ("message 1", "normal"), ("message 2", "normal")]
+        )
+        self.assertEqual(NotificationOutbox.objects.filter(notification_id__in=ids).count(), 3)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        counts = []
+        for size in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post([{"user": self.user.pk, "message": "x"}] * size).status_code, 201)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_invalid_item_rejects_whole_batch(self):
+        response = self.post([{"user": self.user.pk, "message": "ok"}, {"user": self.user.pk}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn("message", response.json()[1])
+
+        response = self.post([{"user": self.user.pk, "message": "ok"}, {"user": self.user.pk + 1000, "message": "x"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn("user", response.json()[1])
+
+        self.assertFalse(Notification.objects.exists())
+
+    def test_rejects_batch_over_max_items(self):
+        with mock.patch("notifications.api.serializers.BULK_MAX_ITEMS", 2), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.post([{"user": self.user.pk, "message": "x"}] * 3)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("non_field_errors", response.json())
+        self.assertEqual(len(queries), 0)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_ndjson_body(self):
+        body = "\n".join(f'{{"user": {self.user.pk}, "message": "line {i}"}}' for i in range(2)) + "\n\n"
+        response = self.client.post(reverse("notifications-bulk-create"), body, content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["count"], 2)
+
+        response = self.client.post(
+            reverse("notifications-bulk-create"), '{"user": 1}\n{broken', content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("line 2", response.json()["detail"])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CHANNEL_ORDERING="static",
+    DELIVERY_MODE="sequential",
+)
+class BatchTaskTests(TestCase):
+    """
+    Проверяет постановку уведомлений в очередь пачками и задачу process_notification_batch.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="batch@example.com", username="batch")
+
+    def create(self, count, **kwargs):
+        return Notification.objects.bulk_create([
+            Notification(user=self.user, message=f"message {i}", **kwargs) for i in range(count)
+        ])
+
+    def test_enqueue_publishes_chunks_through_one_producer(self):
+        with mock.patch("notifications.tasks.current_app") as app, \
+                mock.patch("notifications.tasks.process_notification_batch.apply_async") as apply_async:
+            enqueue_notifications(range(1, 6), batch_size=2, queue="bulk")
+
+        app.producer_or_acquire.assert_called_once()
+        producer = app.producer_or_acquire.return_value.__enter__.return_value
+        self.assertEqual([call.args[0][0] for call in apply_async.call_args_list], [[1, 2], [3, 4], [5]])
+        for call in apply_async.call_args_list:
+            self.assertEqual(call.kwargs, {"queue": "bulk", "producer": producer})
+
+    def test_batch_sends_pending_and_schedules_retries(self):
+        delivered, failed = self.create(2)
+        sent = Notification.objects.create(user=self.user, message="already sent", status="sent")
+
+        def delivers(channel, user, message, **kwargs):
+            return message == "message 0"
+
+        with mock.patch.object(NotificationService, "attempt", side_effect=delivers) as attempt, \
+                mock.patch("notifications.services.SMS_BATCH_SIZE", 1), \
+                mock.patch("notifications.tasks.process_notification.apply_async") as retry:
+            result = process_notification_batch([delivered.pk, failed.pk, sent.pk])
+
+        self.assertEqual(sorted(result["ids"]), sorted([delivered.pk, failed.pk]))
+        self.assertNotIn("already sent", [call.args[2] for call in attempt.call_args_list])
+        delivered.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual(delivered.status, "sent")
+        self.assertEqual((failed.status, failed.retry_count), ("pending", 1))
+        retry.assert_called_once()
+        self.assertEqual(retry.call_args.args[0], (failed.pk,))
+        self.assertEqual(retry.call_args.kwargs["eta"], failed.next_attempt_at)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        counts = []
+        for size in (2, 10):
+            ids = [notification.pk for notification in self.create(size)]
+            with mock.patch.object(NotificationService, "attempt", return_value=True), \
+                    mock.patch("notifications.services.SMS_BATCH_SIZE", 1), \
+                    CaptureQueriesContext(connection) as queries:
+                process_notification_batch(ids)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Notification.objects.filter(status="pending").exists())
+
+
+class FakeAsyncSender(AsyncBaseSender):
+    """
+    Асинхронный отправитель для тестов: отвечает `result` через `delay`
+    секунд и считает одновременные отправки.
+    """
+    def __init__(self, result=True, delay=0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+        self.timeouts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, user, message, timeout=None):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if isinstance(self.result, Exception):
+                raise self.result
+            return self.result
+        finally:
+            self.in_flight -= 1
+
+
+@override_settings(DELIVERY_MODE="sequential", DELIVERY_BUDGET_SECONDS=5, HEDGE_DELAY_SECONDS=0.05)
+class AsyncDeliveryEngineTests(TestCase):
+    """
+    Проверяет конкурентную доставку и fallback по каналам в AsyncDeliveryEngine.
+    """
+    def setUp(self):
+        self.sms = FakeAsyncSender()
+        self.email = FakeAsyncSender()
+        for patcher in (
+            mock.patch("notifications.engine.get_circuit_breaker", return_value=CircuitBreaker(backend="local")),
+            mock.patch("notifications.engine.get_rate_limiter", return_value=RateLimiter(backend="local")),
+            mock.patch("notifications.engine.get_channel_stats"),
+            mock.patch.object(NotificationService, "channel_order", return_value=("sms", "email")),
+            mock.patch.object(AsyncDeliveryEngine, "build_senders", return_value={"sms": self.sms, "email": self.email}),
+        ):
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def notifications(self, count):
+        user = User(email="async@example.com", phone_number="1")
+        return [Notification(user=user, message=f"message {i}") for i in range(count)]
+
+    def test_notifications_are_sent_concurrently_up_to_limit(self):
+        self.sms.delay = 0.05
+
+        started = time.monotonic()
+        notifications = AsyncDeliveryEngine(concurrency=5).run(self.notifications(10))
+
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(self.sms.max_in_flight, 5)
+        self.assertEqual({(n.status, n.last_channel) for n in notifications}, {("sent", "sms")})
+
+    def test_failed_channel_falls_back_to_next(self):
+        self.sms.result = ProviderUnavailable("503")
+
+        notification, = AsyncDeliveryEngine().run(self.notifications(1))
+
+        self.assertEqual((notification.status, notification.last_channel), ("sent", "email"))
+        self.assertEqual(self.email.calls, 1)
+
+    def test_rate_limited_channel_is_paused_and_retried(self):
+        self.sms.result = RateLimitExceeded(retry_after=0)
+        limiter = RateLimiter(backend="local")
+
+        with mock.patch("notifications.engine.get_rate_limiter", return_value=limiter), \
+                mock.patch.object(limiter, "block_async", wraps=limiter.block_async) as block:
+            notification, = AsyncDeliveryEngine().run(self.notifications(1))
+
+        self.assertEqual(self.sms.calls, 2)
+        self.assertEqual(block.call_count, 2)
+        self.assertEqual(notification.last_channel, "email")
+
+    def test_all_channels_failed_schedules_retry(self):
+        self.sms.result = self.email.result = False
+
+        notification, = AsyncDeliveryEngine().run(self.notifications(1))
+
+        self.assertEqual((notification.status, notification.retry_count), ("pending", 1))
+        self.assertIsNotNone(notification.next_attempt_at)
+
+    def test_remaining_budget_is_passed_to_each_attempt(self):
+        self.sms.result = False
+        self.sms.delay = 0.05
+
+        notification, = AsyncDeliveryEngine().run(self.notifications(1))
+
+        self.assertEqual((notification.status, notification.last_channel), ("sent", "email"))
+        self.assertLessEqual(self.sms.timeouts[0], 5)
+        self.assertLess(self.email.timeouts[0], self.sms.timeouts[0] - 0.04)
+
+    @override_settings(DELIVERY_BUDGET_SECONDS=0.1)
+    def test_exhausted_budget_skips_next_channel(self):
+        self.sms.result = False
+        self.sms.delay = 0.15
+
+        notification, = AsyncDeliveryEngine().run(self.notifications(1))
+
+        self.assertEqual(self.email.calls, 0)
+        self.assertEqual((notification.status, notification.retry_count), ("pending", 1))
+
+    def test_sync_adapter_passes_timeout_to_sender(self):
+        sender = mock.Mock()
+        sender.send.return_value = True
+
+        self.assertTrue(asyncio.run(SyncSenderAdapter(sender).send("user", "hi", timeout=1.5)))
+        sender.send.assert_called_once_with("user", "hi", timeout=1.5)
+
+    @override_settings(DELIVERY_MODE="hedged")
+    def test_hedged_mode_cancels_slow_channel(self):
+        self.sms.delay = 5
+
+        started = time.monotonic()
+        notification, = AsyncDeliveryEngine().run(self.notifications(1))
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual((notification.status, notification.last_channel), ("sent", "email"))
+        self.assertEqual(self.sms.in_flight, 0)
+
+    @override_settings(DELIVERY_MODE="hedged", DELIVERY_BUDGET_SECONDS=0.1)
+    def test_hedged_late_success_after_budget_is_recorded(self):
+        self.sms.delay = 0.2
+        self.email.result = False
+
+        notification, = AsyncDeliveryEngine().run(self.notifications(1))
+
+        self.assertEqual((notification.status, notification.last_channel), ("sent", "sms"))
+        self.assertEqual(notification.retry_count, 0)
+
+    @override_settings(DELIVERY_MODE="hedged", DELIVERY_BUDGET_SECONDS=0.1)
+    def test_hedged_failure_after_budget_and_settle(self):
+        self.sms.delay = 5
+        self.email.result = False
+
+        started = time.monotonic()
+        with mock.patch("notifications.engine.HEDGE_SETTLE_SECONDS", 0.05):
+            notification, = AsyncDeliveryEngine().run(self.notifications(1))
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual((notification.status, notification.retry_count), ("pending", 1))
+        self.assertEqual(self.sms.in_flight, 0)
+
+    def test_manager_anotify_sends_all_channels_at_once(self):
+        class BlockingSender:
+            def send(self, user, message):
+                time.sleep(0.1)
+                raise ConnectionError("boom")
+
+        self.sms.delay = 0.1
+        manager = NotificationManager([self.sms, BlockingSender()])
+
+        started = time.monotonic()
+        results = asyncio.run(manager.anotify(User(email="async@example.com"), "hi"))
+
+        # Синхронный отправитель выполняется в пуле потоков и не блокирует асинхронный
+        self.assertLess(time.monotonic() - started, 0.19)
+        self.assertEqual(results, {"FakeAsyncSender": "OK", "BlockingSender": "ERROR: boom"})
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SMSGroupingTests(TestCase):
+    """
+    Проверяет пакетную отправку SMS одним запросом на несколько номеров.
+    """
+    def setUp(self):
+        self.breaker = CircuitBreaker(backend="local")
+        self.sms = mock.Mock()
+        self.email = mock.Mock()
+        for patcher in (
+            mock.patch("notifications.services.get_circuit_breaker", return_value=self.breaker),
+            mock.patch("notifications.services.get_rate_limiter", return_value=RateLimiter(backend="local")),
+            mock.patch("notifications.services.get_channel_stats"),
+            mock.patch.dict("notifications.services.SENDERS_MAP", {"sms": self.sms, "email": self.email}),
+        ):
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def notification(self, phone_number, message="hi"):
+        return Notification(user=User(email=f"{phone_number}@example.com", phone_number=phone_number), message=message)
+
+    def test_send_bulk_maps_statuses_to_numbers(self):
+        sender = SMSSender()
+        users = [User(phone_number=number) for number in ("89990000001", "+7 999 000-00-02", "79990000003")]
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"sms": {
+            "79990000001": {"status_code": 100},
+            "79990000002": {"status_code": 207, "status_text": "Нельзя отправлять на этот номер"},
+            "79990000003": {"status_code": 100},
+        }}
+
+        with mock.patch.object(SMSSender, "session", new_callable=mock.PropertyMock) as session, \
+                mock.patch("builtins.print"):
+            session.return_value.post.return_value = response
+            self.assertEqual(sender.send_bulk(users, "hi"), [True, False, True])
+
+        params = session.return_value.post.call_args.kwargs["data"]
+        self.assertEqual((params["to"], params["msg"]), ("79990000001,79990000002,79990000003", "hi"))
+
+    def test_send_bulk_skips_users_without_number(self):
+        sender = SMSSender()
+        users = [User(phone_number=number) for number in (None, "89990000001", "")]
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"sms": {"79990000001": {"status_code": 100}}}
+
+        with mock.patch.object(SMSSender, "session", new_callable=mock.PropertyMock) as session, \
+                mock.patch("builtins.print"):
+            session.return_value.post.return_value = response
+            self.assertEqual(sender.send_bulk(users, "hi", timeout=2), [False, True, False])
+            self.assertEqual(sender.send_bulk(users[::2], "hi"), [False, False])
+
+        session.return_value.post.assert_called_once()
+        call = session.return_value.post.call_args
+        self.assertEqual((call.kwargs["data"]["to"], call.kwargs["timeout"]), ("79990000001", 2))
+
+    def test_groups_by_text_and_chunks_by_batch_size(self):
+        same = [self.notification(f"7999000000{i}") for i in range(3)]
+        other = self.notification("79990000009", message="other")
+        self.sms.send_bulk.side_effect = lambda users, message, timeout: [user.phone_number != "79990000001" for user in users]
+
+        with mock.patch("notifications.services.SMS_BATCH_SIZE", 2):
+            NotificationService.send_sms_grouped([*same, other])
+
+        self.assertEqual(
+            [(len(call.args[0]), call.args[1]) for call in self.sms.send_bulk.call_args_list],
+            [(2, "hi"), (1, "hi"), (1, "other")]
+        )
+        self.assertEqual([n.status for n in (*same, other)], ["sent", "pending", "sent", "sent"])
+        self.assertEqual(same[1].last_channel, "sms")
+
+    @override_settings(DELIVERY_BUDGET_SECONDS=5)
+    def test_chunk_is_bounded_by_delivery_budget(self):
+        notification = self.notification("79990000001")
+        limiter = mock.Mock()
+        limiter.wait.return_value = True
+        self.sms.send_bulk.return_value = [True]
+
+        with mock.patch("notifications.services.get_rate_limiter", return_value=limiter):
+            NotificationService.send_sms_grouped([notification])
+            limiter.wait.return_value = False
+            NotificationService.send_sms_grouped([self.notification("79990000002")])
+
+        self.assertEqual(limiter.wait.call_args_list, [mock.call("sms", 5)] * 2)
+        self.sms.send_bulk.assert_called_once()
+        self.assertLessEqual(self.sms.send_bulk.call_args.kwargs["timeout"], 5)
+        self.assertEqual(notification.status, "sent")
+
+    def test_undelivered_sms_fall_back_without_resending(self):
+        users = [
+            User.objects.create(email=f"{number or 'none'}@example.com", username=number or "none", phone_number=number)
+            for number in ("79990000001", "79990000002", "")
+        ]
+        notifications = Notification.objects.bulk_create([Notification(user=user, message="hi") for user in users])
+        self.sms.send_bulk.return_value = [True, False]
+        self.email.send.return_value = True
+
+        with mock.patch.object(NotificationService, "channel_order", return_value=("sms", "email")):
+            NotificationService.send_batch(notifications)
+
+        self.assertEqual(self.sms.send_bulk.call_args.args[0], users[:2])
+        self.sms.send.assert_not_called()
+        self.assertEqual(self.email.send.call_count, 2)
+        self.assertEqual(
+            list(Notification.objects.order_by("user__phone_number").values_list("user__phone_number", "status", "last_channel")),
+            [("", "sent", "email"), ("79990000001", "sent", "sms"), ("79990000002", "sent", "email")]
+        )
+
+
+class AdaptiveOrderingTests(TestCase):
+    """
+    Проверяет упорядочивание каналов по скользящей статистике отправок.
+    """
+    def setUp(self):
+        self.clock = mock.patch("notifications.stats.time.monotonic", return_value=1000.0).start()
+        self.addCleanup(mock.patch.stopall)
+        self.stats = ChannelStats(window=50, max_age=60)
+
+    def fill(self, channel, latency, success=True, count=ADAPTIVE_MIN_SAMPLES):
+        for _ in range(count):
+            self.stats.record(channel, latency, success)
+
+    def test_fast_channels_go_first_and_broken_last(self):
+        self.fill("sms", 2.0)
+        self.fill("email", 0.5)
+        self.fill("telegram", 0.1, success=False)
+
+        self.assertEqual(self.stats.rank(("sms", "email", "telegram")), ("email", "sms", "telegram"))
+        self.assertEqual(self.stats.snapshot("telegram")["success_rate"], 0)
+
+    def test_channels_without_enough_samples_are_tried_first(self):
+        self.fill("sms", 0.1)
+        self.fill("email", 5.0, count=ADAPTIVE_MIN_SAMPLES - 1)
+
+        self.assertEqual(self.stats.rank(("sms", "email")), ("email", "sms"))
+
+    def test_old_samples_expire(self):
+        self.fill("sms", 5.0)
+        self.fill("email", 0.1)
+        self.assertEqual(self.stats.rank(("email", "sms")), ("email", "sms"))
+
+        self.clock.return_value += 61
+        self.fill("email", 0.1)
+        self.assertEqual(self.stats.snapshot("sms")["samples"], 0)
+        self.assertEqual(self.stats.rank(("email", "sms")), ("sms", "email"))
+
+    @override_settings(CHANNEL_ORDERING="adaptive")
+    def test_order_skips_channels_without_contacts(self):
+        self.fill("sms", 2.0)
+        self.fill("email", 0.5)
+
+        with mock.patch("notifications.services.get_channel_stats", return_value=self.stats):
+            with_phone = Notification(user=User(email="a@example.com", phone_number="1"))
+            without_phone = Notification(user=User(email="b@example.com", phone_number=""))
+            self.assertEqual(NotificationService.channel_order(with_phone), ("telegram", "email", "sms"))
+            self.assertEqual(NotificationService.channel_order(without_phone), ("telegram", "email"))
+
+            with self.settings(CHANNEL_ORDERING="static"):
+                self.assertEqual(NotificationService.channel_order(without_phone), ("sms", "email", "telegram"))
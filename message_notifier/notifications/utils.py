@@ -0,0 +1,33 @@
+import random
+from itertools import islice
+
+
+def chunked(iterable, size):
+    """
+    Разбивает итерируемый объект на списки длиной не более `size`.
+
+    Работает с генераторами и итераторами QuerySet, не загружая все
+    элементы в память сразу.
+
+    Аргументы:
+        iterable: Любой итерируемый объект.
+        size (int): Максимальный размер пачки.
+
+    Возвращает:
+        Iterator[list]: Последовательные пачки элементов.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def backoff_delay(attempt, base, cap):
+    """
+    Задержка в секундах перед повторной попыткой номер `attempt` (с 1).
+
+    Растет экспоненциально от `base`, но не больше `cap`, и случайно
+    выбирается из второй половины интервала, чтобы попытки, упавшие
+    одновременно, не повторялись тоже одновременно.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
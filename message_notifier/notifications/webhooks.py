@@ -0,0 +1,186 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+
+import redis
+import requests
+from celery import current_app
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import (
+    WEBHOOK_BATCH_SIZE,
+    WEBHOOK_LEASE_SECONDS,
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_RETRY_DELAY_SECONDS,
+    WEBHOOK_RETRY_MAX_DELAY_SECONDS,
+    WEBHOOK_STATUSES,
+    WEBHOOK_SUBSCRIPTIONS_TTL,
+    WEBHOOK_TIMEOUT,
+    WEBHOOK_TRIGGER_DEBOUNCE_SECONDS,
+)
+from .models import WebhookEvent, WebhookSubscription
+from .senders.http import HTTPSessionMixin
+from .utils import backoff_delay
+
+_subscriptions = None
+_subscriptions_loaded_at = 0
+
+
+def active_subscriptions():
+    """
+    Возвращает активные подписки. Список кэшируется в процессе на
+    WEBHOOK_SUBSCRIPTIONS_TTL секунд, чтобы сохранение каждой пачки
+    уведомлений не требовало лишнего запроса к БД.
+    """
+    global _subscriptions, _subscriptions_loaded_at
+    if _subscriptions is None or time.monotonic() - _subscriptions_loaded_at > WEBHOOK_SUBSCRIPTIONS_TTL:
+        _subscriptions = list(WebhookSubscription.objects.filter(is_active=True))
+        _subscriptions_loaded_at = time.monotonic()
+    return _subscriptions
+
+
+def flush_trigger_key(subscription_id):
+    return f"notifier:webhook-flush:{subscription_id}"
+
+
+def record_webhook_events(entries):
+    """
+    Записывает в outbox события для уведомлений, получивших статус из
+    WEBHOOK_STATUSES, по одному на каждую подписку, которая просила о нем
+    сообщать. Все события вставляются одним bulk_create. Если у подписки
+    накопилось WEBHOOK_BATCH_SIZE готовых к отправке событий, ее отправка
+    запускается сразу, не дожидаясь периодической задачи flush_webhooks.
+
+    Проверка выполняется не чаще раза в WEBHOOK_TRIGGER_DEBOUNCE_SECONDS на
+    подписку для всех воркеров (cache.add - SET NX EX в Redis), поэтому
+    частые сохранения не запускают подсчет и задачу на каждую пачку. Если
+    кэш недоступен, события отправит периодическая задача.
+
+    Аргументы:
+        entries (list[dict]): Записи кэша статусов (status_cache.build_status_entry).
+    """
+    entries = [entry for entry in entries if entry["data"]["status"] in WEBHOOK_STATUSES]
+    if not entries:
+        return
+
+    events = [
+        WebhookEvent(subscription=subscription, notification_id=entry["data"]["id"], payload=entry["data"])
+        for subscription in active_subscriptions()
+        for entry in entries
+        if entry["data"]["status"] in subscription.statuses
+    ]
+    if not events:
+        return
+
+    WebhookEvent.objects.bulk_create(events)
+
+    now = timezone.now()
+    for subscription_id in {event.subscription_id for event in events}:
+        try:
+            if not cache.add(flush_trigger_key(subscription_id), 1, WEBHOOK_TRIGGER_DEBOUNCE_SECONDS):
+                continue
+        except redis.RedisError as e:
+            print(f"Кэш недоступен, webhook отправит периодическая задача: {e}")
+            return
+
+        due = WebhookEvent.objects.filter(
+            subscription_id=subscription_id, status="pending", next_attempt_at__lte=now
+        )
+        if due[:WEBHOOK_BATCH_SIZE].count() >= WEBHOOK_BATCH_SIZE:
+            current_app.send_task("notifications.tasks.flush_webhooks", (subscription_id,))
+
+
+def sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class WebhookDispatcher(HTTPSessionMixin):
+    """
+    Отправляет пачки событий на адреса подписок.
+
+    Запросы идут через общую для процесса сессию requests с пулом
+    keep-alive соединений (HTTPSessionMixin), поэтому соединение с каждым
+    клиентом переиспользуется между пачками.
+
+    Тело запроса: {"events": [<данные уведомления>, ...]} в JSON. Если у
+    подписки задан secret, добавляется заголовок X-Notifier-Signature:
+    sha256=<HMAC-SHA256 тела>.
+
+    Методы:
+        deliver(subscription, payloads):
+            Отправляет пачку. Возвращает True, если клиент ответил 2xx.
+    """
+    def deliver(self, subscription, payloads):
+        body = json.dumps({"events": payloads}, cls=DjangoJSONEncoder).encode()
+        headers = {"Content-Type": "application/json"}
+        if subscription.secret:
+            headers["X-Notifier-Signature"] = sign(subscription.secret, body)
+
+        try:
+            r = self.session.post(subscription.url, data=body, headers=headers, timeout=WEBHOOK_TIMEOUT)
+            return 200 <= r.status_code < 300
+        except requests.RequestException as e:
+            print(f"Webhook {subscription.url} недоступен: {e}")
+            return False
+
+
+dispatcher = WebhookDispatcher()
+
+
+def flush_subscription(subscription):
+    """
+    Отправляет события подписки, готовые к доставке, пачками по
+    WEBHOOK_BATCH_SIZE, пока они не закончатся или клиент не ответит ошибкой.
+
+    Пачка выбирается через SELECT ... FOR UPDATE SKIP LOCKED, и ее
+    next_attempt_at сдвигается на WEBHOOK_LEASE_SECONDS в той же короткой
+    транзакции: параллельные задачи flush_webhooks эти события не берут, а
+    транзакция и блокировки не держатся во время HTTP-запроса. Результат
+    записывается второй транзакцией: доставленные события удаляются; при
+    ошибке у событий пачки увеличивается счетчик попыток и назначается
+    следующая попытка (экспоненциальная задержка от
+    WEBHOOK_RETRY_DELAY_SECONDS), после WEBHOOK_MAX_ATTEMPTS попыток событие
+    получает статус failed.
+
+    Возвращает количество доставленных событий.
+    """
+    delivered = 0
+
+    while True:
+        with transaction.atomic():
+            now = timezone.now()
+            events = list(
+                WebhookEvent.objects
+                .select_for_update(skip_locked=True)
+                .filter(subscription=subscription, status="pending", next_attempt_at__lte=now)
+                .order_by("next_attempt_at")[:WEBHOOK_BATCH_SIZE]
+            )
+            if not events:
+                return delivered
+
+            WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                next_attempt_at=now + timedelta(seconds=WEBHOOK_LEASE_SECONDS)
+            )
+
+        if dispatcher.deliver(subscription, [event.payload for event in events]):
+            WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+            delivered += len(events)
+            continue
+
+        now = timezone.now()
+        for event in events:
+            event.attempts += 1
+            if event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                event.status = "failed"
+            else:
+                delay = backoff_delay(event.attempts, WEBHOOK_RETRY_DELAY_SECONDS, WEBHOOK_RETRY_MAX_DELAY_SECONDS)
+                event.next_attempt_at = now + timedelta(seconds=delay)
+        with transaction.atomic():
+            WebhookEvent.objects.bulk_update(events, ("attempts", "status", "next_attempt_at"))
+
+        return delivered
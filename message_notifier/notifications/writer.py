@@ -0,0 +1,132 @@
+import atexit
+import os
+import threading
+
+from celery.signals import worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class StatusWriter:
+    """
+    Отложенная (write-behind) запись результатов отправки.
+
+    Уведомления после попытки отправки складываются в буфер процесса
+    воркера, а в БД попадают пачкой через `save` (NotificationService.save_batch,
+    один bulk_update полей STATUS_FIELDS): когда в буфере набирается
+    `max_size` уведомлений или раз в `interval` секунд (фоновый поток).
+    Если одно уведомление попало в буфер несколько раз, записывается
+    последнее состояние. Буфер также сбрасывается при остановке воркера
+    (сигналы Celery worker_process_shutdown / worker_shutdown) и при выходе
+    из процесса (atexit).
+
+    Гарантия записи - "хотя бы один раз": если запись не удалась, пачка
+    возвращается в буфер и записывается при следующем сбросе. Ошибки не
+    останавливают фоновый поток, а его соединение с БД проверяется вокруг
+    каждого сброса (close_old_connections), как в ретрансляторе outbox,
+    поэтому после перезапуска БД поток переподключается сам. Если процесс
+    завершился аварийно, не записанные уведомления остаются в БД в статусе
+    pending с прошедшим next_attempt_at, и sweep_stuck_notifications снова
+    ставит их в очередь - отправка повторится, но результат не потеряется.
+
+    Атрибуты:
+        save (Callable[[list[Notification]], None]): Функция записи пачки.
+        max_size (int): Размер буфера, при котором он сбрасывается сразу.
+        interval (float): Период сброса буфера фоновым потоком (секунды).
+
+    Методы:
+        add(notifications):
+            Добавляет уведомления в буфер.
+
+        flush():
+            Записывает буфер. Возвращает количество записанных уведомлений.
+    """
+    def __init__(self, save, max_size=None, interval=None):
+        self.save = save
+        self.max_size = max_size or settings.STATUS_WRITE_BUFFER_SIZE
+        self.interval = interval or settings.STATUS_WRITE_FLUSH_SECONDS
+        self._pid = None
+
+    def _ensure_started(self):
+        # После fork буфер и поток родителя в дочернем процессе не используются
+        if self._pid == os.getpid():
+            return
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="status-writer", daemon=True)
+        self._thread.start()
+        self._pid = os.getpid()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # У потока свое соединение с БД: устаревшее или сломанное
+            # закрывается до и после сброса, как вокруг запроса в Django
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ошибка фонового сброса статусов уведомлений: {e}")
+            finally:
+                close_old_connections()
+
+    def add(self, notifications):
+        self._ensure_started()
+        with self._lock:
+            for notification in notifications:
+                self._buffer[notification.pk] = notification
+            full = len(self._buffer) >= self.max_size
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        if self._pid != os.getpid():
+            return 0
+
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._buffer.values())
+                self._buffer = {}
+            if not batch:
+                return 0
+
+            try:
+                self.save(batch)
+            except Exception as e:
+                print(f"Ошибка записи статусов уведомлений, повтор при следующем сбросе: {e}")
+                with self._lock:
+                    for notification in batch:
+                        self._buffer.setdefault(notification.pk, notification)
+                return 0
+
+            return len(batch)
+
+    def stop(self):
+        if self._pid == os.getpid():
+            self._stop.set()
+        return self.flush()
+
+
+_status_writer = None
+
+
+def get_status_writer():
+    """
+    Возвращает отложенный писатель статусов текущего процесса (создается при первом вызове).
+    """
+    global _status_writer
+    if _status_writer is None:
+        from .services import NotificationService
+
+        _status_writer = StatusWriter(NotificationService.save_batch)
+    return _status_writer
+
+
+@atexit.register
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_status_writer(**kwargs):
+    if _status_writer is not None:
+        _status_writer.stop()
@@ -23,7 +23,8 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
     Методы:
         create(validated_data):
-            Создает пользователя с хешированным паролем.
+            Создает пользователя с хешированным паролем одним INSERT
+            (пароль хешируется до сохранения).
 
             Аргументы:
                 validated_data (dict): Валидированные данные для создания пользователя.
@@ -47,8 +48,33 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.pop("password", None)
-        user = User.objects.create(**validated_data)
+        user = User(**validated_data)
         if password:
             user.set_password(password)
-            user.save()
+        user.save()
         return user
+
+
+class UserImportSerializer(serializers.Serializer):
+    """
+    Сериализатор одной строки файла импорта пользователей
+    (команда manage.py import_users).
+
+    В отличие от UserCreateSerializer не проверяет уникальность email
+    запросом на каждую строку: существующие пользователи ищутся одним
+    запросом на пачку при импорте.
+
+    Атрибуты:
+        email (EmailField): Email пользователя (он же username).
+        password (CharField): Пароль (необязательно; без него пароль непригоден для входа).
+        first_name (CharField): Имя.
+        last_name (CharField): Фамилия.
+        phone_number (CharField): Номер телефона.
+        telegram_id (CharField): ID в Telegram.
+    """
+    email = serializers.EmailField(max_length=150)
+    password = serializers.CharField(required=False, allow_blank=True)
+    first_name = serializers.CharField(required=False, allow_blank=True, max_length=150)
+    last_name = serializers.CharField(required=False, allow_blank=True, max_length=150)
+    phone_number = serializers.CharField(required=False, allow_blank=True, max_length=20)
+    telegram_id = serializers.CharField(required=False, allow_null=True, max_length=50)
@@ -0,0 +1,5 @@
+# Сколько строк файла импорта проверяется и вставляется за одну транзакцию
+IMPORT_CHUNK_SIZE = 1000
+
+# Сколько ошибок импорта выводится в консоль (все ошибки пишутся в файл --errors)
+IMPORT_MAX_PRINTED_ERRORS = 20
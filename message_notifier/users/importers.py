@@ -0,0 +1,250 @@
+import csv
+import json
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import CommandError
+from django.db import IntegrityError, transaction
+
+from users.api.serializers import UserImportSerializer
+
+from .constants import IMPORT_CHUNK_SIZE, IMPORT_MAX_PRINTED_ERRORS
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Поля пользователя, которые обновляются при --on-conflict update (пароль не меняется)
+USER_UPDATE_FIELDS = ("first_name", "last_name", "phone_number", "telegram_id")
+
+
+def detect_format(path):
+    """
+    Определяет формат файла импорта по расширению (.csv - csv,
+    .ndjson/.jsonl - ndjson). Возвращает None, если формат не распознан.
+    """
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+def read_rows(stream, fmt):
+    """
+    Читает строки файла импорта по одной, не загружая файл в память.
+
+    Пустые значения (пустые ячейки CSV, null в NDJSON) отбрасываются.
+
+    Аргументы:
+        stream: Текстовый файл.
+        fmt (str): "csv" (первая строка - заголовок) или "ndjson" (объект на строку).
+
+    Возвращает:
+        Iterator[tuple[int, dict | None, str | None]]: (номер строки файла,
+            данные строки, ошибка разбора).
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key and value}, None
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Некорректный JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Ожидается JSON-объект"
+            continue
+        yield line_number, {key: value for key, value in row.items() if value not in ("", None)}, None
+
+
+@contextmanager
+def open_import(path, fmt=None, errors_path=None):
+    """
+    Открывает файл импорта (`path` = "-" - stdin) и файл ошибок.
+
+    Возвращает:
+        tuple: (строки из read_rows, файл ошибок или None).
+
+    Исключения:
+        CommandError: Если формат не задан и не определяется по расширению.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt is None:
+        raise CommandError(f"Не удалось определить формат файла {path}, укажите --format")
+
+    with ExitStack() as stack:
+        if path == "-":
+            stream = sys.stdin
+        else:
+            stream = stack.enter_context(open(path, encoding="utf-8-sig", newline=""))
+        errors_file = None
+        if errors_path:
+            errors_file = stack.enter_context(open(errors_path, "w", encoding="utf-8"))
+        yield read_rows(stream, fmt), errors_file
+
+
+class ImportReport:
+    """
+    Счетчики и ошибки импорта.
+
+    Первые IMPORT_MAX_PRINTED_ERRORS ошибок выводятся в stderr, все ошибки
+    пишутся в `errors_file` (если задан) строками NDJSON {"line", "errors"}.
+
+    Атрибуты:
+        rows (int): Прочитано строк.
+        created (int): Создано записей.
+        updated (int): Обновлено существующих записей.
+        skipped (int): Пропущено строк (запись уже существует).
+        failed (int): Строк с ошибками.
+
+    Методы:
+        error(line, errors):
+            Учитывает ошибку строки `line`.
+
+        summary():
+            Строка с счетчиками и скоростью (строк в секунду).
+    """
+    def __init__(self, errors_file=None):
+        self.errors_file = errors_file
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def error(self, line, errors):
+        self.failed += 1
+        if self.failed <= IMPORT_MAX_PRINTED_ERRORS:
+            print(f"Строка {line}: {json.dumps(errors, ensure_ascii=False)}", file=sys.stderr)
+        if self.errors_file is not None:
+            self.errors_file.write(json.dumps({"line": line, "errors": errors}, ensure_ascii=False) + "\n")
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (
+            f"строк: {self.rows}, создано: {self.created}, обновлено: {self.updated}, "
+            f"пропущено: {self.skipped}, ошибок: {self.failed}, {self.rows / elapsed:.0f} строк/с"
+        )
+
+
+def validate_chunk(chunk, serializer_class, report):
+    """
+    Проверяет строки пачки сериализатором. Строки с ошибками учитываются в
+    `report`, возвращается список (номер строки, данные) корректных строк.
+    """
+    valid = []
+    for line, row, parse_error in chunk:
+        report.rows += 1
+        if parse_error:
+            report.error(line, parse_error)
+            continue
+        serializer = serializer_class(data=row)
+        if serializer.is_valid():
+            valid.append((line, serializer.validated_data))
+        else:
+            report.error(line, serializer.errors)
+    return valid
+
+
+def hash_passwords(passwords, pool=None, workers=1):
+    """
+    Хеширует пароли (make_password; пустой пароль - непригодный для входа).
+    При `pool` (ProcessPoolExecutor на `workers` процессов) хеширование идет
+    в нескольких процессах: make_password нагружает процессор и в одном
+    процессе ограничивает скорость импорта.
+    """
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def import_users(rows, report, chunk_size=IMPORT_CHUNK_SIZE, on_conflict="skip", hash_workers=0, progress=None):
+    """
+    Импортирует пользователей пачками по `chunk_size` строк.
+
+    Существующие email ищутся одним запросом на пачку: при
+    on_conflict="skip" такие строки пропускаются, при "update" - у
+    пользователей обновляются только поля USER_UPDATE_FIELDS, заданные в
+    их строке (пустые значения read_rows отбрасывает, поэтому пустая ячейка
+    поле не меняет). Строки с одинаковым набором полей обновляются одним
+    bulk_create с update_conflicts. Новые пользователи вставляются одним
+    bulk_create (username = email), пароли хешируются до вставки, при
+    `hash_workers` > 0 - в пуле процессов.
+
+    Аргументы:
+        rows: Строки из read_rows.
+        report (ImportReport): Счетчики и ошибки.
+        progress (callable | None): Вызывается после каждой пачки.
+    """
+    User = get_user_model()
+    pool = ProcessPoolExecutor(max_workers=hash_workers) if hash_workers > 0 else nullcontext()
+
+    with pool:
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            users = {}
+            lines = {}
+            for line, data in validate_chunk(chunk, UserImportSerializer, report):
+                if data["email"] in users:
+                    report.error(line, "Email уже встречался в файле")
+                    continue
+                users[data["email"]] = data
+                lines[data["email"]] = line
+
+            existing = set(User.objects.filter(email__in=list(users)).values_list("email", flat=True))
+            new = [data for email, data in users.items() if email not in existing]
+            passwords = hash_passwords(
+                [data.get("password") or None for data in new],
+                pool if hash_workers > 0 else None,
+                hash_workers
+            )
+
+            objects = [
+                User(**{**data, "username": data["email"], "password": password})
+                for data, password in zip(new, passwords)
+            ]
+
+            # Обновляются только поля, заданные в строке: строки группируются по набору полей
+            updates = defaultdict(list)
+            if on_conflict == "update":
+                for email, data in users.items():
+                    fields = tuple(field for field in USER_UPDATE_FIELDS if field in data)
+                    if email in existing and fields:
+                        updates[fields].append(User(email=email, username=email, **{field: data[field] for field in fields}))
+            updated = sum(len(group) for group in updates.values())
+
+            try:
+                with transaction.atomic():
+                    for fields, group in updates.items():
+                        User.objects.bulk_create(
+                            group,
+                            update_conflicts=True,
+                            unique_fields=["email"],
+                            update_fields=list(fields)
+                        )
+                    User.objects.bulk_create(objects, ignore_conflicts=True)
+                    # Строки, вставленные параллельно другим процессом, bulk_create пропустил
+                    inserted = User.objects.filter(email__in=list(users)).count() - len(existing)
+                report.updated += updated
+                report.created += inserted
+                report.skipped += len(users) - inserted - updated
+            except IntegrityError as e:
+                # Например, username нового пользователя уже занят другим email
+                for email in users:
+                    report.error(lines[email], f"Пачка не импортирована: {e}")
+
+            if progress is not None:
+                progress()
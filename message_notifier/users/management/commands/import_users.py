@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from users.constants import IMPORT_CHUNK_SIZE
+from users.importers import IMPORT_FORMATS, ImportReport, import_users, open_import
+
+
+class Command(BaseCommand):
+    """
+    Импорт пользователей из CSV или NDJSON.
+
+    Файл читается построчно и обрабатывается пачками по --chunk-size строк
+    (users.importers.import_users), поэтому память не зависит от
+    размера файла. После каждой пачки выводятся счетчики и скорость, ошибки
+    строк - в stderr и в файл --errors.
+
+    Колонки: email, password, first_name, last_name, phone_number, telegram_id.
+
+    Запуск:
+        python manage.py import_users users.csv
+        python manage.py import_users users.ndjson --on-conflict update --hash-workers 4
+    """
+    help = "Импортирует пользователей из CSV или NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Путь к файлу ("-" - stdin)')
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="Формат файла (по умолчанию - по расширению)")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument(
+            "--on-conflict",
+            choices=("skip", "update"),
+            default="skip",
+            help="Что делать с существующими email: пропустить или обновить контакты"
+        )
+        parser.add_argument("--hash-workers", type=int, default=0, help="Процессов для хеширования паролей")
+        parser.add_argument("--errors", help="Файл для ошибок строк (NDJSON)")
+
+    def handle(self, *args, **options):
+        with open_import(options["path"], options["format"], options["errors"]) as (rows, errors_file):
+            report = ImportReport(errors_file)
+            import_users(
+                rows,
+                report,
+                chunk_size=options["chunk_size"],
+                on_conflict=options["on_conflict"],
+                hash_workers=options["hash_workers"],
+                progress=lambda: self.stdout.write(report.summary())
+            )
+
+        self.stdout.write(f"Импорт завершен: {report.summary()}")
@@ -1,2 +1,65 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
 
+from users.models import User
+
+
+class ImportUsersCommandTests(TestCase):
+    """
+    Проверяет потоковый импорт пользователей из файла.
+    """
+    def write(self, suffix, content):
+        file = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, encoding="utf-8")
+        file.write(content)
+        file.close()
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def run_import(self, command, *args):
+        stdout = io.StringIO()
+        with mock.patch("sys.stderr", io.StringIO()):
+            call_command(command, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import_users_skips_existing_and_reports_errors(self):
+        User.objects.create(email="old@example.com", username="old", first_name="Old")
+        path = self.write(".csv", (
+            "email,password,first_name,phone_number\n"
+            "new@example.com,secret,New,7999\n"
+            "old@example.com,,Changed,\n"
+            "not-an-email,,X,\n"
+        ))
+
+        output = self.run_import("import_users", path, "--chunk-size", "2")
+
+        self.assertIn("создано: 1", output)
+        self.assertIn("пропущено: 1", output)
+        self.assertIn("ошибок: 1", output)
+        user = User.objects.get(email="new@example.com")
+        self.assertEqual((user.username, user.phone_number), ("new@example.com", "7999"))
+        self.assertTrue(user.check_password("secret"))
+        self.assertEqual(User.objects.get(email="old@example.com").first_name, "Old")
+
+        self.run_import("import_users", path, "--on-conflict", "update")
+        self.assertEqual(User.objects.get(email="old@example.com").first_name, "Changed")
+
+    def test_update_changes_only_fields_present_in_row(self):
+        User.objects.create(email="a@example.com", username="a", first_name="A", phone_number="111")
+        User.objects.create(email="b@example.com", username="b", first_name="B", phone_number="222")
+        path = self.write(".csv", (
+            "email,first_name,phone_number\n"
+            "a@example.com,,333\n"
+            "b@example.com,Bob,\n"
+        ))
+
+        output = self.run_import("import_users", path, "--on-conflict", "update")
+
+        self.assertIn("обновлено: 2", output)
+        a, b = User.objects.filter(email__in=["a@example.com", "b@example.com"]).order_by("email")
+        self.assertEqual((a.first_name, a.phone_number), ("A", "333"))
+        self.assertEqual((b.first_name, b.phone_number), ("Bob", "222"))